@@ -0,0 +1 @@
+"""Benchmarks of the collector, not part of the installed package"""
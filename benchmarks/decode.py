@@ -0,0 +1,292 @@
+"""
+Micro-benchmark of the response processing hot path
+
+Synthetic APDUs are encoded to octets once and then decoded and processed in
+memory through the response handlers of the collector into InfluxDB Line
+Protocol formatting, no request leaves the process.
+
+    python -m benchmarks.decode --objects 100 --iterations 200
+"""
+from argparse import ArgumentParser, Namespace
+import json
+import logging
+from os import getpid
+from time import perf_counter_ns
+import tracemalloc
+from typing import Any as TypingAny, Callable
+
+from bacpypes.apdu import (
+    APDU,
+    ReadAccessResult,
+    ReadAccessResultElement,
+    ReadAccessResultElementChoice,
+    ReadPropertyACK,
+    ReadPropertyMultipleACK,
+    UnconfirmedCOVNotificationRequest,
+    apdu_types,
+    complex_ack_types,
+    unconfirmed_request_types,
+)
+from bacpypes.basetypes import (
+    BinaryPV,
+    ErrorType,
+    PropertyValue,
+    StatusFlags,
+)
+from bacpypes.constructeddata import Any, ArrayOf
+from bacpypes.pdu import PDU, Address
+from bacpypes.primitivedata import (
+    Atomic,
+    CharacterString,
+    ObjectIdentifier,
+    Real,
+    Unsigned,
+)
+
+from telegrafbacnet.app import TelegrafApplication
+from telegrafbacnet.config import Config, DeviceConfig, ObjectConfig
+from telegrafbacnet.tasks import DeviceReadTask
+
+from .throughput import NullSink
+
+
+DEVICE_ADDRESS = "192.0.2.1"
+
+# (object type, property, value), every object of the synthetic device
+# cycles through these
+_OBJECT_KINDS: tuple[tuple[str, tuple[tuple[str, Callable[[], TypingAny]],
+                                      ...]], ...] = (
+    ("analogValue", (
+        ("presentValue", lambda: Real(21.5)),
+        ("statusFlags", lambda: StatusFlags([0, 0, 0, 0])),
+    )),
+    ("binaryValue", (
+        ("presentValue", lambda: BinaryPV("active")),
+        ("statusFlags", lambda: StatusFlags([0, 1, 0, 0])),
+    )),
+    ("multiStateValue", (
+        ("presentValue", lambda: Unsigned(2)),
+        ("stateText", lambda: ArrayOf(CharacterString)(
+            ["Off", "Low", "High"])),
+    )),
+)
+# Every n-th property is answered with an error
+_ERROR_EVERY = 10
+
+
+def _object_identifier(index: int) -> tuple[str, int]:
+    return (_OBJECT_KINDS[index % len(_OBJECT_KINDS)][0], index)
+
+
+def _any(value: Atomic) -> Any:
+    encoded = Any()
+    encoded.cast_in(value)
+    return encoded
+
+
+def _encode(apdu: TypingAny) -> PDU:
+    """Returns the APDU encoded to octets as received from the network"""
+    encoded = APDU()
+    apdu.encode(encoded)
+    pdu = PDU(user_data=None)
+    encoded.encode(pdu)
+    pdu.pduSource = Address(DEVICE_ADDRESS)
+    return pdu
+
+
+def _decode(pdu: PDU) -> TypingAny:
+    """Decodes the octets to an APDU the same way bacpypes does"""
+    apdu = APDU()
+    apdu.decode(PDU(pdu.pduData, source=pdu.pduSource))
+    if apdu.apduType == 3:
+        decoded = complex_ack_types[apdu.apduService]()
+    elif apdu.apduType == 1:
+        decoded = unconfirmed_request_types[apdu.apduService]()
+    else:
+        decoded = apdu_types[apdu.apduType]()
+    decoded.decode(apdu)
+    return decoded
+
+
+def build_read_property_multiple_ack(objects: int) -> PDU:
+    """Returns a ReadPropertyMultipleACK for the objects with some errors"""
+    results: list[ReadAccessResult] = []
+    count = 0
+    for index in range(objects):
+        elements: list[ReadAccessResultElement] = []
+        for prop, value in _OBJECT_KINDS[index % len(_OBJECT_KINDS)][1]:
+            count += 1
+            if count % _ERROR_EVERY == 0:
+                result = ReadAccessResultElementChoice(
+                    propertyAccessError=ErrorType(
+                        errorClass="property", errorCode="unknownProperty",
+                    ),
+                )
+            else:
+                result = ReadAccessResultElementChoice(
+                    propertyValue=_any(value()),
+                )
+            elements.append(ReadAccessResultElement(propertyIdentifier=prop,
+                                                    readResult=result))
+        results.append(ReadAccessResult(
+            objectIdentifier=ObjectIdentifier(_object_identifier(index)),
+            listOfResults=elements,
+        ))
+    ack = ReadPropertyMultipleACK(listOfReadAccessResults=results)
+    ack.apduInvokeID = 1
+    return _encode(ack)
+
+
+def build_read_property_ack() -> PDU:
+    """Returns a ReadPropertyACK of a present value"""
+    ack = ReadPropertyACK(
+        objectIdentifier=ObjectIdentifier(_object_identifier(0)),
+        propertyIdentifier="presentValue",
+        propertyValue=_any(Real(21.5)),
+    )
+    ack.apduInvokeID = 1
+    return _encode(ack)
+
+
+def build_cov_notification() -> PDU:
+    """Returns an unconfirmed COV notification of an analog value"""
+    return _encode(UnconfirmedCOVNotificationRequest(
+        subscriberProcessIdentifier=getpid(),
+        initiatingDeviceIdentifier=ObjectIdentifier("device", 1),
+        monitoredObjectIdentifier=ObjectIdentifier(_object_identifier(0)),
+        timeRemaining=300,
+        listOfValues=[
+            PropertyValue(propertyIdentifier="presentValue",
+                          value=_any(Real(21.5))),
+            PropertyValue(propertyIdentifier="statusFlags",
+                          value=_any(StatusFlags([0, 0, 0, 0]))),
+        ],
+    ))
+
+
+def _device(objects: int) -> DeviceConfig:
+    device = DeviceConfig()
+    device.address = Address(DEVICE_ADDRESS)
+    device.device_identifier = 1
+    device.device_name = "benchmark"
+    device.max_apdu_length_accepted = 1476
+    device.segmentation_supported = "noSegmentation"
+    device_objects: list[ObjectConfig] = []
+    for index in range(objects):
+        obj = ObjectConfig()
+        obj.object_identifier = ObjectIdentifier(_object_identifier(index))
+        obj.properties = tuple(
+            prop for prop, _ in _OBJECT_KINDS[index % len(_OBJECT_KINDS)][1])
+        device_objects.append(obj)
+    device.objects = tuple(device_objects)
+    return device
+
+
+def _measure(name: str, function: Callable[[], None], elements: int,
+             iterations: int) -> dict[str, TypingAny]:
+    for _ in range(min(iterations, 10)):
+        function()
+    start = perf_counter_ns()
+    for _ in range(iterations):
+        function()
+    duration = perf_counter_ns() - start
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    retained = sum(stat.count_diff for stat in
+                   tracemalloc.take_snapshot().compare_to(snapshot, "lineno"))
+    tracemalloc.stop()
+    return {
+        "benchmark": name,
+        "elements": elements,
+        "ns_per_element": duration / (iterations * elements),
+        "peak_bytes_per_element": (peak - before) / elements,
+        "retained_blocks_per_element": retained / elements,
+    }
+
+
+def run(args: Namespace) -> list[dict[str, TypingAny]]:
+    """Runs all decode benchmarks and returns their results"""
+    config = Config()
+    config.address = Address("127.0.0.1:0")
+    config.output.flush_on_response = False
+    sink = NullSink()
+    app = TelegrafApplication(config)
+    app.influx_lpr.sink = sink
+    device = _device(args.objects)
+    app.register_devices(device)
+
+    rpm = build_read_property_multiple_ack(args.objects)
+    rp = build_read_property_ack()
+    cov = build_cov_notification()
+    rpm_elements = sum(len(result.listOfResults) for result
+                       in _decode(rpm).listOfReadAccessResults)
+    task = DeviceReadTask(app.task_scheduler, app, device, config,
+                          app._process_response_iocb)
+    requests = list(task._build_requests())
+    request_elements = sum(len(spec.listOfPropertyReferences)
+                           for request in requests
+                           for spec in request.listOfReadAccessSpecs)
+
+    def encode_requests() -> None:
+        for request in task._build_requests():
+            # jinak nastavuje state machine transakce
+            request.apduInvokeID = 1
+            request.apduMaxSegs = 0
+            request.apduMaxResp = 5
+            _encode(request)
+
+    def process_rpm() -> None:
+        app._process_read_property_multiple_ack(_decode(rpm))
+        app.influx_lpr.flush()
+
+    def process_rp() -> None:
+        app._process_read_property_ack(_decode(rp))
+        app.influx_lpr.flush()
+
+    def process_cov() -> None:
+        app.do_UnconfirmedCOVNotificationRequest(_decode(cov))
+        app.influx_lpr.flush()
+
+    return [
+        _measure("encode_rpm_requests", encode_requests, request_elements,
+                 args.iterations),
+        _measure("decode_rpm_ack", lambda: _decode(rpm), rpm_elements,
+                 args.iterations),
+        _measure("process_rpm_ack", process_rpm, rpm_elements,
+                 args.iterations),
+        _measure("process_rp_ack", process_rp, 1,
+                 args.iterations * args.objects),
+        _measure("process_cov_notification", process_cov, 2,
+                 args.iterations * args.objects),
+    ]
+
+
+def main() -> None:
+    parser = ArgumentParser("Response processing micro-benchmark")
+    parser.add_argument("--objects", type=int, default=100,
+                        help="Objects in the ReadPropertyMultipleACK")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", action="store_true", default=False,
+                        help="Print results as JSON lines")
+    args = parser.parse_args()
+    # chybove vysledky se loguji, vystup logu se meri, ale nevypisuje
+    logging.basicConfig(level=logging.CRITICAL)
+    columns = ("benchmark", "elements", "ns_per_element",
+               "peak_bytes_per_element", "retained_blocks_per_element")
+    if not args.json:
+        print(" ".join(f"{column:>28}" for column in columns))
+    for result in run(args):
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(" ".join(f"{result[column]:>28.1f}"
+                           if isinstance(result[column], float)
+                           else f"{result[column]:>28}"
+                           for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Simulated BACnet devices for benchmarks"""
+from dataclasses import dataclass
+import logging
+from multiprocessing.synchronize import Event
+
+from bacpypes.app import BIPSimpleApplication
+from bacpypes.core import run
+from bacpypes.local.device import LocalDeviceObject
+from bacpypes.object import AnalogValueObject
+from bacpypes.service.cov import ChangeOfValueServices
+from bacpypes.service.object import ReadWritePropertyMultipleServices
+from bacpypes.task import RecurringTask
+
+
+_logger = logging.getLogger(__name__)
+
+BASE_DEVICE_IDENTIFIER = 100000
+
+
+class SimulatedDevice(BIPSimpleApplication,
+                      ReadWritePropertyMultipleServices,
+                      ChangeOfValueServices):
+    """Class for a simulated device supporting RPM and COV"""
+
+
+@dataclass
+class SimulationConfig:
+    """Class representing a slice of simulated devices"""
+    host: str = "127.0.0.1"
+    base_port: int = 47809
+    first: int = 0
+    count: int = 1
+    objects: int = 10
+    max_apdu_length_accepted: int = 1476
+    # Interval in seconds of changing present values, None = never change
+    change_interval: float | None = None
+
+    def address(self, index: int) -> str:
+        """Returns the address of the index-th simulated device"""
+        return f"{self.host}:{self.base_port + index}"
+
+
+class _ValueChanger(RecurringTask):
+    def __init__(self, objects: list[AnalogValueObject],
+                 interval: float) -> None:
+        super().__init__(int(interval * 1000))
+        self.objects = objects
+        self.step = 0
+
+    def process_task(self) -> None:
+        self.step += 1
+        for obj in self.objects:
+            obj.presentValue = float(self.step % 100)
+
+
+def create_devices(config: SimulationConfig) -> list[SimulatedDevice]:
+    """Creates the slice of simulated devices"""
+    devices: list[SimulatedDevice] = []
+    objects: list[AnalogValueObject] = []
+    for index in range(config.first, config.first + config.count):
+        local_device = LocalDeviceObject(
+            objectName=f"sim{index}",
+            objectIdentifier=BASE_DEVICE_IDENTIFIER + index,
+            maxApduLengthAccepted=config.max_apdu_length_accepted,
+            segmentationSupported="noSegmentation",
+            vendorIdentifier=15,
+            databaseRevision=0,
+        )
+        device = SimulatedDevice(local_device, config.address(index))
+        for instance in range(config.objects):
+            obj = AnalogValueObject(
+                objectIdentifier=("analogValue", instance),
+                objectName=f"av{instance}",
+                presentValue=float(instance),
+                statusFlags=[0, 0, 0, 0],
+                covIncrement=0.0,
+            )
+            device.add_object(obj)
+            objects.append(obj)
+        devices.append(device)
+    if config.change_interval:
+        _ValueChanger(objects, config.change_interval).install_task()
+    return devices
+
+
+def serve(config: SimulationConfig, ready: Event) -> None:
+    """Runs the slice of simulated devices until the process is terminated"""
+    logging.basicConfig(level=logging.WARNING)
+    devices = create_devices(config)
+    _logger.info("Simulating %d devices", len(devices))
+    ready.set()
+    run()
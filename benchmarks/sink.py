@@ -0,0 +1,149 @@
+"""
+Throughput benchmark of the InfluxDB HTTP output sink
+
+Lines are formatted by the collector output and posted by the HTTP sink to a
+local stand-in of the InfluxDB write API, which decompresses the bodies and
+counts the received lines, requests and connections. The stand-in can refuse
+every n-th request with 503 to exercise retries.
+
+    python -m benchmarks.sink --lines 1000000 --batch-lines 5000
+    python -m benchmarks.sink --no-gzip --fail-every 10
+"""
+from argparse import ArgumentParser, Namespace
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+from threading import Lock, Thread
+from time import monotonic, process_time
+from typing import Any
+
+from telegrafbacnet.config import OutputConfig
+from telegrafbacnet.influx import InfluxLPR, line_prefix
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Class for a local stand-in of the InfluxDB write API"""
+
+    daemon_threads = True
+
+    def __init__(self, fail_every: int | None = None) -> None:
+        super().__init__(("127.0.0.1", 0), _WriteHandler)
+        self.fail_every = fail_every
+        self.lock = Lock()
+        self.requests = 0
+        self.failed_requests = 0
+        self.connections = 0
+        self.lines = 0
+        self.body_bytes = 0
+
+    @property
+    def url(self) -> str:
+        """Returns the URL of the write endpoint"""
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}/api/v2/write?org=&bucket=benchmark"
+
+
+class _WriteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StandInServer
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            self.server.requests += 1
+            fail = self.server.fail_every is not None \
+                and self.server.requests % self.server.fail_every == 0
+            if fail:
+                self.server.failed_requests += 1
+            else:
+                self.server.body_bytes += len(body)
+        if fail:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        with self.server.lock:
+            self.server.lines += body.count(b"\n")
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def run(args: Namespace) -> dict[str, Any]:
+    """Runs the benchmark and returns its results"""
+    server = StandInServer(args.fail_every)
+    Thread(target=server.serve_forever, daemon=True).start()
+    config = OutputConfig()
+    config.flush_lines = args.flush_lines
+    config.sink = "http"
+    config.http.url = server.url
+    config.http.batch_lines = args.batch_lines
+    config.http.gzip = args.gzip
+    config.http.retry_backoff = 0.0
+    influx_lpr = InfluxLPR(config)
+    prefixes = [line_prefix("bacnet", ("device", device),
+                            ("objectType", "analogValue"),
+                            ("objectInstance", instance))
+                for device in range(100) for instance in range(10)]
+    start_cpu, start = process_time(), monotonic()
+    for index in range(args.lines):
+        influx_lpr.print_prefixed(prefixes[index % len(prefixes)],
+                                  "presentValue", 21.5 + index % 7)
+    influx_lpr.close()
+    duration = monotonic() - start
+    cpu = process_time() - start_cpu
+    server.shutdown()
+    sink = influx_lpr.sink
+    return {
+        "gzip": args.gzip,
+        "batch_lines": args.batch_lines,
+        "lines": server.lines,
+        "lines_per_s": server.lines / duration,
+        "cpu_us_per_line": cpu / args.lines * 1e6,
+        "bytes_per_line": server.body_bytes / max(server.lines, 1),
+        "requests": server.requests,
+        "connections": server.connections,
+        "retries": sink.retries,
+        "dropped_lines": sink.dropped_lines,
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser("HTTP output sink benchmark")
+    parser.add_argument("--lines", type=int, default=1000000)
+    parser.add_argument("--batch-lines", type=int, default=5000,
+                        help="Lines per HTTP request")
+    parser.add_argument("--flush-lines", type=int, default=1000,
+                        help="Lines per write of the collector to the sink")
+    parser.add_argument("--no-gzip", dest="gzip", action="store_false",
+                        default=True)
+    parser.add_argument("--fail-every", type=int, default=None,
+                        help="Refuse every n-th request with 503")
+    parser.add_argument("--json", action="store_true", default=False,
+                        help="Print results as JSON")
+    args = parser.parse_args()
+    # opakovani se loguji jako varovani
+    logging.basicConfig(level=logging.ERROR)
+    result = run(args)
+    if args.json:
+        print(json.dumps(result))
+        return
+    for key, value in result.items():
+        print(f"{key:>16} {value:.2f}" if isinstance(value, float)
+              else f"{key:>16} {value}")
+
+
+if __name__ == "__main__":
+    main()
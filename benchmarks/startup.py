@@ -0,0 +1,117 @@
+"""
+Startup benchmark of loading a large point list
+
+A point list of the given number of points spread over devices is generated
+to a temporary file, then it is loaded by the collector the same way as at
+startup, no request leaves the process. The time of reading the file alone is
+reported too.
+
+    python -m benchmarks.startup --points 100000 --devices 1000
+    python -m benchmarks.startup --format ede
+"""
+from argparse import ArgumentParser, Namespace
+import json
+import logging
+import os
+import resource
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any
+
+from bacpypes.pdu import Address
+
+from telegrafbacnet.app import TelegrafApplication
+from telegrafbacnet.config import Config, PointListConfig
+from telegrafbacnet.pointlist import read_point_lists
+
+
+_OBJECT_TYPES = (("analogValue", 2), ("binaryValue", 5),
+                 ("multiStateValue", 19))
+
+
+def write_point_list(path: str, points: int, devices: int,
+                     point_format: str) -> None:
+    """Writes a point list of the points spread evenly over the devices"""
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        if point_format == "ede":
+            file.write("#Engineering-Data-Exchange - B.A.C.n.e.t\n"
+                       "PROJECT_NAME;benchmark\n"
+                       "# keyname;device obj.-instance;object-name;"
+                       "object-type;object-instance;description;"
+                       "present-value-default;min-present-value;"
+                       "max-present-value;settable;supports COV;hi-limit;"
+                       "low-limit;state-text-reference;unit-code;"
+                       "vendor-specific-address\n")
+            for device in range(devices):
+                file.write(f"D{device};{device};Device {device};8;{device};"
+                           ";;;;;N;;;;;\n")
+            for point in range(points):
+                name, code = _OBJECT_TYPES[point % len(_OBJECT_TYPES)]
+                file.write(f"P{point};{point % devices};{name} {point};"
+                           f"{code};{point};;;;;;N;;;;;\n")
+            return
+        file.write("address,device_identifier,object,properties,sensorType,"
+                   "interval\n")
+        for point in range(points):
+            device = point % devices
+            name, _ = _OBJECT_TYPES[point % len(_OBJECT_TYPES)]
+            file.write(f"10.{device >> 16 & 255}.{device >> 8 & 255}."
+                       f"{device & 255},{device},{name}:{point},"
+                       f"presentValue statusFlags,Temperature,"
+                       f"{10 if point % 2 else ''}\n")
+
+
+def run(args: Namespace) -> dict[str, Any]:
+    """Runs the benchmark and returns its results"""
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"points.{args.format}")
+        write_point_list(path, args.points, args.devices, args.format)
+        point_list = PointListConfig()
+        point_list.path = path
+        point_list.format = args.format
+        config = Config()
+        config.address = Address("127.0.0.1:0")
+        config.point_list = [point_list]
+        app = TelegrafApplication(config)
+        start = perf_counter()
+        app.load_point_lists()
+        loaded = perf_counter()
+        app.close()
+        # cteni samotne se meri znovu, uz bez registrace
+        read_start = perf_counter()
+        devices, unlocated = read_point_lists(config.point_list)
+        read = perf_counter()
+    return {
+        "format": args.format,
+        "points": sum(len(device.objects)
+                      for device in (*devices, *unlocated)),
+        "devices": len(devices) + len(unlocated),
+        "load_s": loaded - start,
+        "read_s": read - read_start,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / 1024,
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser("Point list startup benchmark")
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--format", choices=("csv", "ede"), default="csv",
+                        help="EDE devices have no address, they are only "
+                        "read and left to be located")
+    parser.add_argument("--json", action="store_true", default=False,
+                        help="Print results as JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args)
+    if args.json:
+        print(json.dumps(result))
+        return
+    for key, value in result.items():
+        print(f"{key:>12} {value:.3f}" if isinstance(value, float)
+              else f"{key:>12} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Throughput benchmark of the collector polling simulated devices on loopback
+
+Simulated devices run in separate processes, so that the measured CPU time is
+the CPU time of the collector only. Measurements are written to a null sink.
+
+    python -m benchmarks.throughput --mode rpm --devices 10,100,1000
+    python -m benchmarks.throughput --engine asyncio --devices 10,100,1000
+"""
+from argparse import ArgumentParser, Namespace
+import json
+import logging
+import multiprocessing
+from multiprocessing.queues import Queue
+import resource
+from statistics import quantiles
+import sys
+from time import monotonic, process_time
+from typing import Any
+
+from bacpypes.iocb import IOCB
+from bacpypes.pdu import Address
+from bacpypes.primitivedata import ObjectIdentifier
+from bacpypes.task import FunctionTask
+
+from telegrafbacnet.aio import AsyncTelegrafApplication
+from telegrafbacnet.app import BaseTelegrafApplication, TelegrafApplication
+from telegrafbacnet.config import Config, DeviceConfig, ObjectConfig
+from telegrafbacnet.sink import OutputSink
+
+from .simulator import BASE_DEVICE_IDENTIFIER, SimulationConfig, serve
+
+
+MODES = ("rpm", "single", "cov")
+ENGINES = ("bacpypes", "asyncio")
+
+
+class NullSink(OutputSink):
+    """Class for an output sink discarding everything but the counters"""
+
+    def write(self, data: bytes, lines: int) -> None:
+        self.batches += 1
+        self.lines += lines
+        self.bytes += len(data)
+
+
+class _LatencyRecorder(BaseTelegrafApplication):
+    """Class for the collector recording the latency of every request"""
+
+    def __init__(self, config: Config) -> None:
+        super().__init__(config)
+        self.latencies: list[float] = []
+        self.recording = False
+
+    def _dispatch_io(self, iocb: IOCB) -> None:
+        if self.recording:
+            iocb.add_callback(self._record_latency, monotonic())
+        super()._dispatch_io(iocb)
+
+    def _record_latency(self, iocb: IOCB, start: float) -> None:
+        if not iocb.ioError:
+            self.latencies.append(monotonic() - start)
+
+
+class BenchmarkApplication(_LatencyRecorder, TelegrafApplication):
+    """Class for the benchmarked collector running on the bacpypes core"""
+
+
+class AsyncBenchmarkApplication(_LatencyRecorder, AsyncTelegrafApplication):
+    """Class for the benchmarked collector running on asyncio"""
+
+
+def _collector_config(args: Namespace) -> Config:
+    config = Config()
+    config.address = Address(f"{args.host}:{args.port}")
+    config.read_interval = args.interval
+    config.cov_lifetime = max(60, int(args.warmup + args.duration) * 2)
+    config.max_device_requests = args.max_device_requests
+    config.output.flush_on_response = args.flush_on_response
+    config.engine = args.engine
+    return config
+
+
+def _devices(args: Namespace, simulation: SimulationConfig) \
+        -> list[DeviceConfig]:
+    devices: list[DeviceConfig] = []
+    for index in range(args.devices):
+        device = DeviceConfig()
+        device.address = Address(simulation.address(index))
+        device.device_identifier = BASE_DEVICE_IDENTIFIER + index
+        device.device_name = f"sim{index}"
+        device.read_multiple = args.mode == "rpm"
+        device.max_apdu_length_accepted = \
+            simulation.max_apdu_length_accepted
+        device.segmentation_supported = "noSegmentation"
+        objects: list[ObjectConfig] = []
+        for instance in range(args.objects):
+            obj = ObjectConfig()
+            obj.object_identifier = ObjectIdentifier("analogValue", instance)
+            obj.properties = ("presentValue", "statusFlags")
+            obj.cov = args.mode == "cov"
+            objects.append(obj)
+        device.objects = tuple(objects)
+        devices.append(device)
+    return devices
+
+
+def _start_simulators(args: Namespace) \
+        -> tuple[SimulationConfig, list[multiprocessing.Process]]:
+    simulation = SimulationConfig(
+        host=args.host, base_port=args.port + 1, objects=args.objects,
+        change_interval=args.interval if args.mode == "cov" else None,
+    )
+    processes: list[multiprocessing.Process] = []
+    slices = max(1, min(args.simulator_processes, args.devices))
+    per_slice = -(-args.devices // slices)
+    for first in range(0, args.devices, per_slice):
+        config = SimulationConfig(**{**simulation.__dict__, "first": first,
+                                     "count": min(per_slice,
+                                                  args.devices - first)})
+        ready = multiprocessing.Event()
+        process = multiprocessing.Process(target=serve, args=(config, ready),
+                                          daemon=True)
+        process.start()
+        if not ready.wait(60):
+            raise RuntimeError("Simulated devices did not start")
+        processes.append(process)
+    return simulation, processes
+
+
+def run_point(args: Namespace) -> dict[str, Any]:
+    """Runs a single benchmark point and returns its results"""
+    simulation, simulators = _start_simulators(args)
+    sink = NullSink()
+    config = _collector_config(args)
+    app: _LatencyRecorder = AsyncBenchmarkApplication(config) \
+        if args.engine == "asyncio" else BenchmarkApplication(config)
+    app.influx_lpr.sink = sink
+    app.register_devices(*_devices(args, simulation))
+    start: dict[str, float] = {}
+
+    def start_measurement() -> None:
+        app.influx_lpr.flush()
+        app.recording = True
+        start.update(lines=sink.lines, cpu=process_time(), time=monotonic())
+
+    # mereni ridi planovac uloh, ktery bezi v obou jadrech
+    app.task_scheduler.schedule(FunctionTask(start_measurement), args.warmup)
+    app.task_scheduler.schedule(FunctionTask(app.stop),
+                                args.warmup + args.duration)
+    app.run_forever()
+    app.close()
+    elapsed = monotonic() - start["time"]
+    cpu = process_time() - start["cpu"]
+    points = sink.lines - start["lines"]
+    for process in simulators:
+        process.kill()
+        process.join()
+    percentiles = quantiles(app.latencies, n=100) \
+        if len(app.latencies) >= 2 else [float("nan")] * 99
+    return {
+        "engine": args.engine,
+        "mode": args.mode,
+        "devices": args.devices,
+        "objects": args.objects,
+        "interval": args.interval,
+        "points": points,
+        "points_per_second": points / elapsed,
+        "cpu_us_per_point": cpu / points * 1e6 if points else float("nan"),
+        "cpu_utilization": cpu / elapsed,
+        "requests": len(app.latencies),
+        "latency_p50_ms": percentiles[49] * 1000,
+        "latency_p99_ms": percentiles[98] * 1000,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / 1024,
+    }
+
+
+def _run_point_process(args: Namespace, results: "Queue[dict[str, Any]]") \
+        -> None:
+    logging.basicConfig(level=logging.ERROR)
+    results.put(run_point(args))
+
+
+def _parse_args() -> Namespace:
+    parser = ArgumentParser("Collector throughput benchmark")
+    parser.add_argument("--mode", choices=MODES, default="rpm")
+    parser.add_argument("--engine", choices=ENGINES, default="bacpypes")
+    parser.add_argument("--devices", default="10",
+                        help="Comma separated numbers of simulated devices, "
+                        "each is run as a separate benchmark point")
+    parser.add_argument("--objects", type=int, default=20,
+                        help="Objects per simulated device")
+    parser.add_argument("--interval", type=int, default=1,
+                        help="Read interval in seconds")
+    parser.add_argument("--warmup", type=float, default=3.0,
+                        help="Seconds before the measurement starts")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="Measurement duration in seconds")
+    parser.add_argument("--max-device-requests", type=int, default=1)
+    parser.add_argument("--flush-on-response", action="store_true",
+                        default=False)
+    parser.add_argument("--simulator-processes", type=int,
+                        default=multiprocessing.cpu_count())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=47808,
+                        help="Port of the collector, simulated devices use "
+                        "the following ports")
+    parser.add_argument("--json", action="store_true", default=False,
+                        help="Print results as JSON lines")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    sweep = [int(devices) for devices in args.devices.split(",")]
+    columns = ("engine", "mode", "devices", "objects", "points_per_second",
+               "cpu_us_per_point", "latency_p50_ms", "latency_p99_ms",
+               "max_rss_mb")
+    if not args.json:
+        print(" ".join(f"{column:>17}" for column in columns))
+    for devices in sweep:
+        point = Namespace(**{**vars(args), "devices": devices})
+        # bacpypes core nelze spustit vicekrat, kazdy bod bezi v novem procesu
+        results: "Queue[dict[str, Any]]" = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_run_point_process,
+                                          args=(point, results))
+        process.start()
+        process.join()
+        if results.empty():
+            raise RuntimeError(f"Benchmark of {devices} devices failed")
+        result = results.get()
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(" ".join(f"{result[column]:>17.2f}"
+                           if isinstance(result[column], float)
+                           else f"{result[column]:>17}"
+                           for column in columns))
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
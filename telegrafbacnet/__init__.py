@@ -1,19 +1,37 @@
 from argparse import ArgumentParser
+from functools import partial
 import logging
 from os.path import isdir
 from sys import stderr
 
-from bacpypes.core import run
-
 from tomlconfig import ConfigError, parse
 
-from .app import TelegrafApplication
 from .config import Config
+from .engine import create_application
+from .shard import run_sharded
 
 
 _logger = logging.getLogger(__name__)
 
 
+def load_config(path: str | None, debug: bool = False) -> Config:
+    """
+    Returns the config loaded from the file or from files in the directory at
+    the path
+    """
+    if path is None:
+        config = parse(Config, conf_d_path=path)
+    else:
+        try:
+            config = parse(Config, conf_d_path=path) \
+                if isdir(path) else parse(Config, conf_path=path)
+        except FileNotFoundError as ex:
+            raise ConfigError("No configuration!") from ex
+    if debug:
+        config.debug = True
+    return config
+
+
 def main() -> None:
     parser = ArgumentParser("Telegraf plugin for BACnet")
     parser.add_argument("--debug", help="Show debug output on stderr",
@@ -24,16 +42,8 @@ def main() -> None:
                         "order")
     args = parser.parse_args()
 
-    if args.config is None:
-        config = parse(Config, conf_d_path=args.config)
-    else:
-        try:
-            config = parse(Config, conf_d_path=args.config) \
-                if isdir(args.config) else parse(Config, conf_path=args.config)
-        except FileNotFoundError as ex:
-            raise ConfigError("No configuration!") from ex
-    if args.debug:
-        config.debug = True
+    loader = partial(load_config, args.config, args.debug)
+    config = loader()
 
     log_handler = logging.StreamHandler(stderr)
     log_handler.setFormatter(
@@ -42,8 +52,15 @@ def main() -> None:
     _logger.addHandler(log_handler)
     _logger.setLevel(logging.DEBUG if config.debug else logging.INFO)
 
-    app = TelegrafApplication(config) # Tady se zavola konstruktor.
+    if config.sharding.workers > 1:
+        run_sharded(config, loader, args.config)
+        return
+
+    app = create_application(config) # Tady se zavola konstruktor.
     app.register_devices(*config.device)
+    app.load_point_lists()
+    app.load_discovery_cache()
+    app.enable_reload(loader, args.config)
 
-    run() # zajimavy je, ze je to bez parametru. Nejak to zrejme
-          # zpracuje ty objekty app vyse. Ale jak to o nich vi? 
+    app.run_forever()
+    app.close()
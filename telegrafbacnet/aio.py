@@ -0,0 +1,425 @@
+import asyncio
+import logging
+from signal import SIGHUP, SIGINT, SIGTERM
+import socket
+from typing import Any, BinaryIO, Callable
+
+from bacpypes.apdu import (
+    APDU,
+    AbortPDU,
+    AbortReason,
+    ComplexAckPDU,
+    ConfirmedRequestPDU,
+    ConfirmedRequestSequence,
+    Error,
+    ErrorPDU,
+    IAmRequest,
+    RejectPDU,
+    RejectReason,
+    SimpleAckPDU,
+    UnconfirmedRequestPDU,
+    UnconfirmedRequestSequence,
+    WhoIsRequest,
+    apdu_types,
+    complex_ack_types,
+    encode_max_apdu_length_accepted,
+    error_types,
+    unconfirmed_request_types,
+)
+from bacpypes.bvll import (
+    BVLPDU,
+    ForwardedNPDU,
+    OriginalBroadcastNPDU,
+    OriginalUnicastNPDU,
+    bvl_pdu_types,
+)
+from bacpypes.errors import DecodingError
+from bacpypes.iocb import IOCB, IOController
+from bacpypes.npdu import (
+    NPDU,
+    IAmRouterToNetwork,
+    WhoIsRouterToNetwork,
+)
+from bacpypes.pdu import (
+    PDU,
+    Address,
+    GlobalBroadcast,
+    RemoteStation,
+    unpack_ip_addr,
+)
+
+from .app import BaseTelegrafApplication
+from .config import Config
+from .shard import ShardLink
+
+
+_logger = logging.getLogger(__name__)
+
+IPAddress = tuple[str, int]
+
+_ACK_TYPES = (SimpleAckPDU, ComplexAckPDU)
+_CONFIRMATION_TYPES = (SimpleAckPDU, ComplexAckPDU, ErrorPDU, RejectPDU,
+                       AbortPDU)
+
+
+class RequestError(Exception):
+    """
+    Exception raised when a confirmed request fails, the error is the
+    ErrorPDU, RejectPDU or AbortPDU the request was answered with
+    """
+
+    def __init__(self, error: Any) -> None:
+        super().__init__(error)
+        self.error = error
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, app: "AsyncTelegrafApplication") -> None:
+        self.app = app
+
+    def datagram_received(self, data: bytes, addr: IPAddress) -> None:
+        self.app.process_datagram(data, addr)
+
+    def error_received(self, exc: Exception) -> None:
+        _logger.error("UDP error: %r", exc)
+
+
+def _decode_apdu(pdu: PDU) -> APDU | None:
+    """Decodes the octets to a request, acknowledgement or error APDU"""
+    apdu = APDU()
+    apdu.decode(pdu)
+    apdu_type = apdu_types.get(apdu.apduType)
+    if apdu_type is None:
+        return None
+    decoded = apdu_type()
+    decoded.decode(apdu)
+    if isinstance(decoded, ComplexAckPDU):
+        if decoded.apduSeg:
+            return decoded
+        apdu_type = complex_ack_types.get(decoded.apduService)
+    elif isinstance(decoded, ErrorPDU):
+        apdu_type = error_types.get(decoded.apduService, Error)
+    elif isinstance(decoded, UnconfirmedRequestPDU):
+        apdu_type = unconfirmed_request_types.get(decoded.apduService)
+    else:
+        return decoded
+    if apdu_type is None:
+        return None
+    service = apdu_type()
+    service.decode(decoded)
+    return service
+
+
+class AsyncTelegrafApplication(BaseTelegrafApplication):
+    """
+    Class for the application running on asyncio instead of the bacpypes core
+
+    BACnet/IP datagrams are sent and received through asyncio datagram
+    endpoints, bacpypes is used only to encode and decode them. Confirmed
+    requests are matched to their responses by the address and invoke ID and
+    sent again after apdu_timeout up to number_of_apdu_retries times.
+    Segmented responses are not supported, requests are split so that each
+    response fits into a single APDU. Remote stations are reached through
+    routers learned from received traffic and Who-Is-Router-To-Network.
+    """
+
+    def __init__(self, config: Config, shard: ShardLink | None = None,
+                 stream: BinaryIO | None = None):
+        self._adapt_config(config)
+        IOController.__init__(self)
+        super().__init__(config, shard, stream)
+        self.local_address: IPAddress = config.address.addrTuple
+        broadcast = config.address.addrBroadcastTuple
+        if broadcast == self.local_address:
+            broadcast = ("255.255.255.255", self.local_address[1])
+        self.broadcast_address: IPAddress | None = broadcast
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.transport: asyncio.DatagramTransport | None = None
+        self.broadcast_transport: asyncio.DatagramTransport | None = None
+        self.stopped: asyncio.Event | None = None
+        self.transactions: dict[tuple[Address, int], asyncio.Future[Any]] = {}
+        self.invoke_ids: dict[Address, int] = {}
+        self.routers: dict[int, IPAddress] = {}
+        self.pending: set[asyncio.Task[None]] = set()
+
+    def _adapt_config(self, config: Config) -> None:
+        if config.segmentation_supported != "noSegmentation":
+            _logger.info("The asyncio engine does not support segmentation, "
+                         "ignoring segmentation_supported = %r",
+                         config.segmentation_supported)
+            config.segmentation_supported = "noSegmentation"
+
+    # Encoding
+
+    def _datagram(self, apdu: Any, destination: Address) \
+            -> tuple[bytes, IPAddress]:
+        """Returns the APDU encoded to a BACnet/IP datagram and its target"""
+        npdu = NPDU()
+        encoded = APDU()
+        apdu.encode(encoded)
+        encoded.encode(npdu)
+        return self._npdu_datagram(npdu, destination)
+
+    def _npdu_datagram(self, npdu: NPDU, destination: Address) \
+            -> tuple[bytes, IPAddress]:
+        broadcast = destination.addrType in (Address.localBroadcastAddr,
+                                             Address.globalBroadcastAddr)
+        if destination.addrType == Address.localStationAddr:
+            target = unpack_ip_addr(destination.addrAddr)
+        elif destination.addrType == Address.remoteStationAddr:
+            router = self.routers.get(destination.addrNet)
+            if router is None:
+                self._find_router(destination.addrNet)
+                raise RequestError(RuntimeError(
+                    f"No router to network {destination.addrNet} is known"))
+            target = router
+            npdu.npduDADR = destination
+            npdu.npduHopCount = 255
+        elif broadcast and self.broadcast_address is not None:
+            target = self.broadcast_address
+            if destination.addrType == Address.globalBroadcastAddr:
+                npdu.npduDADR = destination
+                npdu.npduHopCount = 255
+        else:
+            raise RequestError(RuntimeError(
+                f"Unsupported destination {destination!r}"))
+        pdu = PDU()
+        npdu.encode(pdu)
+        bvlpdu = BVLPDU()
+        message = OriginalBroadcastNPDU(pdu) if broadcast \
+            else OriginalUnicastNPDU(pdu)
+        message.encode(bvlpdu)
+        datagram = PDU()
+        bvlpdu.encode(datagram)
+        return bytes(datagram.pduData), target
+
+    def _find_router(self, network: int) -> None:
+        if self.transport is None or self.broadcast_address is None:
+            return
+        _logger.debug("Looking for a router to network %d", network)
+        npdu = NPDU()
+        WhoIsRouterToNetwork(network).encode(npdu)
+        data, target = self._npdu_datagram(npdu, Address("*"))
+        self.transport.sendto(data, target)
+
+    # Receiving
+
+    def process_datagram(self, data: bytes, addr: IPAddress) -> None:
+        """Processes a received BACnet/IP datagram"""
+        if addr == self.local_address:
+            return
+        try:
+            bvlpdu = BVLPDU()
+            bvlpdu.decode(PDU(data))
+            message_type = bvl_pdu_types.get(bvlpdu.bvlciFunction)
+            if message_type not in (OriginalUnicastNPDU,
+                                    OriginalBroadcastNPDU, ForwardedNPDU):
+                return
+            message = message_type()
+            message.decode(bvlpdu)
+            source = message.bvlciAddress \
+                if isinstance(message, ForwardedNPDU) else Address(addr)
+            npdu = NPDU()
+            npdu.decode(PDU(message.pduData))
+            if npdu.npduNetMessage is not None:
+                if npdu.npduNetMessage == IAmRouterToNetwork.messageType:
+                    routers = IAmRouterToNetwork()
+                    routers.decode(npdu)
+                    for network in routers.iartnNetworkList:
+                        self.routers[network] = addr
+                return
+            if npdu.npduSADR is not None:
+                self.routers[npdu.npduSADR.addrNet] = addr
+                source = RemoteStation(npdu.npduSADR.addrNet,
+                                       npdu.npduSADR.addrAddr)
+            apdu = _decode_apdu(PDU(npdu.pduData, source=source))
+        except (DecodingError, ValueError, IndexError) as ex:
+            _logger.debug("Failed to decode a datagram from %r: %r", addr, ex)
+            return
+        if apdu is None:
+            return
+        if isinstance(apdu, _CONFIRMATION_TYPES):
+            self._process_confirmation(apdu)
+        elif isinstance(apdu, UnconfirmedRequestSequence):
+            handler = getattr(self, f"do_{type(apdu).__name__}", None)
+            if handler is not None:
+                handler(apdu)
+        elif isinstance(apdu, ConfirmedRequestPDU):
+            # kolektor zadne sluzby neposkytuje, jen cte
+            reject = RejectPDU(reason=RejectReason.enumerations[
+                "unrecognizedService"])
+            reject.set_context(apdu)
+            self._send(reject, apdu.pduSource)
+
+    def _process_confirmation(self, apdu: APDU) -> None:
+        future = self.transactions.get((apdu.pduSource, apdu.apduInvokeID))
+        if future is None or future.done():
+            _logger.debug("No active request for %r from %r",
+                          apdu.apduInvokeID, apdu.pduSource)
+            return
+        if isinstance(apdu, ComplexAckPDU) and apdu.apduSeg:
+            _logger.error("Segmented response from %r is not supported",
+                          apdu.pduSource)
+            # zarizeni odpovedelo, neni to vypadek
+            apdu = AbortPDU(True, apdu.apduInvokeID,
+                            AbortReason.enumerations[
+                                "segmentationNotSupported"])
+        future.set_result(apdu)
+
+    def do_WhoIsRequest(self, apdu: WhoIsRequest) -> None:
+        low_limit = apdu.deviceInstanceRangeLowLimit
+        high_limit = apdu.deviceInstanceRangeHighLimit
+        if low_limit is not None and not low_limit \
+                <= self.config.device_identifier <= high_limit:
+            return
+        self._send(IAmRequest(
+            iAmDeviceIdentifier=("device", self.config.device_identifier),
+            maxAPDULengthAccepted=self.config.max_apdu_length_accepted,
+            segmentationSupported=self.config.segmentation_supported,
+            vendorID=self.config.vendor_identifier,
+        ), GlobalBroadcast())
+
+    # Sending
+
+    def _send(self, apdu: Any, destination: Address) -> None:
+        if self.transport is None or self.transport.is_closing():
+            return
+        try:
+            data, target = self._datagram(apdu, destination)
+        except RequestError as ex:
+            _logger.error("Failed to send %r: %r", type(apdu), ex.error)
+            return
+        self.transport.sendto(data, target)
+
+    def _next_invoke_id(self, address: Address) -> int:
+        invoke_id = self.invoke_ids.get(address, 0)
+        for _ in range(256):
+            invoke_id = (invoke_id + 1) % 256
+            if (address, invoke_id) not in self.transactions:
+                break
+        else:
+            raise RequestError(RuntimeError(
+                f"No free invoke ID for {address!r}"))
+        self.invoke_ids[address] = invoke_id
+        return invoke_id
+
+    async def request(self, apdu: ConfirmedRequestSequence) -> APDU:
+        """
+        Sends the confirmed request and returns the acknowledgement, raises
+        RequestError if the request is answered with an error or the device
+        does not respond
+        """
+        assert self.loop is not None and self.transport is not None
+        destination = apdu.pduDestination
+        invoke_id = self._next_invoke_id(destination)
+        apdu.apduInvokeID = invoke_id
+        apdu.apduSA = False
+        apdu.apduMaxSegs = 0
+        apdu.apduMaxResp = encode_max_apdu_length_accepted(
+            self.config.max_apdu_length_accepted)
+        apdu.pduExpectingReply = True
+        data, target = self._datagram(apdu, destination)
+        key = (destination, invoke_id)
+        future = self.transactions[key] = self.loop.create_future()
+        try:
+            for _ in range(self.config.number_of_apdu_retries + 1):
+                if self.stopped is not None and self.stopped.is_set():
+                    raise asyncio.CancelledError()
+                self.transport.sendto(data, target)
+                try:
+                    response = await asyncio.wait_for(
+                        asyncio.shield(future),
+                        self.config.apdu_timeout / 1000,
+                    )
+                except asyncio.TimeoutError:
+                    continue
+                break
+            else:
+                raise RequestError(AbortPDU(False, invoke_id,
+                                            AbortReason.enumerations[
+                                                "noResponse"]))
+        finally:
+            del self.transactions[key]
+        if not isinstance(response, _ACK_TYPES):
+            raise RequestError(response)
+        return response
+
+    async def _process_iocb(self, iocb: IOCB) -> None:
+        try:
+            response = await self.request(iocb.args[0])
+        except RequestError as ex:
+            iocb.abort(ex.error)
+            return
+        iocb.complete(response)
+
+    def _send_io(self, iocb: IOCB) -> None:
+        assert self.loop is not None
+        if self.stopped is not None and self.stopped.is_set():
+            return
+        task = self.loop.create_task(self._process_iocb(iocb))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    def _defer(self, function: Callable[..., None], *args: Any) -> None:
+        assert self.loop is not None
+        self.loop.call_soon(function, *args)
+
+    def who_is(self, low_limit: int | None = None,
+               high_limit: int | None = None,
+               address: Address | None = None) -> None:
+        who_is = WhoIsRequest()
+        if low_limit is not None and high_limit is not None:
+            who_is.deviceInstanceRangeLowLimit = low_limit
+            who_is.deviceInstanceRangeHighLimit = high_limit
+        self._send(who_is, address or GlobalBroadcast())
+
+    # Event loop
+
+    def _open_socket(self, address: IPAddress) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.bind(address)
+        return sock
+
+    def _tick(self) -> None:
+        assert self.loop is not None
+        self.task_scheduler.process_task()
+        self.loop.call_later(self.task_scheduler.tick, self._tick)
+
+    async def _serve(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+        for signum in (SIGINT, SIGTERM):
+            self.loop.add_signal_handler(signum, self.stop)
+        if self.config_loader is not None:
+            self.loop.add_signal_handler(SIGHUP, self.reload)
+        self.transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: _DatagramProtocol(self),
+            sock=self._open_socket(self.local_address),
+        )
+        # na Linuxu socket navazany na unicast adresu broadcasty nedostane
+        broadcast = self.config.address.addrBroadcastTuple
+        if broadcast is not None and broadcast != self.local_address:
+            self.broadcast_transport, _ = \
+                await self.loop.create_datagram_endpoint(
+                    lambda: _DatagramProtocol(self),
+                    sock=self._open_socket(broadcast),
+                )
+        _logger.debug("Listening on %r", self.local_address)
+        self._tick()
+        await self.stopped.wait()
+        for task in list(self.pending):
+            task.cancel()
+        # zrusene pozadavky musi dobehnout, nez se transport zavre
+        await asyncio.gather(*self.pending, return_exceptions=True)
+        self.transport.close()
+        if self.broadcast_transport is not None:
+            self.broadcast_transport.close()
+
+    def run_forever(self) -> None:
+        asyncio.run(self._serve())
+
+    def stop(self) -> None:
+        if self.stopped is not None:
+            self.stopped.set()
@@ -1,110 +1,237 @@
+from copy import copy
+import gc
 import logging
 from os import getpid
-from typing import Any
+from signal import SIGHUP, signal
+from time import monotonic, perf_counter
+from typing import Any, BinaryIO, Callable, Iterator
 
 from bacpypes.apdu import (
+    AbortPDU,
+    APDU,
+    ComplexAckPDU,
     ConfirmedCOVNotificationRequest,
+    ErrorPDU,
     IAmRequest,
     ReadPropertyACK,
     ReadPropertyMultipleACK,
+    ReadPropertyMultipleRequest,
     ReadPropertyRequest,
+    RejectPDU,
+    SimpleAckPDU,
 )
 from bacpypes.app import BIPSimpleApplication
-from bacpypes.constructeddata import Array, ArrayOf
-from bacpypes.core import deferred
-from bacpypes.iocb import IOCB
+from bacpypes.basetypes import ServicesSupported
+from bacpypes.core import deferred, run, stop
+from bacpypes.iocb import IOCB, IOController
 from bacpypes.local.device import LocalDeviceObject
-from bacpypes.object import get_datatype, get_object_class
+from bacpypes.object import get_object_class
 from bacpypes.pdu import Address
-from bacpypes.primitivedata import ObjectIdentifier, Unsigned
+from bacpypes.primitivedata import ObjectIdentifier
+from bacpypes.service.device import WhoIsIAmServices
 
-from .config import Config, DeviceConfig, DiscoveryGroupConfig, ObjectConfig
-from .influx import InfluxLPR
+from tomlconfig import ConfigError
+
+from .cache import DiscoveryCache
+from .config import Config, DeviceConfig, ObjectConfig
+from .cov import COVManager
+from .decode import get_decode_plan
+from .discovery import (
+    DatabaseRevisionReader,
+    DiscoveryQueue,
+    ObjectListReader,
+)
+from .filter import OutputFilter
+from .health import DeviceHealth, HealthMonitor
+from .influx import InfluxLPR, escape_tag, line_prefix
+from .pointlist import read_point_lists
+from .scheduler import RequestScheduler
+from .shard import ShardLink
 from .tasks import (
+    ConfigWatchTask,
     DeviceReadTask,
     DiscoveryTask,
+    FlushTask,
+    LocateTask,
     ObjectReadTask,
     SubscribeCOVTask,
+    TelemetryTask,
+    snap_interval,
 )
+from .telemetry import TaskOverruns, Telemetry
+from .utils import first, is_service_unsupported
+from .wheel import TimingWheel
 
 
 _logger = logging.getLogger(__name__)
 
+DeviceTask = DeviceReadTask | ObjectReadTask | SubscribeCOVTask
+ConfigLoader = Callable[[], Config]
+
+
+def _supports_service(services: list[int], service: str) -> bool:
+    index = ServicesSupported.bitNames[service]
+    return index < len(services) and bool(services[index])
+
+
+class BaseTelegrafApplication(IOController):
+    """
+    Base class of the application with the logic shared by all engines
 
-class TelegrafApplication(BIPSimpleApplication):
-    """Main BACnet application class"""
+    Engines provide sending of requests, the event loop and delivery of
+    received unconfirmed requests to the do_<service> methods.
+    """
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, shard: ShardLink | None = None,
+                 stream: BinaryIO | None = None):
         # _logger.info("======================")
         # _logger.info("initialization")
         # _logger.info(config.device_name)
         # _logger.info(config)
         
-        local_device = LocalDeviceObject(
-            objectName=config.device_name,
-            objectIdentifier=config.device_identifier,
-            maxApduLengthAccepted=config.max_apdu_length_accepted,
-            segmentationSupported=config.segmentation_supported,
-            vendorIdentifier=config.vendor_identifier,
-        )
-        super().__init__(local_device, config.address)
         self.config = config
         self.devices: dict[Address, DeviceConfig] = {}
-        self.influx_lpr = InfluxLPR()
-        if self.config.discovery.enabled:
-            DiscoveryTask(self, self.config.discovery).install_task()
-        self.tags_mapping = {}
+        self.device_tasks: dict[Address, list[DeviceTask]] = {}
+        self.object_list_readers: dict[Address, ObjectListReader] = {}
+        self.discovered_devices: set[Address] = set()
+        self.unverified_devices: set[Address] = set()
+        # devices from point lists waiting for I-Am with their address
+        self.unlocated_devices: dict[int, DeviceConfig] = {}
+        self.locate_task: LocateTask | None = None
+        self.config_loader: ConfigLoader | None = None
+        self.config_path: str | None = None
+        # stav fallbacku se drzi mimo konfiguraci, aby ji reload porovnal
+        self.single_read_devices: set[Address] = set()
+        self.polled_objects: set[tuple[Address, tuple[str, int]]] = set()
+        self.unknown_datatypes: set[tuple[Any, Any]] = set()
+        self.request_scheduler = RequestScheduler(
+            self._dispatch_io, self.config.max_device_requests,
+            self.config.max_network_requests,
+        )
+        self.task_scheduler = TimingWheel()
+        self.influx_lpr = InfluxLPR(self.config.output, stream)
+        self.device_health = HealthMonitor(
+            self.task_scheduler, self.config.health, self._probe_device,
+            self._print_device_state,
+        )
+        self.cov_manager = COVManager(self._fall_back_to_polling)
+        self.telemetry: Telemetry | None = None
+        if self.config.telemetry.enabled:
+            self.telemetry = Telemetry(self.config.telemetry, self.influx_lpr,
+                                       self._telemetry_gauges,
+                                       self._telemetry_overruns)
+            TelemetryTask(self.task_scheduler, self.telemetry,
+                          self.config.telemetry.interval).install_task()
+        self.discovery_cache = DiscoveryCache(
+            self.task_scheduler, self.config.discovery.cache_file,
+        ) if self.config.discovery.enabled \
+            and self.config.discovery.cache_file else None
+        FlushTask(self.task_scheduler, self.influx_lpr,
+                  self.config.output.flush_interval).install_task()
+        self.discovery_queue = DiscoveryQueue(
+            self.task_scheduler, self.config.discovery, self._interrogate,
+        )
+        self.shard = shard
+        if self.shard is not None:
+            self.shard.attach(self.task_scheduler, self._process_i_am)
+        if self.config.discovery.enabled \
+                and (self.shard is None or self.shard.discovers):
+            DiscoveryTask(self.task_scheduler, self,
+                          self.config.discovery).install_task()
+        self.tags_mapping: dict[tuple[str, str, int], str | None] = {}
+        self.line_prefixes: \
+            dict[Address, dict[tuple[tuple[str, int], int | None],
+                               str | None]] = {}
+        self.output_filters: \
+            dict[Address, dict[tuple[str, int], OutputFilter]] = {}
+
+    def _device_line_tags(self, device: DeviceConfig) -> tuple[str, str, str]:
+        """
+        Returns the address of the device as a string, its escaped tag and
+        the escaped tags following object tags in line prefixes of all
+        objects of the device
+        """
+        address = str(device.address)
+        tags: list[tuple[str, str | int]] = []
+        if device.device_identifier is not None:
+            tags.append(("deviceIdentifier", device.device_identifier))
+        if device.device_name is not None:
+            tags.append(("deviceName", device.device_name))
+        return address, escape_tag(address), line_prefix("", *tags)
+
+    def _build_line_prefix(self, device: DeviceConfig,
+                           object_identifier: tuple[str, int],
+                           index: int | None,
+                           device_tags: tuple[str, str, str] | None = None) \
+            -> str | None:
+        if device.device_name is None and device.device_identifier is None:
+            return None
+        address, address_tag, device_suffix = device_tags \
+            or self._device_line_tags(device)
+        sensorType = self.tags_mapping.get((address,object_identifier[0], object_identifier[1]), 'Unidentified')
+        prefix = f"bacnet,deviceAddress={address_tag}" \
+            f",objectType={escape_tag(object_identifier[0])}" \
+            f",objectInstanceNumber={object_identifier[1]}" \
+            f",sensorType={escape_tag(sensorType)}{device_suffix}"
+        if index is not None:
+            prefix += f",propertyArrayIndex={index}"
+        return prefix
+
+    def _invalidate_line_prefixes(self, address: Address) -> None:
+        """Drops cached line prefixes of the device at the address"""
+        self.line_prefixes.pop(address, None)
+
+    def _warn_unknown_datatype(self, address: Address, object_type: Any,
+                               prop: Any) -> None:
+        """Warns once per object type and property about an unknown datatype"""
+        key = (object_type, prop)
+        if key in self.unknown_datatypes:
+            return
+        self.unknown_datatypes.add(key)
+        _logger.warning("unknown datatype of %r of %r in a response from %r",
+                        prop, object_type, address)
 
-            
     def _print_measurement(self, address: Address,
                            object_identifier: tuple[str, int],
                            prop: str, value: Any,
                            index: int | None = None) -> None:
-        
-        if address not in self.devices:
-            _logger.warning("Skipping measurement from unknown device %r",
-                            address)
-            return
-        device = self.devices[address]
-        # _logger.info(" === device info in print_measurement === ")
-        # _logger.info(device)
-        # _logger.info(object_identifier)
-        if device.device_name is None and device.device_identifier is None:
+        prefixes = self.line_prefixes.get(address)
+        if prefixes is None:
+            if address not in self.devices:
+                _logger.warning("Skipping measurement from unknown device %r",
+                                address)
+                return
+            prefixes = self.line_prefixes[address] = {}
+        key = (object_identifier, index)
+        try:
+            prefix = prefixes[key]
+        except KeyError:
+            prefix = prefixes[key] = self._build_line_prefix(
+                self.devices[address], object_identifier, index)
+        if prefix is None:
             _logger.error("%r has neither identifier or name, skipping",
-                          device)
+                          self.devices[address])
             return
-        sensorType = self.tags_mapping.get((address.dict_contents(),object_identifier[0], object_identifier[1]), 'Unidentified')
-        tags: list[tuple[str, str | int | float]] = [
-            ("deviceAddress", str(address)),
-            ("objectType", object_identifier[0]),
-            ("objectInstanceNumber", object_identifier[1]),
-            ("sensorType", sensorType),
-        ]
-        if device.device_identifier is not None:
-            tags.append(("deviceIdentifier", device.device_identifier))
-        if device.device_name is not None:
-            tags.append(("deviceName", device.device_name))
-        if index is not None:
-            tags.append(("propertyArrayIndex", index))
-        self.influx_lpr.print(prop, value, *tags)
+        output_filters = self.output_filters.get(address)
+        if output_filters:
+            output_filter = output_filters.get(object_identifier)
+            if output_filter is not None \
+                    and not output_filter.should_report(prop, index, value):
+                return
+        self.influx_lpr.print_prefixed(prefix, prop, value)
 
     # Measurements reading
 
     def _process_read_property_ack(self, apdu: ReadPropertyACK) -> None:
-        datatype = get_datatype(apdu.objectIdentifier[0],
-                                apdu.propertyIdentifier)
-        if not datatype:
-            _logger.error("unknown datatype in a response from %r",
-                          apdu.pduSource)
+        decode = get_decode_plan(apdu.objectIdentifier[0],
+                                 apdu.propertyIdentifier,
+                                 apdu.propertyArrayIndex)
+        if decode is None:
+            self._warn_unknown_datatype(apdu.pduSource,
+                                        apdu.objectIdentifier[0],
+                                        apdu.propertyIdentifier)
             return
-
-        if issubclass(datatype, Array) and apdu.propertyArrayIndex is not None:
-            if apdu.propertyArrayIndex == 0:
-                value = apdu.propertyValue.cast_out(Unsigned)
-            else:
-                value = apdu.propertyValue.cast_out(datatype.subtype)
-        else:
-            value = apdu.propertyValue.cast_out(datatype)
+        value = decode(apdu.propertyValue)
         # _logger.info("=============================================")
         # _logger.info("pduSource %r", apdu.pduSource)
         # _logger.info("ObjectIdentifier %r", apdu.objectIdentifier)
@@ -127,36 +254,23 @@ class TelegrafApplication(BIPSimpleApplication):
                     _logger.error("Error while ReadingPropertyMultiple %r",
                                   element.readResult.propertyAccessError)
                     continue
-                                      # (objType, property)
-                                      # vraci datatype class.                       
-                datatype = get_datatype(result.objectIdentifier[0],  # tohle nevim, muselo by se zjistit z dokumentace, ale podle vsecho kontroluje, zda vraceny typ odpovida tomu ocekavanemu. 
-                                        element.propertyIdentifier) # element.propertyIdentifier je v mem pripade presentValue
-                if not datatype:
-                    _logger.error("unknown datatype in a response from %r",
-                                  apdu.pduSource)
-                    continue
-
-                # je to pole
-                #
-                # tady se z apdu ve tvaru
+                # plan pro (objType, property, arrayIndex) se hleda jen
+                # jednou, vraci funkci, ktera z apdu ve tvaru
                 #               <bacpypes.primitivedata.Tag(real) instance at 0x7f8a8cfea380>
                                     # tagClass = 0 application
                                     # tagNumber = 4 real
                                     # tagLVT = 4
                                     # tagData = '41.aa.66.66'
-                # zkonstruuje ta hodnota pro zapis do influx. Napr. 24,58 stupne.                     
-                if issubclass(datatype, Array) \
-                        and element.propertyArrayIndex is not None:
-                    if element.propertyArrayIndex == 0:
-                        value = element.readResult.propertyValue.cast_out(
-                            Unsigned)
-                    else:
-                        value = element.readResult.propertyValue.cast_out(
-                            datatype.subtype,
-                        )
-                # neni to pole (vetsinou v mem pripade)        
-                else:
-                    value = element.readResult.propertyValue.cast_out(datatype)
+                # zkonstruuje ta hodnota pro zapis do influx. Napr. 24,58 stupne.
+                decode = get_decode_plan(result.objectIdentifier[0],
+                                         element.propertyIdentifier,
+                                         element.propertyArrayIndex)
+                if decode is None:
+                    self._warn_unknown_datatype(apdu.pduSource,
+                                                result.objectIdentifier[0],
+                                                element.propertyIdentifier)
+                    continue
+                value = decode(element.readResult.propertyValue)
 
                 # Tohle uz jsou vracene responses z bacnet device. V tech jsou jen informace o tom,
                 # jaky je to objekt a property a jaka je hodnota.
@@ -225,6 +339,11 @@ class TelegrafApplication(BIPSimpleApplication):
     # Jako parametr se predava pouze apdu, tedy Application Protocol Data Unit. 
     def _process_response_iocb(self, iocb: IOCB, **_: Any) -> None:
         if iocb.ioError:
+            request = iocb.args[0]
+            if isinstance(request, ReadPropertyMultipleRequest) \
+                    and is_service_unsupported(iocb.ioError):
+                self._fall_back_to_single_reads(request.pduDestination)
+                return
             _logger.error("Response IOCB error: %r", iocb.ioError)
             return
         if not iocb.ioResponse:
@@ -233,12 +352,21 @@ class TelegrafApplication(BIPSimpleApplication):
 
         apdu = iocb.ioResponse
         _logger.debug("Received %r from %r", type(apdu), apdu.pduSource)
+        start = perf_counter()
         if isinstance(apdu, ReadPropertyACK):
             self._process_read_property_ack(apdu)
+            elements = 1
         elif isinstance(apdu, ReadPropertyMultipleACK):
             self._process_read_property_multiple_ack(apdu)
+            elements = sum(len(result.listOfResults)
+                           for result in apdu.listOfReadAccessResults)
         else:
             _logger.debug("Unhandled response type %r", type(apdu))
+            return
+        if self.telemetry is not None:
+            self.telemetry.record_decode(perf_counter() - start, elements)
+        if self.config.output.flush_on_response:
+            self.influx_lpr.flush()
 
     def do_UnconfirmedCOVNotificationRequest(
             self, apdu: ConfirmedCOVNotificationRequest,
@@ -247,11 +375,20 @@ class TelegrafApplication(BIPSimpleApplication):
             _logger.debug("Ignoring COV notification not intended to me")
             return
         _logger.debug("Received COV notification from %r", apdu.pduSource)
+        self.cov_manager.process_notification(apdu.pduSource,
+                                              apdu.monitoredObjectIdentifier)
+        start = perf_counter()
 
         for element in apdu.listOfValues:
-            element_value = element.value.tagList
-            if len(element_value) == 1:
-                element_value = element_value[0].app_to_object().value
+            decode = get_decode_plan(apdu.monitoredObjectIdentifier[0],
+                                     element.propertyIdentifier,
+                                     element.propertyArrayIndex)
+            if decode is not None:
+                element_value = decode(element.value)
+            else:
+                element_value = element.value.tagList
+                if len(element_value) == 1:
+                    element_value = element_value[0].app_to_object().value
 
             # _logger.info("=============================================")
             # _logger.info("pduSource %r", apdu.pduSource)
@@ -262,31 +399,91 @@ class TelegrafApplication(BIPSimpleApplication):
             self._print_measurement(apdu.pduSource,
                                     apdu.monitoredObjectIdentifier,
                                     element.propertyIdentifier, element_value)
+        if self.telemetry is not None:
+            self.telemetry.record_decode(perf_counter() - start,
+                                         len(apdu.listOfValues))
+        if self.config.output.flush_on_response:
+            self.influx_lpr.flush()
 
     # Device discovery
 
-    def _process_read_object_list_response(
-        self, iocb: IOCB, device: DeviceConfig,
-        discovery_group: DiscoveryGroupConfig,
-    ) -> None:
-        if iocb.ioError:
-            _logger.error("Error reading object list of %r: %r", device,
-                          iocb.ioError)
+    def load_point_lists(self) -> None:
+        """
+        Registers devices from point list files, devices without an address
+        are registered once they answer a WhoIsRequest for their identifier
+        """
+        if not self.config.point_list:
             return
-        if not iocb.ioResponse:
-            _logger.error("No error nor response in IOCB response")
+        start = perf_counter()
+        # konfigurace zije po celou dobu behu, GC ji nemusi prochazet
+        gc.disable()
+        try:
+            devices, unlocated = read_point_lists(self.config.point_list)
+            if self.shard is not None:
+                devices = [device for device in devices
+                           if self.shard.owns(device.address)]
+            self.register_devices(*devices)
+        finally:
+            gc.enable()
+        gc.freeze()
+        for device in unlocated:
+            assert device.device_identifier is not None
+            self.unlocated_devices[device.device_identifier] = device
+        _logger.info("Registered %d points of %d devices from point lists "
+                     "in %.2f s, %d devices to locate",
+                     sum(len(device.objects) for device in devices),
+                     len(devices), perf_counter() - start, len(unlocated))
+        self._locate_devices()
+
+    def _locate_devices(self) -> None:
+        if not self.unlocated_devices \
+                or (self.shard is not None and not self.shard.discovers):
+            return
+        if self.locate_task is not None and not self.locate_task.cancelled:
             return
+        self.locate_task = LocateTask(self.task_scheduler, self,
+                                      self.unlocated_devices,
+                                      self.config.discovery)
+        self.locate_task.install_task()
 
-        apdu = iocb.ioResponse
-        _logger.debug("Received %r from %r", type(apdu), apdu.pduSource)
-        if not isinstance(apdu, ReadPropertyACK):
-            _logger.error("APDU has invalid type %r", apdu)
+    def load_discovery_cache(self) -> None:
+        """
+        Registers devices from the discovery cache, they are revalidated once
+        they answer the discovery
+        """
+        if self.discovery_cache is None:
             return
-        if apdu.pduSource in self.devices:
+        for device, object_list in self.discovery_cache.load():
+            self._register_discovered_device(device, object_list, cached=True)
+
+    def _register_discovered_device(self, device: DeviceConfig,
+                                    object_list: list[tuple[str, int]],
+                                    cached: bool = False) -> None:
+        self.discovery_queue.done(device.address)
+        self.object_list_readers.pop(device.address, None)
+        known = device.address in self.devices
+        if known and device.address not in self.discovered_devices:
             _logger.debug("Device @%r is already known, skipping",
-                          apdu.pduSource)
+                          device.address)
+            return
+        discovery_group = self.config.discovery.get_discovery_group(device)
+        if discovery_group is None:
+            _logger.debug("No discovery group for %r", device)
+            if known:
+                self.unregister_device(device.address)
+            elif self.discovery_cache is not None:
+                self.discovery_cache.remove(device.address)
             return
-        object_list = apdu.propertyValue.cast_out(ArrayOf(ObjectIdentifier))
+        if cached:
+            self.unverified_devices.add(device.address)
+        else:
+            self.unverified_devices.discard(device.address)
+            if self.discovery_cache is not None \
+                    and not self.discovery_cache.update(device, object_list) \
+                    and known:
+                _logger.debug("%r has not changed since it was cached",
+                              device)
+                return
         objects: list[ObjectConfig] = []
         for object_identifier in object_list:
             if object_identifier[0] == "device":
@@ -295,77 +492,437 @@ class TelegrafApplication(BIPSimpleApplication):
                     and object_identifier[0] not in \
                     discovery_group.object_types:
                 continue
+            object_class = get_object_class(object_identifier[0])
+            if object_class is None:
+                _logger.debug("Skipping %r of unknown object type",
+                              object_identifier)
+                continue
             obj = ObjectConfig()
             obj.object_identifier = ObjectIdentifier(object_identifier)
             obj.read_interval = discovery_group.read_interval
             obj.cov = discovery_group.cov
             obj.cov_lifetime = discovery_group.cov_lifetime
+            obj.report_on_change = discovery_group.report_on_change
+            obj.deadband = discovery_group.deadband
+            obj.deadband_percent = discovery_group.deadband_percent
+            obj.heartbeat = discovery_group.heartbeat
             obj.properties = tuple(
-                prop.identifier for prop
-                in get_object_class(object_identifier[0]).properties
+                prop.identifier for prop in object_class.properties
                 if discovery_group.properties is None
                 or str(prop.identifier) in discovery_group.properties
             )
             objects.append(obj)
         device.objects = tuple(objects)
+        self.discovered_devices.add(device.address)
         self.register_devices(device)
 
+    def _interrogation_failed(self, device: DeviceConfig) -> None:
+        self.discovery_queue.done(device.address)
+
     def _process_read_device_name_response(self, iocb: IOCB,
                                            device: DeviceConfig) -> None:
         if iocb.ioError:
             _logger.error("Error reading name of %r: %r", device,
                           iocb.ioError)
+            self._interrogation_failed(device)
             return
         if not iocb.ioResponse:
             _logger.error("No error nor response in IOCB response")
+            self._interrogation_failed(device)
             return
 
         apdu: ReadPropertyACK = iocb.ioResponse
-        datatype = get_datatype(apdu.objectIdentifier[0],
-                                apdu.propertyIdentifier)
-        if not datatype:
+        decode = get_decode_plan(apdu.objectIdentifier[0],
+                                 apdu.propertyIdentifier)
+        if decode is None:
             _logger.error("unknown datatype in a response from %r",
                           apdu.pduSource)
+            self._interrogation_failed(device)
             return
 
-        device.device_name = apdu.propertyValue.cast_out(datatype)
+        device.device_name = decode(apdu.propertyValue)
+        self._invalidate_line_prefixes(device.address)
         discovery_group = self.config.discovery.get_discovery_group(device)
         if discovery_group is None:
             _logger.debug("No discovery group for %r", device)
+            self._interrogation_failed(device)
             return
 
-        read_object_list_request = ReadPropertyRequest(
+        read_services_request = ReadPropertyRequest(
             destination=apdu.pduSource,
             objectIdentifier=ObjectIdentifier("device",
                                               device.device_identifier),
-            propertyIdentifier="objectList",
+            propertyIdentifier="protocolServicesSupported",
         )
-        iocb = IOCB(read_object_list_request)
-        iocb.add_callback(self._process_read_object_list_response, device,
-                          discovery_group)
-        deferred(self.request_io, iocb, "_process_read_device_name_response")
+        iocb = IOCB(read_services_request)
+        iocb.add_callback(self._process_read_services_supported_response,
+                          device)
+        self.request_io(iocb, "_process_read_device_name_response")
+
+    def _process_read_services_supported_response(
+        self, iocb: IOCB, device: DeviceConfig,
+    ) -> None:
+        if iocb.ioError:
+            _logger.error("Error reading supported services of %r, "
+                          "ReadPropertyMultiple will not be used: %r", device,
+                          iocb.ioError)
+        elif iocb.ioResponse:
+            apdu: ReadPropertyACK = iocb.ioResponse
+            services = apdu.propertyValue.cast_out(ServicesSupported)
+            device.read_multiple = _supports_service(services,
+                                                     "readPropertyMultiple")
+            _logger.debug("%r supports ReadPropertyMultiple: %r", device,
+                          device.read_multiple)
+        # revize se cte pred seznamem objektu, aby se zmena behem jeho
+        # cteni projevila pri pristim discovery
+        DatabaseRevisionReader(self, device, self._read_object_list).start()
+
+    def _read_object_list(self, device: DeviceConfig, revision: int | None,
+                          restore_time: str | None) -> None:
+        device.database_revision = revision
+        device.last_restore_time = restore_time
+        reader = self.object_list_readers.get(device.address)
+        if reader is None:
+            reader = self.object_list_readers[device.address] = \
+                ObjectListReader(self, device, self.config,
+                                 self._register_discovered_device,
+                                 self._interrogation_failed)
+        reader.device = device
+        reader.start()
+
+    def _process_database_revision(self, device: DeviceConfig,
+                                   revision: int | None,
+                                   restore_time: str | None) -> None:
+        if self.devices.get(device.address) is not device:
+            self._interrogation_failed(device)
+            return
+        if revision is None:
+            _logger.debug("Failed to read databaseRevision of %r", device)
+            self._interrogation_failed(device)
+            return
+        if (revision, restore_time) \
+                == (device.database_revision, device.last_restore_time):
+            _logger.debug("Database of %r has not changed", device)
+            self.unverified_devices.discard(device.address)
+            self.discovery_queue.done(device.address)
+            return
+        _logger.info("Database revision of %r changed from %r to %r, reading "
+                     "its objects again", device, device.database_revision,
+                     revision)
+        updated = copy(device)
+        updated.database_revision = revision
+        updated.last_restore_time = restore_time
+        updated.objects = ()
+        reader = self.object_list_readers[device.address] = \
+            ObjectListReader(self, updated, self.config,
+                             self._register_discovered_device,
+                             self._interrogation_failed)
+        reader.start()
 
     def do_IAmRequest(self, apdu: IAmRequest) -> None:
-        if apdu.pduSource in self.devices:
-            _logger.debug("Device @%r is already known, skipping",
-                          apdu.pduSource)
+        if self.shard is not None and not self.shard.owns(apdu.pduSource):
+            # zarizeni zaregistruje vlastnik, tady uz se nehleda
+            self.unlocated_devices.pop(apdu.iAmDeviceIdentifier[1], None)
+            self.shard.forward_i_am(apdu.pduSource,
+                                    apdu.iAmDeviceIdentifier[1],
+                                    apdu.maxAPDULengthAccepted,
+                                    apdu.segmentationSupported)
+            return
+        self._process_i_am(apdu.pduSource, apdu.iAmDeviceIdentifier[1],
+                           apdu.maxAPDULengthAccepted,
+                           apdu.segmentationSupported)
+
+    def _process_i_am(self, address: Address, device_identifier: int,
+                      max_apdu_length_accepted: int,
+                      segmentation_supported: str) -> None:
+        if device_identifier in self.unlocated_devices \
+                and address not in self.devices:
+            located = self.unlocated_devices.pop(device_identifier)
+            located.address = address
+            located.max_apdu_length_accepted = max_apdu_length_accepted
+            located.segmentation_supported = segmentation_supported
+            _logger.info("Located %r", located)
+            self.register_devices(located)
+            return
+        known = self.devices.get(address)
+        if known is not None:
+            if address not in self.discovered_devices:
+                _logger.debug("Device @%r is configured, skipping", address)
+                return
+            if known.device_identifier == device_identifier \
+                    and known.database_revision is None \
+                    and address not in self.unverified_devices:
+                _logger.debug("Device @%r is already known and has no "
+                              "databaseRevision, skipping", address)
+                return
+        self.discovery_queue.submit(
+            address, device_identifier, max_apdu_length_accepted,
+            segmentation_supported,
+            self._discovery_priority(known, device_identifier),
+        )
+
+    def _discovery_priority(self, known: DeviceConfig | None,
+                            device_identifier: int) -> int:
+        probe = DeviceConfig()
+        probe.device_identifier = device_identifier
+        if known is not None and known.device_identifier == device_identifier:
+            probe.device_name = known.device_name
+        group = self.config.discovery.get_discovery_group(probe)
+        return group.priority if group is not None else 0
+
+    def _interrogate(self, address: Address, device_identifier: int,
+                     max_apdu_length_accepted: int,
+                     segmentation_supported: str) -> None:
+        known = self.devices.get(address)
+        if known is not None and known.device_identifier == device_identifier \
+                and known.database_revision is not None:
+            DatabaseRevisionReader(
+                self, known, self._process_database_revision,
+            ).start()
             return
         device = DeviceConfig()
-        device.address = apdu.pduSource
-        device.device_identifier = apdu.iAmDeviceIdentifier[1]
+        device.address = address
+        device.device_identifier = device_identifier
+        device.max_apdu_length_accepted = max_apdu_length_accepted
+        device.segmentation_supported = segmentation_supported
         device.read_multiple = False
         read_object_list_request = ReadPropertyRequest(
-            destination=apdu.pduSource,
-            objectIdentifier=apdu.iAmDeviceIdentifier,
+            destination=address,
+            objectIdentifier=ObjectIdentifier("device", device_identifier),
             propertyIdentifier="objectName",
         )
         iocb = IOCB(read_object_list_request)
         iocb.add_callback(self._process_read_device_name_response, device)
-        deferred(self.request_io, iocb, "do_IAmRequest")
+        self.request_io(iocb, "do_IAmRequest")
 
     def request_io(self, iocb: IOCB, source: str = "(unknown)") -> None:
         _logger.debug("Sending IOCB %r for %r", iocb.args, source)
-        super().request_io(iocb)
+        self._defer(self.request_scheduler.submit, iocb)
+
+    def _defer(self, function: Callable[..., None], *args: Any) -> None:
+        """Calls the function once the current event is processed"""
+        raise NotImplementedError()
+
+    def _dispatch_io(self, iocb: IOCB) -> None:
+        if self.telemetry is not None:
+            iocb.add_callback(self._record_request, monotonic())
+        self._send_io(iocb)
+
+    def _send_io(self, iocb: IOCB) -> None:
+        """Sends the request of the IOCB released by the request scheduler"""
+        raise NotImplementedError()
+
+    def _record_request(self, iocb: IOCB, start: float) -> None:
+        assert self.telemetry is not None
+        self.telemetry.record_request(iocb.args[0].pduDestination,
+                                      monotonic() - start, iocb.ioError)
+
+    def who_is(self, low_limit: int | None = None,
+               high_limit: int | None = None,
+               address: Address | None = None) -> None:
+        """Sends WhoIsRequest to the address, global broadcast by default"""
+        raise NotImplementedError()
+
+    def run_forever(self) -> None:
+        """Runs the event loop of the engine until stop() is called"""
+        raise NotImplementedError()
+
+    def stop(self) -> None:
+        """Stops the event loop of the engine"""
+        raise NotImplementedError()
+
+    # Device health
+
+    def _probe_device(self, address: Address) -> None:
+        device = self.devices.get(address)
+        if device is None:
+            self.device_health.record_success(address)
+            return
+        if device.device_identifier is not None:
+            request = ReadPropertyRequest(
+                destination=address,
+                objectIdentifier=ObjectIdentifier("device",
+                                                  device.device_identifier),
+                propertyIdentifier="objectName",
+            )
+        elif device.objects and device.objects[0].properties:
+            request = ReadPropertyRequest(
+                destination=address,
+                objectIdentifier=device.objects[0].object_identifier,
+                propertyIdentifier=device.objects[0].properties[0],
+            )
+        else:
+            self.device_health.record_success(address)
+            return
+        iocb = IOCB(request)
+        iocb.add_callback(self._process_probe_response, address)
+        self.request_io(iocb, "_probe_device")
+
+    def _process_probe_response(self, iocb: IOCB, address: Address) -> None:
+        self.device_health.record(address, iocb.ioError)
+
+    def _print_device_state(self, health: DeviceHealth) -> None:
+        tags: list[tuple[str, str | int]] = [
+            ("deviceAddress", str(health.address)),
+        ]
+        device = self.devices.get(health.address)
+        if device is not None and device.device_identifier is not None:
+            tags.append(("deviceIdentifier", device.device_identifier))
+        if device is not None and device.device_name is not None:
+            tags.append(("deviceName", device.device_name))
+        self.influx_lpr.print("deviceState", int(health.state), *tags,
+                              measurement="bacnet_internal")
+        self.influx_lpr.print("consecutiveFailures", health.failures, *tags,
+                              measurement="bacnet_internal")
+
+    def _telemetry_gauges(self) -> dict[str, Any]:
+        return {
+            "requestsInFlight": self.request_scheduler.in_flight,
+            "requestsQueued": self.request_scheduler.queue_depth,
+            "requestWaitAverage": self.request_scheduler.wait_average,
+            "requestWaitMax": self.request_scheduler.wait_max,
+            "covNotifications": self.cov_manager.notifications,
+            "covSubscriptions": len(self.cov_manager.subscriptions),
+            "scheduledTasks": self.task_scheduler.scheduled,
+            "devices": len(self.devices),
+            "discoveryQueued": len(self.discovery_queue.queue),
+            "discoveryActive": len(self.discovery_queue.active),
+            "discoveryDuplicates": self.discovery_queue.duplicates,
+        }
+
+    def _telemetry_overruns(self) -> Iterator[TaskOverruns]:
+        for tasks in self.device_tasks.values():
+            for task in tasks:
+                if task.overruns:
+                    yield task.telemetry_tags, task.overruns, task.delay
+
+    def close(self) -> None:
+        """
+        Flushes buffered measurements and writes the discovery cache before
+        the application exits
+        """
+        self.influx_lpr.close()
+        if self.discovery_cache is not None:
+            self.discovery_cache.save()
+
+    # Config reload
+
+    def enable_reload(self, loader: ConfigLoader,
+                      path: str | None = None) -> None:
+        """
+        Enables reloading of the config by the loader on SIGHUP and, if
+        watching is enabled, when the file or directory at the path or point
+        lists change
+        """
+        self.config_loader = loader
+        self.config_path = path
+        if self.config.reload.watch and path is not None:
+            ConfigWatchTask(self.task_scheduler, self._watched_paths,
+                            self.reload,
+                            self.config.reload.watch_interval).install_task()
+
+    def _watched_paths(self) -> list[str]:
+        assert self.config_path is not None
+        return [self.config_path,
+                *(point_list.path for point_list in self.config.point_list)]
+
+    def _adapt_config(self, config: Config) -> None:
+        """Adjusts options of the config not supported by the engine"""
+
+    def reload(self) -> None:
+        """
+        Loads the config again and applies it, the running config is kept if
+        the new one cannot be loaded
+        """
+        assert self.config_loader is not None
+        try:
+            config = self.config_loader()
+        except (ConfigError, OSError, ValueError, TypeError, KeyError) as ex:
+            _logger.error("Failed to load the config, keeping the running "
+                          "one: %s", ex)
+            return
+        try:
+            self.reload_config(config)
+        except ConfigError as ex:
+            _logger.error("Failed to reload the config, keeping the running "
+                          "one: %s", ex)
+
+    def reload_config(self, config: Config) -> None:
+        """
+        Applies devices, point lists and discovery groups of the config, only
+        tasks of added, changed and removed devices and objects are replaced,
+        so that polling and subscriptions of unchanged objects continue
+        """
+        start = perf_counter()
+        gc.disable()
+        try:
+            devices = list(config.device)
+            unlocated: list[DeviceConfig] = []
+            if config.point_list:
+                listed, unlocated = read_point_lists(config.point_list)
+                devices.extend(listed)
+            if self.shard is not None:
+                devices = [device for device in devices
+                           if self.shard.owns(device.address)]
+            configured = {address: device
+                          for address, device in self.devices.items()
+                          if address not in self.discovered_devices}
+            # nalezena zarizeni si ponechaji adresu z I-Am
+            located = {device.device_identifier: device
+                       for device in configured.values()
+                       if device.device_identifier is not None}
+            self.unlocated_devices.clear()
+            for device in unlocated:
+                assert device.device_identifier is not None
+                current = located.get(device.device_identifier)
+                if current is None:
+                    self.unlocated_devices[device.device_identifier] = device
+                    continue
+                device.address = current.address
+                device.max_apdu_length_accepted = \
+                    current.max_apdu_length_accepted
+                device.segmentation_supported = current.segmentation_supported
+                devices.append(device)
+            new_devices = {device.address: device for device in devices}
+            removed = [address for address in configured
+                       if address not in new_devices]
+            for address in removed:
+                self.unregister_device(address)
+            changed: list[DeviceConfig] = []
+            for address, device in new_devices.items():
+                if address in self.discovered_devices:
+                    # nastavene zarizeni nahradi objevene
+                    self.discovered_devices.discard(address)
+                    self.unverified_devices.discard(address)
+                    if self.discovery_cache is not None:
+                        self.discovery_cache.remove(address)
+                elif configured.get(address) == device:
+                    continue
+                changed.append(device)
+            self.register_devices(*changed)
+        finally:
+            gc.enable()
+        gc.freeze()
+        # ostatni volby se porovnaji bez znovu nactenych
+        self._adapt_config(config)
+        running = copy(config)
+        running.device = self.config.device
+        running.point_list = self.config.point_list
+        running.discovery = copy(config.discovery)
+        running.discovery.discovery_group = \
+            self.config.discovery.discovery_group
+        if running != self.config:
+            _logger.warning("Only devices, point lists and discovery groups "
+                            "are reloaded, other changes require a restart")
+        self.config.device = config.device
+        self.config.point_list = config.point_list
+        self.config.discovery.discovery_group = \
+            config.discovery.discovery_group
+        self._locate_devices()
+        _logger.info("Reloaded config in %.2f s, %d devices added or "
+                     "changed, %d removed, %d to locate",
+                     perf_counter() - start, len(changed), len(removed),
+                     len(self.unlocated_devices))
 
     def register_devices(self, *devices: DeviceConfig) -> None:
         """
@@ -373,7 +930,12 @@ class TelegrafApplication(BIPSimpleApplication):
         tasks
         """
         #_logger.info("==== register_devices =============")
+        #_logger.info("tags_mapping values %r", self.tags_mapping)
         for device in devices:
+            registered = self.devices.get(device.address)
+            if registered is not None and registered is not device:
+                self._forget_tags(registered)
+            device_tags = self._device_line_tags(device)
             #_logger.info("device type: %r",type(device))
             # mam jednu device a na ni definovanych nekolik objektu, ktere chci cist. 
             for deviceObject in device.objects:
@@ -385,18 +947,231 @@ class TelegrafApplication(BIPSimpleApplication):
                 # _logger.info("deviceObject identifier %r", deviceObject.object_identifier.value[1])                
                 # _logger.info("device ADDRESS %r", device.address.dict_contents())                
                 # register tags for all deviceObjects.
-                self.tags_mapping[(device.address.dict_contents(), deviceObject.object_identifier.value[0], deviceObject.object_identifier.value[1])] = deviceObject.sensorType
-        #_logger.info("tags_mapping values %r", self.tags_mapping)
+                self.tags_mapping[(device_tags[0], deviceObject.object_identifier.value[0], deviceObject.object_identifier.value[1])] = deviceObject.sensorType
+            # serialize tags of all deviceObjects once, re-registering the
+            # device replaces its previously cached prefixes
+            self.devices[device.address] = device
+            self.line_prefixes[device.address] = {
+                (obj.object_identifier.value, None):
+                self._build_line_prefix(device, obj.object_identifier.value,
+                                        None, device_tags)
+                for obj in device.objects
+            }
+            # filtry nezmenenych objektu si ponechaji posledni hodnoty
+            previous_filters = self.output_filters.get(device.address, {})
+            output_filters: dict[tuple[str, int], OutputFilter] = {}
+            for obj in device.objects:
+                output_filter = OutputFilter.from_config(obj)
+                if output_filter is None:
+                    continue
+                previous = previous_filters.get(obj.object_identifier.value)
+                if previous is not None \
+                        and previous.has_settings_of(output_filter):
+                    output_filter = previous
+                output_filters[obj.object_identifier.value] = output_filter
+            self.output_filters[device.address] = output_filters
         for device in devices:
-            if device.read_multiple \
-                    and any(not object.cov for object in device.objects):
-                DeviceReadTask(self, device, self.config,
-                               self._process_response_iocb).install_task()
+            self._install_device_tasks(device)
+
+    def unregister_device(self, address: Address) -> None:
+        """Cancels tasks of the device at the address and forgets it"""
+        for task in self.device_tasks.pop(address, ()):
+            task.cancel_task()
+        device = self.devices.pop(address, None)
+        if device is not None:
+            self._forget_tags(device)
+        self.line_prefixes.pop(address, None)
+        self.output_filters.pop(address, None)
+        self.object_list_readers.pop(address, None)
+        self.discovered_devices.discard(address)
+        self.unverified_devices.discard(address)
+        self.single_read_devices.discard(address)
+        if self.telemetry is not None:
+            self.telemetry.remove_device(address)
+        self.polled_objects = {key for key in self.polled_objects
+                               if key[0] != address}
+        if self.discovery_cache is not None:
+            self.discovery_cache.remove(address)
+        _logger.info("Unregistered %r", device)
+
+    def _forget_tags(self, device: DeviceConfig) -> None:
+        address = str(device.address)
+        for obj in device.objects:
+            self.tags_mapping.pop((address, *obj.object_identifier.value),
+                                  None)
+
+    def _read_interval(self, device: DeviceConfig, obj: ObjectConfig,
+                       snapped: set[tuple[int, int]]) -> int:
+        """
+        Returns the read interval of the object, snapped intervals are added
+        to the set as pairs of the configured and the effective interval
+        """
+        interval = first(obj.read_interval, device.read_interval,
+                         self.config.read_interval)
+        assert interval is not None
+        if self.config.snap_read_intervals and interval > 0:
+            effective = snap_interval(interval)
+            if effective != interval:
+                snapped.add((interval, effective))
+            return effective
+        return interval
+
+    def _install_device_tasks(self, device: DeviceConfig) -> None:
+        """
+        Installs tasks of the device, running tasks with unchanged settings
+        are kept, so that re-registering a device does not restart polling
+        and subscriptions of its unchanged objects
+        """
+        running = {task.key: task
+                   for task in self.device_tasks.pop(device.address, ())}
+        tasks: list[DeviceTask] = []
+        snapped: set[tuple[int, int]] = set()
+        read_multiple = device.read_multiple \
+            and device.address not in self.single_read_devices
+        cov_objects = {obj.object_identifier.value for obj in device.objects
+                       if obj.cov and (device.address,
+                                       obj.object_identifier.value)
+                       not in self.polled_objects}
+        if read_multiple:
+            groups: dict[int, list[ObjectConfig]] = {}
             for obj in device.objects:
-                if obj.cov:
-                    SubscribeCOVTask(self, obj,
-                                     device, self.config).install_task()
-                elif not device.read_multiple:
-                    ObjectReadTask(self, obj, device, self.config,
-                                   self._process_response_iocb).install_task()
-            self.devices[device.address] = device
+                if obj.object_identifier.value not in cov_objects:
+                    groups.setdefault(self._read_interval(device, obj,
+                                                          snapped),
+                                      []).append(obj)
+            # skupiny zarizeni zacinaji spolecne, jejich cteni se potkavaji
+            offset = self.task_scheduler.spread(
+                min((interval for interval in groups if interval), default=0))
+            for interval, objects in groups.items():
+                tasks.append(DeviceReadTask(self.task_scheduler, self, device,
+                                            self.config,
+                                            self._process_response_iocb,
+                                            self.device_health, objects,
+                                            interval, offset))
+        for obj in device.objects:
+            if obj.object_identifier.value in cov_objects:
+                tasks.append(SubscribeCOVTask(self.task_scheduler, self, obj,
+                                              device, self.config,
+                                              self.cov_manager,
+                                              self.device_health))
+            elif not read_multiple:
+                tasks.append(ObjectReadTask(self.task_scheduler, self, obj,
+                                            device, self.config,
+                                            self._process_response_iocb,
+                                            self.device_health,
+                                            self._read_interval(device, obj,
+                                                                snapped)))
+        for interval, effective in sorted(snapped):
+            _logger.info("Read interval %d s of objects of %r snapped to %d s",
+                         interval, device, effective)
+        for index, task in enumerate(tasks):
+            previous = running.pop(task.key, None)
+            if previous is None or previous.settings != task.settings:
+                if previous is not None:
+                    previous.cancel_task()
+                task.install_task()
+                continue
+            previous.device = device
+            tasks[index] = previous
+        for task in running.values():
+            task.cancel_task()
+        self.device_tasks[device.address] = tasks
+
+    def _fall_back_to_single_reads(self, address: Address) -> None:
+        device = self.devices.get(address)
+        if device is None or not device.read_multiple \
+                or address in self.single_read_devices:
+            return
+        _logger.warning("%r does not support ReadPropertyMultiple, falling "
+                        "back to ReadProperty", device)
+        self.single_read_devices.add(address)
+        if address in self.discovered_devices:
+            # zjistene zarizeni nepochazi z konfigurace, schopnost se ulozi
+            device.read_multiple = False
+            if self.discovery_cache is not None:
+                self.discovery_cache.update(device)
+        self._install_device_tasks(device)
+
+    def _fall_back_to_polling(self, device: DeviceConfig,
+                              obj: ObjectConfig) -> None:
+        self.polled_objects.add((device.address,
+                                 obj.object_identifier.value))
+        if self.devices.get(device.address) is device:
+            self._install_device_tasks(device)
+
+
+class TelegrafApplication(BaseTelegrafApplication, BIPSimpleApplication):
+    """Main BACnet application class running on the bacpypes core"""
+
+    def __init__(self, config: Config, shard: ShardLink | None = None,
+                 stream: BinaryIO | None = None):
+        local_device = LocalDeviceObject(
+            objectName=config.device_name,
+            objectIdentifier=config.device_identifier,
+            maxApduLengthAccepted=config.max_apdu_length_accepted,
+            segmentationSupported=config.segmentation_supported,
+            vendorIdentifier=config.vendor_identifier,
+            apduTimeout=config.apdu_timeout,
+            numberOfApduRetries=config.number_of_apdu_retries,
+        )
+        BIPSimpleApplication.__init__(self, local_device, config.address)
+        BaseTelegrafApplication.__init__(self, config, shard, stream)
+        self.active_requests: dict[tuple[Address, int], IOCB] = {}
+        self.task_scheduler.install_task()
+
+    def _defer(self, function: Callable[..., None], *args: Any) -> None:
+        deferred(function, *args)
+
+    def enable_reload(self, loader: ConfigLoader,
+                      path: str | None = None) -> None:
+        super().enable_reload(loader, path)
+        # obsluha signalu jen zaradi nacteni do smycky bacpypes
+        signal(SIGHUP, lambda *_: deferred(self.reload))
+
+    def _send_io(self, iocb: IOCB) -> None:
+        BIPSimpleApplication.request_io(self, iocb)
+
+    def who_is(self, low_limit: int | None = None,
+               high_limit: int | None = None,
+               address: Address | None = None) -> None:
+        WhoIsIAmServices.who_is(self, low_limit, high_limit, address)
+
+    def process_io(self, iocb: IOCB) -> None:
+        # Unlike ApplicationIOController, which allows only one active
+        # request per address, responses are matched to requests by their
+        # invoke ID. The number of outstanding requests to a device is
+        # limited by the request scheduler instead.
+        apdu = iocb.args[0]
+        if apdu.apduInvokeID is None:
+            apdu.apduInvokeID = self.smap.get_next_invoke_id(
+                apdu.pduDestination)
+        # ClientSSM muze odpovedet uz behem odeslani, napr. abortem
+        # segmentationNotSupported, IOCB proto musi byt ulozen predem
+        key = (apdu.pduDestination, apdu.apduInvokeID)
+        self.active_requests[key] = iocb
+        self.active_io(iocb)
+        try:
+            self._app_request(apdu)
+        except Exception:
+            self.active_requests.pop(key, None)
+            raise
+
+    def confirmation(self, apdu: APDU) -> None:
+        iocb = self.active_requests.pop((apdu.pduSource, apdu.apduInvokeID),
+                                        None)
+        if iocb is None:
+            _logger.debug("No active request for %r from %r",
+                          apdu.apduInvokeID, apdu.pduSource)
+            return
+        if isinstance(apdu, (SimpleAckPDU, ComplexAckPDU)):
+            self.complete_io(iocb, apdu)
+        elif isinstance(apdu, (ErrorPDU, RejectPDU, AbortPDU)):
+            self.abort_io(iocb, apdu)
+        else:
+            raise RuntimeError("unrecognized APDU type")
+
+    def run_forever(self) -> None:
+        run()
+
+    def stop(self) -> None:
+        stop()
@@ -0,0 +1,220 @@
+from collections import deque
+import mmap
+import os
+from queue import Empty
+import struct
+from tempfile import TemporaryFile
+from threading import Condition
+from time import monotonic
+
+from tomlconfig import ConfigError
+
+from .config import OutputBufferConfig
+
+
+POLICIES = ("block", "drop_oldest", "spill")
+
+# Length of the data and number of lines before every spilled chunk
+_RECORD_HEADER = struct.Struct("<II")
+
+
+class _Segment:
+    """Class for a memory-mapped segment file of spilled chunks"""
+
+    def __init__(self, directory: str | None, size: int) -> None:
+        # soubor je hned smazan, po padu na disku nic nezustane
+        self.file = TemporaryFile(dir=directory)
+        os.ftruncate(self.file.fileno(), size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.size = size
+        self.write_offset = 0
+        self.read_offset = 0
+        self.lines = 0
+
+    @property
+    def free(self) -> int:
+        """Number of bytes left for new chunks"""
+        return self.size - self.write_offset
+
+    def append(self, data: bytes, lines: int) -> None:
+        """Writes the chunk after the last one"""
+        offset = self.write_offset
+        _RECORD_HEADER.pack_into(self.map, offset, len(data), lines)
+        offset += _RECORD_HEADER.size
+        self.map[offset:offset + len(data)] = data
+        self.write_offset = offset + len(data)
+        self.lines += lines
+
+    def read(self) -> tuple[bytes, int] | None:
+        """Returns the oldest unread chunk, None if all were read"""
+        if self.read_offset == self.write_offset:
+            return None
+        length, lines = _RECORD_HEADER.unpack_from(self.map, self.read_offset)
+        offset = self.read_offset + _RECORD_HEADER.size
+        data = self.map[offset:offset + length]
+        self.read_offset = offset + length
+        self.lines -= lines
+        return data, lines
+
+    def reset(self) -> None:
+        """Reuses the segment from its start once everything was read"""
+        self.write_offset = 0
+        self.read_offset = 0
+
+    def close(self) -> None:
+        self.map.close()
+        self.file.close()
+
+
+class SpillFile:
+    """
+    Class for chunks of lines spilled to memory-mapped segment files
+
+    Chunks are appended to the last segment and read from the first one in
+    the order they were written, segments are released once read. When the
+    segments would exceed max_size, the oldest segment is dropped.
+    """
+
+    def __init__(self, directory: str | None, segment_size: int,
+                 max_size: int) -> None:
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_size = max_size
+        self.segments: deque[_Segment] = deque()
+        self.size = 0
+        self.lines = 0
+
+    def append(self, data: bytes, lines: int) -> int:
+        """Spills the chunk and returns the number of dropped lines"""
+        dropped = 0
+        length = _RECORD_HEADER.size + len(data)
+        if not self.segments or self.segments[-1].free < length:
+            size = max(self.segment_size, length)
+            while self.segments and self.size + size > self.max_size:
+                dropped += self._release()
+            self.segments.append(_Segment(self.directory, size))
+            self.size += size
+        self.segments[-1].append(data, lines)
+        self.lines += lines
+        return dropped
+
+    def pop(self) -> tuple[bytes, int] | None:
+        """Returns the oldest spilled chunk, None if there is none"""
+        while self.segments:
+            chunk = self.segments[0].read()
+            if chunk is not None:
+                self.lines -= chunk[1]
+                return chunk
+            if len(self.segments) == 1:
+                self.segments[0].reset()
+                return None
+            self._release()
+        return None
+
+    def close(self) -> None:
+        while self.segments:
+            self._release()
+
+    def _release(self) -> int:
+        segment = self.segments.popleft()
+        segment.close()
+        self.size -= segment.size
+        self.lines -= segment.lines
+        return segment.lines
+
+
+class LineBuffer:
+    """
+    Class for a bounded buffer of encoded lines between the collector and the
+    writer thread of a sink
+
+    Chunks of lines are kept in memory up to max_lines lines. When the buffer
+    is full, the policy decides whether the collector blocks until the writer
+    catches up, the oldest chunks are dropped, or new chunks are spilled to
+    disk and replayed in order once the chunks in memory are written.
+    """
+
+    def __init__(self, config: OutputBufferConfig) -> None:
+        if config.policy not in POLICIES:
+            raise ConfigError(
+                f"Unknown output buffer policy {config.policy!r}")
+        self.config = config
+        self.chunks: deque[tuple[bytes, int]] = deque()
+        self.memory_lines = 0
+        self.spill = SpillFile(config.spill_dir, config.segment_size,
+                               config.max_spill_size) \
+            if config.policy == "spill" else None
+        self.condition = Condition()
+        self.closed = False
+        self.dropped_lines = 0
+        self.spilled_lines = 0
+        self.block_time = 0.0
+
+    @property
+    def queued_lines(self) -> int:
+        """Number of lines in memory and spilled"""
+        return self.memory_lines \
+            + (self.spill.lines if self.spill is not None else 0)
+
+    def _full(self, lines: int) -> bool:
+        # samotny prilis velky blok se vejde vzdy
+        return bool(self.chunks) \
+            and self.memory_lines + lines > self.config.max_lines
+
+    def put(self, data: bytes, lines: int) -> None:
+        """Adds the chunk of lines, applies the policy if the buffer is full"""
+        with self.condition:
+            if self.spill is not None \
+                    and (self.spill.lines or self._full(lines)):
+                self.dropped_lines += self.spill.append(data, lines)
+                self.spilled_lines += lines
+                self.condition.notify_all()
+                return
+            if self.config.policy == "block" and self._full(lines):
+                start = monotonic()
+                while self._full(lines):
+                    self.condition.wait()
+                self.block_time += monotonic() - start
+            while self._full(lines):
+                _, oldest = self.chunks.popleft()
+                self.memory_lines -= oldest
+                self.dropped_lines += oldest
+            self.chunks.append((data, lines))
+            self.memory_lines += lines
+            self.condition.notify_all()
+
+    def get(self, timeout: float | None = None) -> tuple[bytes, int] | None:
+        """
+        Returns the oldest chunk, waits at most timeout seconds for one
+        and raises Empty if none comes, returns None once closed and empty
+        """
+        deadline = monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            while True:
+                if self.chunks:
+                    chunk = self.chunks.popleft()
+                    self.memory_lines -= chunk[1]
+                    self.condition.notify_all()
+                    return chunk
+                if self.spill is not None:
+                    spilled = self.spill.pop()
+                    if spilled is not None:
+                        return spilled
+                if self.closed:
+                    return None
+                remaining = deadline - monotonic() \
+                    if deadline is not None else None
+                if (remaining is not None and remaining <= 0) \
+                        or not self.condition.wait(remaining):
+                    raise Empty()
+
+    def close(self) -> None:
+        """Lets the writer finish once all chunks are taken"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def release(self) -> None:
+        """Releases spill files"""
+        if self.spill is not None:
+            self.spill.close()
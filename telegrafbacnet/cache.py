@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+from typing import Any
+
+from bacpypes.pdu import Address
+
+from .config import DeviceConfig
+from .wheel import TimingWheel
+
+
+CacheEntry = dict[str, Any]
+
+_logger = logging.getLogger(__name__)
+
+_CACHE_VERSION = 1
+# Delay in seconds between a change of the cache and its write, so that
+# a discovery of many devices results in a single write
+_SAVE_DELAY = 5.0
+
+
+class DiscoveryCache:
+    """
+    Class persisting discovered devices to a file
+
+    For every device the cache stores its address, identifier, name,
+    capabilities, database revision and object list, so that the devices can
+    be registered at startup without waiting for the discovery. The file is
+    written atomically, a partially written cache is never loaded.
+    """
+
+    def __init__(self, scheduler: TimingWheel, path: str) -> None:
+        self.scheduler = scheduler
+        self.path = path
+        self.entries: dict[str, CacheEntry] = {}
+        self.dirty = False
+
+    def load(self) -> list[tuple[DeviceConfig, list[tuple[str, int]]]]:
+        """Loads the cache file and returns the cached devices"""
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                content = json.load(file)
+        except FileNotFoundError:
+            _logger.info("No discovery cache at %s", self.path)
+            return []
+        except (OSError, ValueError) as ex:
+            _logger.warning("Ignoring unreadable discovery cache %s: %s",
+                            self.path, ex)
+            return []
+        if not isinstance(content, dict) \
+                or content.get("version") != _CACHE_VERSION:
+            _logger.warning("Ignoring discovery cache %s of unknown version",
+                            self.path)
+            return []
+        devices: list[tuple[DeviceConfig, list[tuple[str, int]]]] = []
+        for entry in content.get("devices", ()):
+            try:
+                device = DeviceConfig()
+                device.address = Address(entry["address"])
+                device.device_identifier = int(entry["device_identifier"])
+                device.device_name = entry.get("device_name")
+                device.max_apdu_length_accepted = \
+                    entry.get("max_apdu_length_accepted")
+                device.segmentation_supported = \
+                    entry.get("segmentation_supported")
+                device.read_multiple = bool(entry.get("read_multiple"))
+                device.database_revision = entry.get("database_revision")
+                device.last_restore_time = entry.get("last_restore_time")
+                object_list = [(str(object_type), int(instance))
+                               for object_type, instance
+                               in entry["object_list"]]
+            except (KeyError, TypeError, ValueError) as ex:
+                _logger.warning("Ignoring invalid discovery cache entry %r: "
+                                "%s", entry, ex)
+                continue
+            self.entries[str(device.address)] = entry
+            devices.append((device, object_list))
+        _logger.info("Loaded %d devices from discovery cache %s",
+                     len(devices), self.path)
+        return devices
+
+    def update(self, device: DeviceConfig,
+               object_list: list[tuple[str, int]] | None = None) -> bool:
+        """
+        Stores the device and its object list, the previously cached object
+        list is kept if none is given, and schedules the write of the cache
+
+        Returns whether the cached device changed.
+        """
+        key = str(device.address)
+        if object_list is None:
+            if key not in self.entries:
+                return False
+            object_list = self.entries[key]["object_list"]
+        entry = {
+            "address": key,
+            "device_identifier": device.device_identifier,
+            "device_name": device.device_name,
+            "max_apdu_length_accepted": device.max_apdu_length_accepted,
+            "segmentation_supported": device.segmentation_supported,
+            "read_multiple": device.read_multiple,
+            "database_revision": device.database_revision,
+            "last_restore_time": device.last_restore_time,
+            "object_list": [list(object_identifier)
+                            for object_identifier in object_list],
+        }
+        if self.entries.get(key) == entry:
+            return False
+        self.entries[key] = entry
+        self.dirty = True
+        self.scheduler.schedule(self, _SAVE_DELAY)
+        return True
+
+    def remove(self, address: Address) -> None:
+        """Removes the device at the address from the cache"""
+        if self.entries.pop(str(address), None) is not None:
+            self.dirty = True
+            self.scheduler.schedule(self, _SAVE_DELAY)
+
+    def process_task(self) -> None:
+        """Writes the cache once the save delay elapses"""
+        self.save()
+
+    def save(self) -> None:
+        """Atomically writes the cache file if it changed"""
+        if not self.dirty:
+            return
+        self.scheduler.cancel(self)
+        temporary_path = f"{self.path}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                json.dump({
+                    "version": _CACHE_VERSION,
+                    "devices": list(self.entries.values()),
+                }, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, self.path)
+        except OSError as ex:
+            _logger.error("Failed to write discovery cache %s: %s",
+                          self.path, ex)
+            return
+        self.dirty = False
+        _logger.debug("Wrote %d devices to discovery cache %s",
+                      len(self.entries), self.path)
+
+    def __str__(self) -> str:
+        return f"<DiscoveryCache {self.path}>"
+
+    def __repr__(self) -> str:
+        return str(self)
@@ -16,6 +16,10 @@ class ObjectConfig:
     cov_lifetime: int | None = None
     properties: tuple[str, ...] = field(default_factory=tuple)
     sensorType: str | None = None
+    report_on_change: bool = False
+    deadband: float | None = None
+    deadband_percent: float | None = None
+    heartbeat: int | None = None
     
     def __str__(self) -> str:
         return f"<Object {self.object_identifier}>"
@@ -31,6 +35,10 @@ class DeviceConfig:
     device_name: str | None = None
     read_multiple: bool = True
     read_interval: int | None = None
+    max_apdu_length_accepted: int | None = None
+    segmentation_supported: str | None = None
+    database_revision: int | None = None
+    last_restore_time: str | None = None
     objects: tuple[ObjectConfig, ...] = field(default_factory=tuple)
     
     def __str__(self) -> str:
@@ -41,6 +49,18 @@ class DeviceConfig:
         return str(self)
 
 
+@configclass
+class PointListConfig:
+    """Class representing a point list file config"""
+    path: str = ""
+    format: str = "csv"
+    delimiter: str | None = None
+    read_multiple: bool = True
+    read_interval: int | None = None
+    cov: bool = False
+    properties: tuple[str, ...] = ("presentValue",)
+
+
 @configclass
 class DiscoveryGroupConfig:
     """Class representing device discovery group config"""
@@ -51,6 +71,11 @@ class DiscoveryGroupConfig:
     cov_lifetime: int | None = None
     object_types: tuple[str, ...] | None = None
     properties: tuple[str, ...] | None = None
+    report_on_change: bool = False
+    deadband: float | None = None
+    deadband_percent: float | None = None
+    heartbeat: int | None = None
+    priority: int = 0
 
 
 @configclass
@@ -62,6 +87,12 @@ class DiscoveryConfig:
     discovery_interval: int = 60 * 60
     low_limit: int | None = None
     high_limit: int | None = None
+    cache_file: str | None = None
+    who_is_slice: int | None = None
+    who_is_slice_interval: float = 1.0
+    max_interrogations: int = 10
+    interrogation_rate: float | None = None
+    interrogation_timeout: int = 120
     discovery_group: list[DiscoveryGroupConfig] = field(default_factory=list)
 
     def get_discovery_group(self, device: DeviceConfig) \
@@ -83,6 +114,82 @@ class DiscoveryConfig:
         return None
 
 
+@configclass
+class OutputBufferConfig:
+    """Class representing config of the buffer in front of the output sink"""
+    max_lines: int = 100000
+    policy: str = "block"
+    spill_dir: str | None = None
+    segment_size: int = 16777216
+    max_spill_size: int = 1073741824
+    close_timeout: float = 10.0
+
+
+@configclass
+class HTTPOutputConfig:
+    """Class representing InfluxDB HTTP write API output config"""
+    url: str = "http://localhost:8086/api/v2/write?org=&bucket=telegraf"
+    token: str | None = None
+    batch_lines: int = 5000
+    batch_interval: float = 1.0
+    gzip: bool = True
+    timeout: float = 10.0
+    max_retries: int = 5
+    retry_backoff: float = 1.0
+    max_backoff: float = 30.0
+
+
+@configclass
+class OutputConfig:
+    """Class representing measurement output config"""
+    flush_lines: int = 1000
+    flush_interval: float = 1.0
+    flush_on_response: bool = True
+    sink: str = "stdout"
+    buffer: OutputBufferConfig = field(default_factory=OutputBufferConfig)
+    http: HTTPOutputConfig = field(default_factory=HTTPOutputConfig)
+
+
+@configclass
+class HealthConfig:
+    """Class representing device health tracking config"""
+    enabled: bool = True
+    failure_threshold: int = 3
+    backoff: int = 10
+    max_backoff: int = 600
+
+
+@configclass
+class COVConfig:
+    """Class representing COV subscription config"""
+    renewal: float = 0.5
+    notification_timeout: int = 30
+    max_failures: int = 3
+
+
+@configclass
+class ShardingConfig:
+    """Class representing multi-process collector config"""
+    workers: int = 1
+    key: str = "address"
+
+
+@configclass
+class TelemetryConfig:
+    """Class representing self-telemetry config"""
+    enabled: bool = False
+    interval: int = 60
+    latency_buckets: tuple[float, ...] = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0,
+                                          2.5, 5.0, 10.0)
+
+
+@configclass
+class ReloadConfig:
+    """Class representing config reload config"""
+    watch: bool = False
+    watch_interval: int = 5
+
+
 @configclass
 class Config:
     """Class representing main application config"""
@@ -92,11 +199,29 @@ class Config:
     address: Address = field(default_factory=Address)
     max_apdu_length_accepted: int = 1024
     segmentation_supported: str = "segmentedBoth"
+    max_segments_per_request: int = 1
     vendor_identifier: int = 555
+    apdu_timeout: int = 3000
+    number_of_apdu_retries: int = 3
+
+    engine: str = "bacpypes"
 
     debug: bool = False
 
+    max_device_requests: int = 1
+    max_network_requests: int | None = None
+
     read_interval: int = 5
+    snap_read_intervals: bool = False
+    adaptive_read_interval: bool = False
+    max_read_interval_factor: float = 8.0
     cov_lifetime: int = 5 * 60
+    cov: COVConfig = field(default_factory=COVConfig)
     discovery: DiscoveryConfig = field(default_factory=DiscoveryConfig)
+    output: OutputConfig = field(default_factory=OutputConfig)
+    health: HealthConfig = field(default_factory=HealthConfig)
+    telemetry: TelemetryConfig = field(default_factory=TelemetryConfig)
+    sharding: ShardingConfig = field(default_factory=ShardingConfig)
+    reload: ReloadConfig = field(default_factory=ReloadConfig)
     device: list[DeviceConfig] = field(default_factory=list)
+    point_list: list[PointListConfig] = field(default_factory=list)
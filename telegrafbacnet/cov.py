@@ -0,0 +1,60 @@
+import logging
+from typing import TYPE_CHECKING, Callable
+
+from bacpypes.pdu import Address
+
+from .config import DeviceConfig, ObjectConfig
+
+if TYPE_CHECKING:
+    from .tasks import SubscribeCOVTask
+
+
+_logger = logging.getLogger(__name__)
+
+
+class COVManager:
+    """
+    Class keeping track of COV subscriptions
+
+    Notifications are routed to their subscriptions, subscriptions failing
+    repeatedly or refused by a device not supporting COV are handed over to
+    the fallback, which polls the object instead.
+    """
+
+    def __init__(self,
+                 fallback: Callable[[DeviceConfig, ObjectConfig], None]) \
+            -> None:
+        self.fallback = fallback
+        self.subscriptions: \
+            dict[tuple[Address, tuple[str, int]], "SubscribeCOVTask"] = {}
+        self.notifications = 0
+
+    def add(self, task: "SubscribeCOVTask") -> None:
+        """Registers the subscription"""
+        self.subscriptions[(task.device.address,
+                            task.object.object_identifier.value)] = task
+
+    def remove(self, task: "SubscribeCOVTask") -> None:
+        """Unregisters the subscription"""
+        key = (task.device.address, task.object.object_identifier.value)
+        if self.subscriptions.get(key) is task:
+            del self.subscriptions[key]
+
+    def process_notification(self, address: Address,
+                             object_identifier: tuple[str, int]) -> bool:
+        """
+        Records a notification of the object at the address, returns whether
+        there is a subscription for it
+        """
+        self.notifications += 1
+        task = self.subscriptions.get((address, object_identifier))
+        if task is None:
+            return False
+        task.process_notification()
+        return True
+
+    def fall_back(self, task: "SubscribeCOVTask") -> None:
+        """Switches the object of the subscription to polling"""
+        _logger.warning("Falling back to polling of %r@%r after COV "
+                        "subscription failures", task.object, task.device)
+        self.fallback(task.device, task.object)
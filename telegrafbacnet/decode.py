@@ -0,0 +1,50 @@
+from functools import lru_cache
+import logging
+from operator import methodcaller
+from typing import Any, Callable
+
+from bacpypes.constructeddata import Array
+from bacpypes.object import get_datatype
+from bacpypes.primitivedata import Unsigned
+
+
+DecodePlan = Callable[[Any], Any]
+
+_logger = logging.getLogger(__name__)
+
+_DECODE_PLAN_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=_DECODE_PLAN_CACHE_SIZE)
+def _decode_plan(object_type: str | int, property_identifier: str | int,
+                 array_index: int | None) -> DecodePlan | None:
+    datatype = get_datatype(object_type, property_identifier)
+    if not datatype:
+        _logger.error("unknown datatype of %r of %r", property_identifier,
+                      object_type)
+        return None
+    if issubclass(datatype, Array) and array_index is not None:
+        if array_index == 0:
+            return methodcaller("cast_out", Unsigned)
+        return methodcaller("cast_out", datatype.subtype)
+    return methodcaller("cast_out", datatype)
+
+
+def get_decode_plan(object_type: str | int, property_identifier: str | int,
+                    array_index: int | None = None) -> DecodePlan | None:
+    """
+    Returns a function casting the value of the property out of
+    an encoded Any value or None if the datatype of the property is unknown
+
+    Plans are cached, including the unknown datatypes, so the datatype lookup
+    is done only once per object type, property and kind of array index.
+    """
+    if array_index:
+        array_index = 1
+    return _decode_plan(object_type, property_identifier, array_index)
+
+
+def decode_plan_cache_info() -> tuple[int, int, int]:
+    """Returns hits, misses and the current size of the decode plan cache"""
+    info = _decode_plan.cache_info()
+    return info.hits, info.misses, info.currsize
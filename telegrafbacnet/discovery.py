@@ -0,0 +1,403 @@
+import heapq
+from itertools import count
+import logging
+from time import monotonic
+from typing import Callable
+
+from bacpypes.apdu import (
+    ConfirmedRequestSequence,
+    ReadAccessSpecification,
+    ReadPropertyACK,
+    ReadPropertyMultipleACK,
+    ReadPropertyMultipleRequest,
+    ReadPropertyRequest,
+)
+from bacpypes.basetypes import PropertyReference
+from bacpypes.constructeddata import Any, ArrayOf
+from bacpypes.iocb import IOCB, IOController
+from bacpypes.pdu import Address, PDUData
+from bacpypes.primitivedata import ObjectIdentifier, Unsigned
+
+from .config import Config, DeviceConfig, DiscoveryConfig
+from .health import is_device_failure
+from .shard import IAmCallback
+from .wheel import TimingWheel
+
+
+ObjectListCallback = Callable[[DeviceConfig, list[tuple[str, int]]], None]
+FailureCallback = Callable[[DeviceConfig], None]
+RevisionCallback = Callable[[DeviceConfig, int | None, str | None], None]
+
+_logger = logging.getLogger(__name__)
+
+# Estimated encoded size in octets of one objectList entry in
+# a ReadPropertyMultipleACK
+_OBJECT_LIST_ENTRY_SIZE = 12
+_OBJECT_LIST_ACK_OVERHEAD = 16
+_OBJECT_LIST_ATTEMPTS = 3
+# Seconds of unused interrogation rate that may be caught up at once
+_RATE_BURST = 1.0
+
+
+class _Interrogation:
+    """Class representing a running interrogation of a device"""
+
+    __slots__ = ("queue", "address")
+
+    def __init__(self, queue: "DiscoveryQueue", address: Address) -> None:
+        self.queue = queue
+        self.address = address
+
+    def process_task(self) -> None:
+        """Frees the slot of the interrogation once it times out"""
+        _logger.warning("Interrogation of the device @%r did not finish in "
+                        "%d s", self.address,
+                        self.queue.config.interrogation_timeout)
+        self.queue.done(self.address)
+
+    def __str__(self) -> str:
+        return f"<Interrogation of {self.address}>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class DiscoveryQueue:
+    """
+    Class limiting interrogations of devices answering the discovery
+
+    An interrogation reads the name, supported services and objects of
+    a device after its I-Am. Devices waiting for or under an interrogation are
+    kept by address, so repeated I-Am responses do not start duplicate reads.
+    At most max_interrogations run at once and at most interrogation_rate
+    start per second, devices with a higher priority start first. An
+    interrogation not reported as done within interrogation_timeout seconds
+    frees its slot.
+    """
+
+    def __init__(self, scheduler: TimingWheel, config: DiscoveryConfig,
+                 interrogate: IAmCallback) -> None:
+        self.scheduler = scheduler
+        self.config = config
+        self.interrogate = interrogate
+        self.queue: list[tuple[int, int, Address, int, int, str]] = []
+        self.sequence = count()
+        self.queued: set[Address] = set()
+        self.active: dict[Address, _Interrogation] = {}
+        self.next_start = 0.0
+        self.waiting = False
+        self.duplicates = 0
+
+    def submit(self, address: Address, device_identifier: int,
+               max_apdu_length_accepted: int, segmentation_supported: str,
+               priority: int = 0) -> None:
+        """Queues the interrogation unless the device already waits for one"""
+        if address in self.queued or address in self.active:
+            _logger.debug("Device @%r is already being interrogated, "
+                          "skipping", address)
+            self.duplicates += 1
+            return
+        heapq.heappush(self.queue, (-priority, next(self.sequence), address,
+                                    device_identifier,
+                                    max_apdu_length_accepted,
+                                    segmentation_supported))
+        self.queued.add(address)
+        self._start_next()
+
+    def done(self, address: Address) -> None:
+        """Frees the slot of the finished interrogation of the device"""
+        interrogation = self.active.pop(address, None)
+        if interrogation is None:
+            return
+        self.scheduler.cancel(interrogation)
+        self._start_next()
+
+    def process_task(self) -> None:
+        self.waiting = False
+        self._start_next()
+
+    def _start_next(self) -> None:
+        rate = self.config.interrogation_rate
+        while self.queue and len(self.active) \
+                < self.config.max_interrogations:
+            now = monotonic()
+            if rate and now < self.next_start:
+                if not self.waiting:
+                    self.waiting = True
+                    self.scheduler.schedule(self, self.next_start - now)
+                return
+            _, _, address, device_identifier, max_apdu, segmentation = \
+                heapq.heappop(self.queue)
+            self.queued.discard(address)
+            interrogation = self.active[address] = \
+                _Interrogation(self, address)
+            self.scheduler.schedule(interrogation,
+                                    self.config.interrogation_timeout)
+            if rate:
+                self.next_start = max(self.next_start, now - _RATE_BURST) \
+                    + 1 / rate
+            self.interrogate(address, device_identifier, max_apdu,
+                             segmentation)
+
+    def __str__(self) -> str:
+        return "<DiscoveryQueue>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class ObjectListReader:
+    """
+    Class reading the objectList of a device by array index
+
+    The length of the list is read first, then the entries are read in
+    batches that are all submitted at once, so that they run in parallel as
+    far as the request window of the device allows. Batches use
+    ReadPropertyMultiple if the device supports it. Entries that were read
+    are kept, so a retry reads only the missing ones. A device rejecting
+    the read of the length has the whole objectList read at once instead.
+    """
+
+    def __init__(self, io_controller: IOController, device: DeviceConfig,
+                 config: Config, callback: ObjectListCallback,
+                 failure_callback: FailureCallback | None = None) -> None:
+        self.io_controller = io_controller
+        self.device = device
+        self.config = config
+        self.callback = callback
+        self.failure_callback = failure_callback
+        self.entries: list[tuple[str, int] | None] | None = None
+        self.outstanding = 0
+        self.attempts = 0
+
+    @property
+    def running(self) -> bool:
+        """Whether the reader is waiting for responses"""
+        return self.outstanding > 0
+
+    @property
+    def _device_identifier(self) -> ObjectIdentifier:
+        return ObjectIdentifier("device", self.device.device_identifier)
+
+    def start(self) -> None:
+        """Starts or resumes reading the objectList"""
+        if self.running:
+            return
+        self.attempts = 0
+        if self.entries is None:
+            self._read_length()
+        else:
+            self._read_missing()
+
+    def _request(self, request: ConfirmedRequestSequence,
+                 callback: Callable[[IOCB], None]) -> None:
+        iocb = IOCB(request)
+        iocb.add_callback(callback)
+        self.outstanding += 1
+        self.io_controller.request_io(iocb, str(self))
+
+    def _read_length(self) -> None:
+        self._request(ReadPropertyRequest(
+            destination=self.device.address,
+            objectIdentifier=self._device_identifier,
+            propertyIdentifier="objectList",
+            propertyArrayIndex=0,
+        ), self._process_length_response)
+
+    def _process_length_response(self, iocb: IOCB) -> None:
+        self.outstanding -= 1
+        if iocb.ioError and not is_device_failure(iocb.ioError):
+            _logger.info("%r rejected reading objectList length: %r, "
+                         "reading the whole objectList", self.device,
+                         iocb.ioError)
+            self._request(ReadPropertyRequest(
+                destination=self.device.address,
+                objectIdentifier=self._device_identifier,
+                propertyIdentifier="objectList",
+            ), self._process_list_response)
+            return
+        if iocb.ioError or not isinstance(iocb.ioResponse, ReadPropertyACK):
+            _logger.error("Error reading objectList length of %r: %r",
+                          self.device, iocb.ioError)
+            if self.failure_callback is not None:
+                self.failure_callback(self.device)
+            return
+        length = iocb.ioResponse.propertyValue.cast_out(Unsigned)
+        _logger.debug("%r has %d objects", self.device, length)
+        self.entries = [None] * length
+        self._read_missing()
+
+    def _process_list_response(self, iocb: IOCB) -> None:
+        self.outstanding -= 1
+        if iocb.ioError or not isinstance(iocb.ioResponse, ReadPropertyACK):
+            _logger.error("Error reading objectList of %r: %r", self.device,
+                          iocb.ioError)
+            if self.failure_callback is not None:
+                self.failure_callback(self.device)
+            return
+        entries = iocb.ioResponse.propertyValue.cast_out(
+            ArrayOf(ObjectIdentifier))
+        self.entries = list(entries)
+        self.callback(self.device, list(entries))
+
+    def _batch_size(self) -> int:
+        if not self.device.read_multiple:
+            return 1
+        max_apdu = min(self.device.max_apdu_length_accepted
+                       or self.config.max_apdu_length_accepted,
+                       self.config.max_apdu_length_accepted)
+        return max(1, (max_apdu - _OBJECT_LIST_ACK_OVERHEAD)
+                   // _OBJECT_LIST_ENTRY_SIZE)
+
+    def _read_missing(self) -> None:
+        assert self.entries is not None
+        missing = [index for index, entry in enumerate(self.entries, 1)
+                   if entry is None]
+        if not missing:
+            self.callback(self.device,
+                          [entry for entry in self.entries
+                           if entry is not None])
+            return
+        if self.attempts >= _OBJECT_LIST_ATTEMPTS:
+            _logger.error("Failed to read %d of %d objectList entries of %r, "
+                          "will resume on the next discovery", len(missing),
+                          len(self.entries), self.device)
+            if self.failure_callback is not None:
+                self.failure_callback(self.device)
+            return
+        self.attempts += 1
+        batch_size = self._batch_size()
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            if self.device.read_multiple:
+                self._request(ReadPropertyMultipleRequest(
+                    destination=self.device.address,
+                    listOfReadAccessSpecs=[ReadAccessSpecification(
+                        objectIdentifier=self._device_identifier,
+                        listOfPropertyReferences=[
+                            PropertyReference(propertyIdentifier="objectList",
+                                              propertyArrayIndex=index)
+                            for index in batch
+                        ],
+                    )],
+                ), self._process_entries_response)
+            else:
+                self._request(ReadPropertyRequest(
+                    destination=self.device.address,
+                    objectIdentifier=self._device_identifier,
+                    propertyIdentifier="objectList",
+                    propertyArrayIndex=batch[0],
+                ), self._process_entries_response)
+
+    def _process_entries_response(self, iocb: IOCB) -> None:
+        self.outstanding -= 1
+        assert self.entries is not None
+        apdu = iocb.ioResponse
+        if iocb.ioError:
+            _logger.debug("Error reading objectList entries of %r: %r",
+                          self.device, iocb.ioError)
+        elif isinstance(apdu, ReadPropertyACK):
+            self._store(apdu.propertyArrayIndex,
+                        apdu.propertyValue.cast_out(ObjectIdentifier))
+        elif isinstance(apdu, ReadPropertyMultipleACK):
+            for result in apdu.listOfReadAccessResults:
+                for element in result.listOfResults:
+                    if element.readResult.propertyAccessError is not None:
+                        continue
+                    self._store(element.propertyArrayIndex,
+                                element.readResult.propertyValue.cast_out(
+                                    ObjectIdentifier))
+        if not self.running:
+            self._read_missing()
+
+    def _store(self, index: int | None, entry: tuple[str, int]) -> None:
+        assert self.entries is not None
+        if index is None or not 0 < index <= len(self.entries):
+            _logger.debug("Ignoring objectList entry %r with invalid index %r",
+                          entry, index)
+            return
+        self.entries[index - 1] = entry
+
+    def __str__(self) -> str:
+        return f"<ObjectListReader for {self.device}>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def _encoded_value(value: Any) -> str:
+    """Returns the hex encoded tags of the value for comparison"""
+    data = PDUData()
+    value.tagList.encode(data)
+    return bytes(data.pduData).hex()
+
+
+class DatabaseRevisionReader:
+    """
+    Class reading the databaseRevision and lastRestoreTime of a device
+
+    Together they tell whether the objects of the device could have changed
+    since they were last read. The lastRestoreTime is read only if the device
+    supports ReadPropertyMultiple, so that the check is always a single
+    request. The callback gets None for a property the device does not have.
+    """
+
+    def __init__(self, io_controller: IOController, device: DeviceConfig,
+                 callback: RevisionCallback) -> None:
+        self.io_controller = io_controller
+        self.device = device
+        self.callback = callback
+
+    def start(self) -> None:
+        """Sends the request reading the revision"""
+        assert self.device.device_identifier is not None
+        device_identifier = ObjectIdentifier("device",
+                                             self.device.device_identifier)
+        request: ConfirmedRequestSequence
+        if self.device.read_multiple:
+            request = ReadPropertyMultipleRequest(
+                destination=self.device.address,
+                listOfReadAccessSpecs=[ReadAccessSpecification(
+                    objectIdentifier=device_identifier,
+                    listOfPropertyReferences=[
+                        PropertyReference(propertyIdentifier=prop)
+                        for prop in ("databaseRevision", "lastRestoreTime")
+                    ],
+                )],
+            )
+        else:
+            request = ReadPropertyRequest(
+                destination=self.device.address,
+                objectIdentifier=device_identifier,
+                propertyIdentifier="databaseRevision",
+            )
+        iocb = IOCB(request)
+        iocb.add_callback(self._process_response)
+        self.io_controller.request_io(iocb, str(self))
+
+    def _process_response(self, iocb: IOCB) -> None:
+        revision: int | None = None
+        restore_time: str | None = None
+        apdu = iocb.ioResponse
+        if iocb.ioError:
+            _logger.debug("Error reading databaseRevision of %r: %r",
+                          self.device, iocb.ioError)
+        elif isinstance(apdu, ReadPropertyACK):
+            revision = apdu.propertyValue.cast_out(Unsigned)
+        elif isinstance(apdu, ReadPropertyMultipleACK):
+            for result in apdu.listOfReadAccessResults:
+                for element in result.listOfResults:
+                    value = element.readResult.propertyValue
+                    if value is None:
+                        continue
+                    if element.propertyIdentifier == "databaseRevision":
+                        revision = value.cast_out(Unsigned)
+                    elif element.propertyIdentifier == "lastRestoreTime":
+                        restore_time = _encoded_value(value)
+        self.callback(self.device, revision, restore_time)
+
+    def __str__(self) -> str:
+        return f"<DatabaseRevisionReader for {self.device}>"
+
+    def __repr__(self) -> str:
+        return str(self)
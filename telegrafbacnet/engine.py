@@ -0,0 +1,19 @@
+from typing import BinaryIO
+
+from tomlconfig import ConfigError
+
+from .aio import AsyncTelegrafApplication
+from .app import BaseTelegrafApplication, TelegrafApplication
+from .config import Config
+from .shard import ShardLink
+
+
+def create_application(config: Config, shard: ShardLink | None = None,
+                       stream: BinaryIO | None = None) \
+        -> BaseTelegrafApplication:
+    """Returns the application running on the engine selected in the config"""
+    if config.engine == "asyncio":
+        return AsyncTelegrafApplication(config, shard, stream)
+    if config.engine != "bacpypes":
+        raise ConfigError(f"Unknown engine {config.engine!r}")
+    return TelegrafApplication(config, shard, stream)
@@ -0,0 +1,71 @@
+from time import monotonic
+from typing import Any
+
+from .config import ObjectConfig
+
+
+class OutputFilter:
+    """
+    Class for report-by-exception filtering of measurements of a single object
+
+    Numeric values are reported when they differ from the last reported value
+    by more than the absolute or percentage deadband, other values are
+    reported only when they change. A value is always reported if the last
+    report of the property is older than the heartbeat.
+    """
+
+    __slots__ = ("deadband", "deadband_percent", "heartbeat", "last")
+
+    def __init__(self, deadband: float | None = None,
+                 deadband_percent: float | None = None,
+                 heartbeat: int | None = None) -> None:
+        self.deadband = deadband
+        self.deadband_percent = deadband_percent
+        self.heartbeat = heartbeat
+        self.last: dict[tuple[str, int | None], tuple[Any, float]] = {}
+
+    @classmethod
+    def from_config(cls, obj: ObjectConfig) -> "OutputFilter | None":
+        """
+        Returns the filter configured for the object or None if its
+        measurements should not be filtered
+        """
+        if not obj.report_on_change and obj.deadband is None \
+                and obj.deadband_percent is None:
+            return None
+        return cls(obj.deadband, obj.deadband_percent, obj.heartbeat)
+
+    def has_settings_of(self, other: "OutputFilter") -> bool:
+        """Returns whether the other filter is configured the same way"""
+        return (self.deadband, self.deadband_percent, self.heartbeat) \
+            == (other.deadband, other.deadband_percent, other.heartbeat)
+
+    def _changed(self, last: Any, value: Any) -> bool:
+        if isinstance(value, bool) or not isinstance(value, (int, float)) \
+                or isinstance(last, bool) \
+                or not isinstance(last, (int, float)):
+            return bool(value != last)
+        difference = abs(value - last)
+        if self.deadband is not None and difference > self.deadband:
+            return True
+        if self.deadband_percent is not None \
+                and difference > abs(last) * self.deadband_percent / 100:
+            return True
+        return self.deadband is None and self.deadband_percent is None \
+            and difference > 0
+
+    def should_report(self, prop: str, index: int | None, value: Any) \
+            -> bool:
+        """
+        Returns whether the value should be reported and remembers it as the
+        last reported value if so
+        """
+        now = monotonic()
+        key = (prop, index)
+        last = self.last.get(key)
+        if last is not None and not self._changed(last[0], value) \
+                and (self.heartbeat is None
+                     or now - last[1] < self.heartbeat):
+            return False
+        self.last[key] = (value, now)
+        return True
@@ -0,0 +1,125 @@
+from enum import IntEnum
+import logging
+from typing import Any, Callable
+
+from bacpypes.apdu import APDU, AbortPDU
+from bacpypes.pdu import Address
+
+from .config import HealthConfig
+from .wheel import TimingWheel
+
+
+_logger = logging.getLogger(__name__)
+
+
+class DeviceState(IntEnum):
+    """States of a device health"""
+    HEALTHY = 0
+    BACKOFF = 1
+    PROBING = 2
+
+
+def is_device_failure(error: Any) -> bool:
+    """
+    Returns whether the IOCB error means the device did not respond, errors,
+    rejects and aborts sent by the device itself do not count
+    """
+    if isinstance(error, AbortPDU):
+        return not error.apduSrv
+    return not isinstance(error, APDU)
+
+
+class DeviceHealth:
+    """Class representing the health state of a single device"""
+
+    __slots__ = ("monitor", "address", "state", "failures", "backoff")
+
+    def __init__(self, monitor: "HealthMonitor", address: Address) -> None:
+        self.monitor = monitor
+        self.address = address
+        self.state = DeviceState.HEALTHY
+        self.failures = 0
+        self.backoff = 0
+
+    def process_task(self) -> None:
+        """Probes the device once its backoff elapses"""
+        self.monitor._probe(self)
+
+    def __str__(self) -> str:
+        return f"<DeviceHealth {self.address} {self.state.name}>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class HealthMonitor:
+    """
+    Class tracking consecutive failures of devices
+
+    A device failing failure_threshold times in a row is not polled for an
+    exponentially growing backoff, after which it is probed with a single
+    cheap read. Polling resumes once the probe or any other request succeeds.
+    """
+
+    def __init__(self, scheduler: TimingWheel, config: HealthConfig,
+                 probe: Callable[[Address], None],
+                 on_transition: Callable[[DeviceHealth], None]) -> None:
+        self.scheduler = scheduler
+        self.config = config
+        self.probe = probe
+        self.on_transition = on_transition
+        self.devices: dict[Address, DeviceHealth] = {}
+
+    def is_available(self, address: Address) -> bool:
+        """Returns whether the device at the address should be polled"""
+        health = self.devices.get(address)
+        return health is None or health.state == DeviceState.HEALTHY
+
+    def record(self, address: Address, error: Any) -> None:
+        """Records the outcome of a request to the device at the address"""
+        if error is not None and is_device_failure(error):
+            self.record_failure(address)
+        else:
+            self.record_success(address)
+
+    def record_success(self, address: Address) -> None:
+        """Records a successful request to the device at the address"""
+        health = self.devices.get(address)
+        if health is None:
+            return
+        del self.devices[address]
+        self.scheduler.cancel(health)
+        if health.state != DeviceState.HEALTHY:
+            health.state = DeviceState.HEALTHY
+            health.failures = 0
+            _logger.info("%r is responding again", address)
+            self.on_transition(health)
+
+    def record_failure(self, address: Address) -> None:
+        """Records a failed request to the device at the address"""
+        if not self.config.enabled:
+            return
+        health = self.devices.get(address)
+        if health is None:
+            health = self.devices[address] = DeviceHealth(self, address)
+        if health.state == DeviceState.BACKOFF:
+            return
+        health.failures += 1
+        if health.failures < self.config.failure_threshold:
+            return
+        health.backoff = min(
+            self.config.backoff * 2 ** (health.failures
+                                        - self.config.failure_threshold),
+            self.config.max_backoff,
+        )
+        health.state = DeviceState.BACKOFF
+        _logger.warning("%r failed %d times in a row, backing off for %d s",
+                        address, health.failures, health.backoff)
+        self.scheduler.schedule(health, health.backoff)
+        self.on_transition(health)
+
+    def _probe(self, health: DeviceHealth) -> None:
+        health.state = DeviceState.PROBING
+        _logger.debug("Probing %r", health.address)
+        self.on_transition(health)
+        self.probe(health.address)
@@ -1,58 +1,104 @@
 import logging
-from multiprocessing import Process, Queue
-from time import time_ns
-from typing import Any
+from time import monotonic, time_ns
+from typing import Any, BinaryIO
+
+from .config import OutputConfig
+from .sink import create_sink
 
 _logger = logging.getLogger(__name__)
 
-class InfluxLine:
-    """Class representing a single InfluxDB measurement"""
+_TAG_ESCAPES = str.maketrans({",": r"\,", "=": r"\=", " ": r"\ "})
+
+
+def escape_tag(value: Any) -> str:
+    """Escapes a tag key or value for use in InfluxDB Line Protocol"""
+    return str(value).translate(_TAG_ESCAPES)
 
-    def __init__(self, key: str, value: Any, *tags: tuple[str, Any]) -> None:
-        self.key = key
-        self.value = value
-        self.tags = tags
-        self.timestamp = time_ns()
+
+def line_prefix(measurement: str, *tags: tuple[str, Any]) -> str:
+    """
+    Returns the measurement name with escaped tags that starts every line of
+    the measurement
+    """
+    return "".join((measurement, *(f",{escape_tag(tag_key)}="
+                                   f"{escape_tag(tag_value)}"
+                                   for tag_key, tag_value in tags)))
 
 
 class InfluxLPR:
-    """Class for printing measurements in InfluxDB Line Protocol format"""
-
-    def __init__(self) -> None:
-        self.queue: Queue[InfluxLine] = Queue()
-        self.print_job = Process(target=self._print_task)
-        self.print_job.start()
-
-    def print(self, key: str, value: Any, *tags: tuple[str, Any]) -> None:
-        """Adds the measurement to the print queue"""
-        # _logger.error("KEY %s", key)
-        # _logger.error("VALUE %s", value)
-        # _logger.error("HOPSEM %s", *tags)
-        self.queue.put(InfluxLine(key, value, *tags))
-
-    def _print_task(self) -> None:
-        try:
-            while True:
-                line = self.queue.get(block=True)
-                self._print_influx_line(line)
-        except KeyboardInterrupt:
-            pass
-
-    @staticmethod
-    def _print_influx_line(line: InfluxLine) -> None:
-        tags_str = ",".join(f"{tagKey}={tagValue}"
-                            for tagKey, tagValue in line.tags)
-        tags_str = f",{tags_str}" if tags_str else tags_str
-        value = line.value
+    """
+    Class for printing measurements in InfluxDB Line Protocol format
+
+    Lines are encoded in-process and kept in a buffer that is passed to the
+    output sink in a single write once the configured size or time threshold
+    is reached or when flush() is called explicitly. The stream is used by
+    the stdout sink instead of stdout.
+    """
+
+    def __init__(self, config: OutputConfig,
+                 stream: BinaryIO | None = None) -> None:
+        self.config = config
+        self.sink = create_sink(config, stream)
+        self.buffer: list[str] = []
+        self.last_flush = monotonic()
+        self.last_flush_lines = 0
+        self.max_flush_lines = 0
+        self.flush_count = 0
+        self.flushed_lines = 0
+
+    def print(self, key: str, value: Any, *tags: tuple[str, Any],
+              measurement: str = "bacnet") -> None:
+        """Adds the measurement to the output buffer"""
+        self.print_prefixed(line_prefix(measurement, *tags), key, value)
+
+    def print_prefixed(self, prefix: str, key: str, value: Any) -> None:
+        """
+        Adds the measurement with an already serialized line prefix to the
+        output buffer
+        """
+        timestamp = time_ns()
         if isinstance(value, list):
             for index, inner in enumerate(value):
-                print(f"bacnet{tags_str},index={index} "
-                      f"{line.key}={inner} {line.timestamp}")
-        elif line.value == "inactive":
-            print(f"bacnet{tags_str} {line.key}=0 {line.timestamp}")
-
-        elif line.value == "active":
-            print(f"bacnet{tags_str} {line.key}=1 {line.timestamp}")
-                
+                self.buffer.append(f"{prefix},index={index} "
+                                   f"{key}={inner} {timestamp}\n")
+        elif value == "inactive":
+            self.buffer.append(f"{prefix} {key}=0 {timestamp}\n")
+        elif value == "active":
+            self.buffer.append(f"{prefix} {key}=1 {timestamp}\n")
         else:
-            print(f"bacnet{tags_str} {line.key}={line.value} {line.timestamp}")
+            self.buffer.append(f"{prefix} {key}={value} {timestamp}\n")
+        if len(self.buffer) >= self.config.flush_lines:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes all buffered lines to the output sink in one write"""
+        self.last_flush = monotonic()
+        if not self.buffer:
+            return
+        lines = len(self.buffer)
+        data = "".join(self.buffer).encode()
+        self.buffer.clear()
+        self.sink.write(data, lines)
+        self.last_flush_lines = lines
+        self.max_flush_lines = max(self.max_flush_lines, lines)
+        self.flush_count += 1
+        self.flushed_lines += lines
+        _logger.debug("Flushed %d lines", lines)
+
+    def take_max_flush_lines(self) -> int:
+        """
+        Returns the largest number of lines flushed at once since the last
+        call and resets it
+        """
+        max_flush_lines, self.max_flush_lines = self.max_flush_lines, 0
+        return max_flush_lines
+
+    def flush_if_due(self) -> None:
+        """Flushes the buffer if the flush interval has elapsed"""
+        if monotonic() - self.last_flush >= self.config.flush_interval:
+            self.flush()
+
+    def close(self) -> None:
+        """Flushes remaining lines and closes the sink before shutdown"""
+        self.flush()
+        self.sink.close()
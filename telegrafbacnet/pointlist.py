@@ -0,0 +1,263 @@
+import csv
+import logging
+from typing import Iterable, Iterator
+
+from bacpypes.basetypes import PropertyIdentifier
+from bacpypes.pdu import Address
+from bacpypes.primitivedata import ObjectIdentifier, ObjectType
+
+from tomlconfig import ConfigError
+
+from .config import DeviceConfig, ObjectConfig, PointListConfig
+
+
+_logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ede")
+
+_DEFAULT_DELIMITERS = {"csv": ",", "ede": ";"}
+_CSV_COLUMNS = ("address", "device_identifier", "device_name", "object",
+                "properties", "sensorType", "interval")
+# Columns of EDE data rows used by the reader
+_EDE_DEVICE = 1
+_EDE_OBJECT_NAME = 2
+_EDE_OBJECT_TYPE = 3
+_EDE_OBJECT_INSTANCE = 4
+_EDE_SUPPORTS_COV = 10
+_EDE_TRUE = ("y", "yes", "x", "1", "true")
+# Number of invalid rows reported before giving up
+_MAX_ERRORS = 10
+
+_OBJECT_TYPE_NAMES = {value: name for name, value
+                      in ObjectType.enumerations.items()}
+
+# (address, device identifier, device name, object or None for a row
+# naming the device only)
+PointRow = tuple[str | None, int | None, str | None, ObjectConfig | None]
+
+
+class _RowError(ValueError):
+    pass
+
+
+def _object_type(value: str) -> str:
+    value = value.strip()
+    if value.isdigit():
+        name = _OBJECT_TYPE_NAMES.get(int(value))
+        if name is None:
+            raise _RowError(f"unknown object type {value}")
+        return name
+    if value not in ObjectType.enumerations:
+        raise _RowError(f"unknown object type {value!r}")
+    return value
+
+
+def _instance(value: str, what: str) -> int:
+    try:
+        instance = int(value)
+    except ValueError:
+        raise _RowError(f"invalid {what} {value!r}") from None
+    if not 0 <= instance < 1 << 22:
+        raise _RowError(f"{what} {instance} out of range")
+    return instance
+
+
+class PointListReader:
+    """
+    Class reading points from a flat CSV point list or a BACnet EDE export
+
+    Rows are streamed and validated one by one and grouped into devices
+    without building per-point TOML tables. CSV point lists have a header
+    naming the columns address, device_identifier, device_name, object
+    ("analogValue:1"), properties (separated by spaces), sensorType and
+    interval, only object and one of address or device_identifier are
+    required. EDE rows have no address, their devices are located by
+    identifier.
+    """
+
+    def __init__(self, config: PointListConfig) -> None:
+        if config.format not in FORMATS:
+            raise ConfigError(f"Unknown point list format {config.format!r}")
+        self.config = config
+        self.delimiter = config.delimiter \
+            or _DEFAULT_DELIMITERS[config.format]
+        try:
+            self.default_properties = tuple(
+                self._check_property(prop) for prop in config.properties)
+        except _RowError as ex:
+            raise ConfigError(f"Point list {config.path}: {ex}") from ex
+        self.properties_cache: dict[str, tuple[str, ...]] = {}
+        self.errors: list[str] = []
+        self.points = 0
+
+    def _check_property(self, prop: str) -> str:
+        if prop not in PropertyIdentifier.enumerations:
+            raise _RowError(f"unknown property {prop!r}")
+        return prop
+
+    def _object(self, object_type: str, instance: int,
+                properties: tuple[str, ...] | None = None,
+                sensor_type: str | None = None,
+                read_interval: int | None = None,
+                cov: bool | None = None) -> ObjectConfig:
+        obj = ObjectConfig()
+        obj.object_identifier = ObjectIdentifier(object_type, instance)
+        obj.properties = properties or self.default_properties
+        obj.sensorType = sensor_type
+        obj.read_interval = read_interval if read_interval is not None \
+            else self.config.read_interval
+        obj.cov = self.config.cov if cov is None else cov
+        return obj
+
+    def _properties(self, value: str) -> tuple[str, ...] | None:
+        if not value:
+            return None
+        properties = self.properties_cache.get(value)
+        if properties is None:
+            properties = self.properties_cache[value] = tuple(
+                self._check_property(prop) for prop in value.split())
+        return properties
+
+    def _csv_rows(self, rows: Iterator[list[str]]) -> Iterator[PointRow]:
+        header = [column.strip() for column in next(rows, [])]
+        if "object" not in header or ("address" not in header
+                                      and "device_identifier" not in header):
+            raise _RowError("the header must name the object and the address "
+                            "or device_identifier columns")
+        indexes = [header.index(name) if name in header else None
+                   for name in _CSV_COLUMNS]
+        padding = [""] * len(header)
+        for row in rows:
+            if not row or row[0].startswith("#"):
+                continue
+            if len(row) < len(header):
+                row += padding[len(row):]
+            address, device_identifier, device_name, object_identifier, \
+                properties, sensor_type, interval = (
+                    row[index].strip() if index is not None else ""
+                    for index in indexes)
+            try:
+                if not address and not device_identifier:
+                    raise _RowError("address or device_identifier required")
+                object_type, _, instance = object_identifier.partition(":")
+                yield (
+                    address or None,
+                    _instance(device_identifier, "device identifier")
+                    if device_identifier else None,
+                    device_name or None,
+                    self._object(
+                        _object_type(object_type),
+                        _instance(instance, "object instance"),
+                        self._properties(properties),
+                        sensor_type or None,
+                        _instance(interval, "interval") if interval else None,
+                    ),
+                )
+            except _RowError as ex:
+                self._error(rows, ex)
+
+    def _ede_rows(self, rows: Iterator[list[str]]) -> Iterator[PointRow]:
+        for row in rows:
+            # hlavicka EDE konci radkem s nazvy sloupcu zacinajicim #
+            if not row or row[0].startswith("#") \
+                    or len(row) <= _EDE_OBJECT_INSTANCE \
+                    or not row[_EDE_DEVICE].strip().isdigit():
+                continue
+            try:
+                device_identifier = _instance(row[_EDE_DEVICE],
+                                              "device identifier")
+                object_type = _object_type(row[_EDE_OBJECT_TYPE])
+                instance = _instance(row[_EDE_OBJECT_INSTANCE],
+                                     "object instance")
+                if object_type == "device":
+                    yield None, device_identifier, \
+                        row[_EDE_OBJECT_NAME].strip() or None, None
+                    continue
+                supports_cov = len(row) > _EDE_SUPPORTS_COV \
+                    and row[_EDE_SUPPORTS_COV].strip().lower() in _EDE_TRUE
+                yield None, device_identifier, None, self._object(
+                    object_type, instance,
+                    cov=self.config.cov and supports_cov)
+            except _RowError as ex:
+                self._error(rows, ex)
+
+    def _error(self, rows: Iterator[list[str]], ex: _RowError) -> None:
+        line = getattr(rows, "line_num", "?")
+        self.errors.append(f"{self.config.path}:{line}: {ex}")
+        if len(self.errors) >= _MAX_ERRORS:
+            self._raise()
+
+    def _raise(self) -> None:
+        raise ConfigError("Invalid point list:\n" + "\n".join(self.errors))
+
+    def rows(self) -> Iterator[PointRow]:
+        """Returns an iterator of validated rows of the point list"""
+        try:
+            with open(self.config.path, newline="",
+                      encoding="utf-8-sig") as file:
+                rows = csv.reader(file, delimiter=self.delimiter)
+                try:
+                    if self.config.format == "ede":
+                        yield from self._ede_rows(rows)
+                    else:
+                        yield from self._csv_rows(rows)
+                except _RowError as ex:
+                    self._error(rows, ex)
+        except OSError as ex:
+            raise ConfigError(f"Cannot read point list {self.config.path}: "
+                              f"{ex}") from ex
+        if self.errors:
+            self._raise()
+
+
+def read_point_lists(configs: Iterable[PointListConfig]) \
+        -> tuple[list[DeviceConfig], list[DeviceConfig]]:
+    """
+    Returns devices defined in the point lists, the first list contains
+    devices with an address, the second one devices to be located by their
+    identifier
+    """
+    # zarizeni se seskupuji podle textu adresy, Address se parsuje jednou
+    by_address: dict[str, tuple[DeviceConfig, list[ObjectConfig]]] = {}
+    by_identifier: dict[int, tuple[DeviceConfig, list[ObjectConfig]]] = {}
+    for config in configs:
+        reader = PointListReader(config)
+        for address, device_identifier, device_name, obj in reader.rows():
+            if address is not None:
+                entry = by_address.get(address)
+            else:
+                assert device_identifier is not None
+                entry = by_identifier.get(device_identifier)
+            if entry is None:
+                device = DeviceConfig()
+                device.device_identifier = device_identifier
+                device.read_multiple = config.read_multiple
+                entry = device, []
+                if address is None:
+                    assert device_identifier is not None
+                    by_identifier[device_identifier] = entry
+                else:
+                    try:
+                        device.address = Address(address)
+                    except ValueError as ex:
+                        raise ConfigError(f"{config.path}: invalid address "
+                                          f"{address!r}: {ex}") from ex
+                    by_address[address] = entry
+            device, objects = entry
+            if device_name is not None:
+                device.device_name = device_name
+            if device.device_identifier is None:
+                device.device_identifier = device_identifier
+            if obj is not None:
+                reader.points += 1
+                objects.append(obj)
+        _logger.info("Read %d points from point list %s", reader.points,
+                     config.path)
+    devices: list[DeviceConfig] = []
+    for device, objects in (*by_address.values(), *by_identifier.values()):
+        if device.device_identifier is None and device.device_name is None:
+            raise ConfigError(f"Point list device @{device.address} has "
+                              "neither device_identifier nor device_name")
+        device.objects = tuple(objects)
+        devices.append(device)
+    return devices[:len(by_address)], devices[len(by_address):]
@@ -0,0 +1,123 @@
+from collections import deque
+import logging
+from time import monotonic
+from typing import Callable
+
+from bacpypes.iocb import IOCB
+from bacpypes.pdu import Address
+
+
+_logger = logging.getLogger(__name__)
+
+
+class RequestScheduler:
+    """
+    Class limiting the number of outstanding confirmed requests per device and
+    per remote network
+
+    Requests exceeding a limit are queued and dispatched in FIFO order once
+    an earlier request to the same device or network completes.
+    """
+
+    def __init__(self, dispatch: Callable[[IOCB], None],
+                 max_device_requests: int,
+                 max_network_requests: int | None = None) -> None:
+        self.dispatch = dispatch
+        self.max_device_requests = max_device_requests
+        self.max_network_requests = max_network_requests
+        self.device_queues: dict[Address, deque[tuple[IOCB, float]]] = {}
+        self.network_waiting: dict[int, deque[Address]] = {}
+        self.waiting_devices: set[Address] = set()
+        self.device_in_flight: dict[Address, int] = {}
+        self.network_in_flight: dict[int, int] = {}
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def wait_average(self) -> float:
+        """Average time in seconds requests spent waiting in the queue"""
+        return self.wait_total / self.wait_count if self.wait_count else 0.0
+
+    @staticmethod
+    def _network(address: Address) -> int | None:
+        if address.addrType == Address.remoteStationAddr:
+            return address.addrNet
+        return None
+
+    def _device_free(self, address: Address) -> bool:
+        return self.device_in_flight.get(address, 0) \
+            < self.max_device_requests
+
+    def _network_free(self, network: int | None) -> bool:
+        return network is None or self.max_network_requests is None \
+            or self.network_in_flight.get(network, 0) \
+            < self.max_network_requests
+
+    def submit(self, iocb: IOCB) -> None:
+        """Dispatches the request or queues it if a limit is reached"""
+        address = iocb.args[0].pduDestination
+        queue = self.device_queues.get(address)
+        if queue is None:
+            queue = self.device_queues[address] = deque()
+        queue.append((iocb, monotonic()))
+        self.queue_depth += 1
+        self._dispatch_device(address)
+        if queue:
+            _logger.debug("Queued IOCB for %r, queue depth %d", address,
+                          self.queue_depth)
+
+    def _dispatch_device(self, address: Address) -> None:
+        queue = self.device_queues.get(address)
+        network = self._network(address)
+        while queue and self._device_free(address):
+            if not self._network_free(network):
+                assert network is not None
+                if address not in self.waiting_devices:
+                    self.waiting_devices.add(address)
+                    self.network_waiting.setdefault(network, deque()) \
+                        .append(address)
+                return
+            iocb, queued = queue.popleft()
+            self.queue_depth -= 1
+            self._dispatch(iocb, address, network, queued)
+        if queue is not None and not queue \
+                and self.device_queues.get(address) is queue:
+            del self.device_queues[address]
+
+    def _dispatch(self, iocb: IOCB, address: Address, network: int | None,
+                  queued: float) -> None:
+        wait = monotonic() - queued
+        self.wait_count += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.in_flight += 1
+        self.device_in_flight[address] = \
+            self.device_in_flight.get(address, 0) + 1
+        if network is not None:
+            self.network_in_flight[network] = \
+                self.network_in_flight.get(network, 0) + 1
+        iocb.add_callback(self._release, address, network)
+        self.dispatch(iocb)
+
+    def _release(self, _: IOCB, address: Address, network: int | None) \
+            -> None:
+        self.in_flight -= 1
+        self.device_in_flight[address] -= 1
+        if not self.device_in_flight[address]:
+            del self.device_in_flight[address]
+        if network is not None:
+            self.network_in_flight[network] -= 1
+            if not self.network_in_flight[network]:
+                del self.network_in_flight[network]
+            waiting = self.network_waiting.get(network)
+            while waiting and self._network_free(network):
+                waiting_address = waiting.popleft()
+                self.waiting_devices.discard(waiting_address)
+                self._dispatch_device(waiting_address)
+            if waiting is not None and not waiting \
+                    and self.network_waiting.get(network) is waiting:
+                del self.network_waiting[network]
+        self._dispatch_device(address)
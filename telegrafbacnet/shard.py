@@ -0,0 +1,210 @@
+import logging
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+import os
+from functools import partial
+import selectors
+from signal import SIGHUP, SIGTERM, signal
+import sys
+from typing import Any, BinaryIO, Callable
+from zlib import crc32
+
+from bacpypes.pdu import Address
+
+from tomlconfig import ConfigError
+
+from .config import Config, ShardingConfig
+from .wheel import TimingWheel
+
+
+IAmCallback = Callable[[Address, int, int, str], None]
+
+_logger = logging.getLogger(__name__)
+
+# Interval in seconds of checking messages from the parent
+_CONTROL_INTERVAL = 0.1
+
+
+def shard_of(address: Address, workers: int, key: str = "address") -> int:
+    """
+    Returns the index of the worker the device at the address belongs to,
+    the index is stable across restarts
+    """
+    if key == "network":
+        network = address.addrNet \
+            if address.addrType == Address.remoteStationAddr else None
+        return (network or 0) % workers
+    return crc32(str(address).encode()) % workers
+
+
+def worker_address(address: Address, index: int) -> Address:
+    """Returns the local address of the index-th worker"""
+    if not hasattr(address, "addrTuple"):
+        raise ConfigError("Sharding requires an IPv4 address")
+    host, port = address.addrTuple
+    mask = bin(address.addrMask).count("1")
+    return Address(f"{host}/{mask}:{port + index}")
+
+
+class ShardLink:
+    """
+    Class connecting a worker to the parent process
+
+    Devices are assigned to workers by a hash of their address or by their
+    network number. Only the first worker listening on the configured port
+    receives broadcast I-Am responses, it forwards those of devices owned by
+    other workers through the parent, so new devices are spread across the
+    workers by the same key as configured ones.
+    """
+
+    def __init__(self, index: int, config: ShardingConfig,
+                 connection: Connection) -> None:
+        self.index = index
+        self.config = config
+        self.connection = connection
+        self.scheduler: TimingWheel | None = None
+        self.on_i_am: IAmCallback | None = None
+
+    def attach(self, scheduler: TimingWheel, on_i_am: IAmCallback) -> None:
+        """Starts processing messages forwarded to the worker"""
+        self.scheduler = scheduler
+        self.on_i_am = on_i_am
+        scheduler.schedule(self, _CONTROL_INTERVAL)
+
+    @property
+    def discovers(self) -> bool:
+        """Whether the worker sends Who-Is requests"""
+        return self.index == 0
+
+    def owns(self, address: Address) -> bool:
+        """Returns whether the device at the address belongs to the worker"""
+        return shard_of(address, self.config.workers, self.config.key) \
+            == self.index
+
+    def forward_i_am(self, address: Address, device_identifier: int,
+                     max_apdu_length_accepted: int,
+                     segmentation_supported: str) -> None:
+        """Forwards the I-Am of a device to the worker owning it"""
+        owner = shard_of(address, self.config.workers, self.config.key)
+        self.connection.send((owner, (str(address), device_identifier,
+                                      max_apdu_length_accepted,
+                                      segmentation_supported)))
+
+    def process_task(self) -> None:
+        assert self.scheduler is not None and self.on_i_am is not None
+        self.scheduler.schedule(self, _CONTROL_INTERVAL)
+        while self.connection.poll():
+            address, device_identifier, max_apdu, segmentation = \
+                self.connection.recv()
+            self.on_i_am(Address(address), device_identifier, max_apdu,
+                         segmentation)
+
+    def __str__(self) -> str:
+        return f"<ShardLink {self.index}/{self.config.workers}>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def _worker_config(config: Config, index: int) -> Config:
+    config.address = worker_address(config.address, index)
+    if config.discovery.cache_file is not None:
+        config.discovery.cache_file = f"{config.discovery.cache_file}.{index}"
+    return config
+
+
+def _load_worker_config(loader: Callable[[], Config], index: int) -> Config:
+    return _worker_config(loader(), index)
+
+
+def _run_worker(index: int, config: Config, connection: Connection,
+                output: int, loader: Callable[[], Config] | None,
+                config_path: str | None) -> None:
+    # app importuje tento modul
+    from .engine import create_application
+
+    config = _worker_config(config, index)
+    shard = ShardLink(index, config.sharding, connection)
+    stream: BinaryIO = os.fdopen(output, "wb")
+    app = create_application(config, shard=shard, stream=stream)
+    app.register_devices(*(device for device in config.device
+                           if shard.owns(device.address)))
+    app.load_point_lists()
+    app.load_discovery_cache()
+    if loader is not None:
+        app.enable_reload(partial(_load_worker_config, loader, index),
+                          config_path)
+    _logger.info("Worker %d listening on %s", index, config.address)
+    app.run_forever()
+    app.close()
+
+
+def _write_lines(pending: bytearray, data: bytes, stream: BinaryIO) -> None:
+    pending += data
+    end = pending.rfind(b"\n") + 1
+    if end:
+        stream.write(pending[:end])
+        stream.flush()
+        del pending[:end]
+
+
+def _signal_workers(processes: list[Process], signum: int) -> None:
+    for process in processes:
+        if process.pid is not None:
+            os.kill(process.pid, signum)
+
+
+def run_sharded(config: Config, loader: Callable[[], Config] | None = None,
+                config_path: str | None = None) -> None:
+    """
+    Runs the collector in worker processes and merges their output
+
+    Every worker writes whole lines to its own pipe, the parent copies
+    complete lines to stdout, so lines of different workers never interleave.
+    With the loader, workers reload the config on SIGHUP sent to the parent.
+    """
+    signal(SIGTERM, lambda *_: sys.exit(0))
+    workers = config.sharding.workers
+    selector = selectors.DefaultSelector()
+    processes: list[Process] = []
+    connections: list[Connection] = []
+    for index in range(workers):
+        read_fd, write_fd = os.pipe()
+        parent_connection, worker_connection = Pipe()
+        process = Process(target=_run_worker, name=f"worker-{index}",
+                          args=(index, config, worker_connection, write_fd,
+                                loader, config_path))
+        process.start()
+        os.close(write_fd)
+        worker_connection.close()
+        processes.append(process)
+        connections.append(parent_connection)
+        selector.register(read_fd, selectors.EVENT_READ,
+                          (index, bytearray()))
+        selector.register(parent_connection, selectors.EVENT_READ, index)
+    if loader is not None:
+        signal(SIGHUP, lambda *_: _signal_workers(processes, SIGHUP))
+    stdout = sys.stdout.buffer
+    try:
+        while True:
+            for key, _ in selector.select():
+                data: Any = key.data
+                if isinstance(data, int):
+                    try:
+                        owner, message = connections[data].recv()
+                    except EOFError:
+                        selector.unregister(key.fileobj)
+                        continue
+                    connections[owner].send(message)
+                    continue
+                index, pending = data
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    _logger.error("Worker %d exited, stopping", index)
+                    sys.exit(1)
+                _write_lines(pending, chunk, stdout)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
@@ -0,0 +1,278 @@
+import gzip
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+import logging
+from queue import Empty
+import sys
+from threading import Event, Thread
+from time import monotonic
+from typing import BinaryIO
+from urllib.parse import urlsplit
+
+from tomlconfig import ConfigError
+
+from .buffer import LineBuffer
+from .config import OutputBufferConfig, OutputConfig
+
+
+_logger = logging.getLogger(__name__)
+
+_GZIP_LEVEL = 6
+
+
+class OutputSink:
+    """
+    Base class of destinations of encoded measurements
+
+    Every sink counts what it has written, so that its throughput can be
+    reported by the self-telemetry.
+    """
+
+    def __init__(self) -> None:
+        self.batches = 0
+        self.lines = 0
+        self.bytes = 0
+        self.retries = 0
+        self.dropped_lines = 0
+        self.write_time = 0.0
+
+    @property
+    def queued_lines(self) -> int:
+        """Number of lines accepted but not written yet"""
+        return 0
+
+    @property
+    def overflow_lines(self) -> int:
+        """Number of lines dropped when the buffer was full"""
+        return 0
+
+    @property
+    def spilled_lines(self) -> int:
+        """Number of lines spilled to disk when the buffer was full"""
+        return 0
+
+    @property
+    def block_time(self) -> float:
+        """Seconds the collector waited for room in the buffer"""
+        return 0.0
+
+    def write(self, data: bytes, lines: int) -> None:
+        """Writes the lines encoded in the data"""
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        """Writes everything accepted so far and releases the sink"""
+
+
+class BufferedSink(OutputSink):
+    """
+    Base class of sinks written by a writer thread from a bounded buffer
+
+    The collector only adds lines to the buffer, so a slow destination does
+    not stall the collection until the buffer is full. On close, buffered
+    lines are written for at most close_timeout seconds. The writer joins
+    buffered chunks into batches of batch_lines lines written at least
+    batch_interval seconds after their first line. Subclasses call the
+    constructor last, it starts the writer thread.
+    """
+
+    def __init__(self, config: OutputBufferConfig, batch_lines: int,
+                 batch_interval: float) -> None:
+        super().__init__()
+        self.buffer_config = config
+        self.buffer = LineBuffer(config)
+        self.batch_lines = batch_lines
+        self.batch_interval = batch_interval
+        self.pending_lines = 0
+        self.closing = Event()
+        self.thread = Thread(target=self._run, name=type(self).__name__,
+                             daemon=True)
+        self.thread.start()
+
+    @property
+    def queued_lines(self) -> int:
+        return self.buffer.queued_lines + self.pending_lines
+
+    @property
+    def overflow_lines(self) -> int:
+        return self.buffer.dropped_lines
+
+    @property
+    def spilled_lines(self) -> int:
+        return self.buffer.spilled_lines
+
+    @property
+    def block_time(self) -> float:
+        return self.buffer.block_time
+
+    def write(self, data: bytes, lines: int) -> None:
+        self.buffer.put(data, lines)
+
+    def close(self) -> None:
+        self.buffer.close()
+        self.thread.join(self.buffer_config.close_timeout)
+        if self.thread.is_alive():
+            # zbytek se uz neopakuje
+            self.closing.set()
+            _logger.error("Output not written within %d s, %d lines lost",
+                          self.buffer_config.close_timeout,
+                          self.queued_lines)
+            return
+        self.buffer.release()
+
+    def _run(self) -> None:
+        batch: list[bytes] = []
+        deadline = 0.0
+        while True:
+            try:
+                item = self.buffer.get(
+                    max(0.0, deadline - monotonic()) if batch else None)
+            except Empty:
+                self._flush(batch)
+                batch = []
+                continue
+            if item is None:
+                if batch:
+                    self._flush(batch)
+                self._finish()
+                return
+            if not batch:
+                deadline = monotonic() + self.batch_interval
+            batch.append(item[0])
+            self.pending_lines += item[1]
+            if self.pending_lines >= self.batch_lines:
+                self._flush(batch)
+                batch = []
+
+    def _flush(self, batch: list[bytes]) -> None:
+        self._send(b"".join(batch), self.pending_lines)
+        self.pending_lines = 0
+
+    def _send(self, data: bytes, lines: int) -> None:
+        raise NotImplementedError()
+
+    def _finish(self) -> None:
+        pass
+
+
+class StreamSink(BufferedSink):
+    """Class writing measurements to a binary stream, stdout by default"""
+
+    def __init__(self, config: OutputConfig,
+                 stream: BinaryIO | None = None) -> None:
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        # radky cekajici v bufferu se zapisuji najednou
+        super().__init__(config.buffer, config.flush_lines, 0.0)
+
+    def _send(self, data: bytes, lines: int) -> None:
+        start = monotonic()
+        try:
+            self.stream.write(data)
+            self.stream.flush()
+        except OSError as ex:
+            self.dropped_lines += lines
+            _logger.error("Failed to write %d lines: %r, dropping them",
+                          lines, ex)
+            return
+        self.write_time += monotonic() - start
+        self.batches += 1
+        self.lines += lines
+        self.bytes += len(data)
+
+
+class HTTPSink(BufferedSink):
+    """
+    Class writing measurements to the InfluxDB HTTP write API
+
+    Lines are posted in batches of batch_lines lines or batch_interval
+    seconds. The connection is kept alive between requests and bodies are
+    gzip compressed. Requests failing on the network, 429 or 5xx are retried
+    with exponential backoff, a batch that still fails or is refused with
+    another status is dropped.
+    """
+
+    def __init__(self, config: OutputConfig) -> None:
+        http = config.http
+        self.config = http
+        url = urlsplit(http.url)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ConfigError(f"Invalid output URL {http.url!r}")
+        if http.max_retries < 0:
+            raise ConfigError(
+                f"Invalid output max_retries {http.max_retries!r}")
+        self.connection_class = HTTPSConnection if url.scheme == "https" \
+            else HTTPConnection
+        self.host = url.hostname
+        self.port = url.port
+        self.path = f"{url.path or '/'}?{url.query}" if url.query \
+            else url.path or "/"
+        self.headers = {"Content-Type": "text/plain; charset=utf-8"}
+        if http.gzip:
+            self.headers["Content-Encoding"] = "gzip"
+        if http.token is not None:
+            self.headers["Authorization"] = f"Token {http.token}"
+        self.connection: HTTPConnection | None = None
+        super().__init__(config.buffer, http.batch_lines, http.batch_interval)
+
+    def _finish(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+
+    def _post(self, body: bytes) -> tuple[int, float | None]:
+        if self.connection is None:
+            self.connection = self.connection_class(
+                self.host, self.port, timeout=self.config.timeout)
+        self.connection.request("POST", self.path, body, self.headers)
+        response = self.connection.getresponse()
+        # bez docteni odpovedi nelze spojeni pouzit znovu
+        response.read()
+        retry_after = response.getheader("Retry-After")
+        try:
+            return response.status, \
+                float(retry_after) if retry_after is not None else None
+        except ValueError:
+            return response.status, None
+
+    def _send(self, data: bytes, lines: int) -> None:
+        body = gzip.compress(data, _GZIP_LEVEL) if self.config.gzip else data
+        backoff = self.config.retry_backoff
+        for attempt in range(self.config.max_retries + 1):
+            start = monotonic()
+            retry_after = None
+            try:
+                status, retry_after = self._post(body)
+            except (OSError, HTTPException) as ex:
+                assert self.connection is not None
+                self.connection.close()
+                error = repr(ex)
+            else:
+                self.write_time += monotonic() - start
+                if status < 300:
+                    self.batches += 1
+                    self.lines += lines
+                    self.bytes += len(body)
+                    return
+                error = f"HTTP status {status}"
+                if status != 429 and status < 500:
+                    break
+            if attempt == self.config.max_retries or self.closing.is_set():
+                break
+            delay = retry_after if retry_after is not None else backoff
+            _logger.warning("Failed to write %d lines: %s, retrying in %.1f s",
+                            lines, error, delay)
+            self.retries += 1
+            backoff = min(backoff * 2, self.config.max_backoff)
+            if self.closing.wait(delay):
+                break
+        self.dropped_lines += lines
+        _logger.error("Failed to write %d lines: %s, dropping them", lines,
+                      error)
+
+
+def create_sink(config: OutputConfig, stream: BinaryIO | None = None) \
+        -> OutputSink:
+    """Returns the sink selected in the config"""
+    if config.sink == "http":
+        return HTTPSink(config)
+    if config.sink != "stdout":
+        raise ConfigError(f"Unknown output sink {config.sink!r}")
+    return StreamSink(config, stream)
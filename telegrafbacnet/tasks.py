@@ -1,8 +1,9 @@
+from functools import lru_cache
 import logging
+import os
 from os import getpid
-from random import randint
-from time import time
-from typing import Callable, Iterable
+from time import monotonic
+from typing import Callable, Collection, Iterable, Protocol, Sequence
 
 from bacpypes.apdu import (
     ConfirmedRequestSequence,
@@ -12,99 +13,340 @@ from bacpypes.apdu import (
     SubscribeCOVRequest,
 )
 from bacpypes.basetypes import PropertyReference
-from bacpypes.core import deferred
+from bacpypes.constructeddata import Array, List
 from bacpypes.iocb import IOCB, IOController
-from bacpypes.service.device import WhoIsIAmServices
-from bacpypes.task import OneShotTask
+from bacpypes.object import get_datatype
+from bacpypes.pdu import Address
+from bacpypes.primitivedata import CharacterString, ObjectIdentifier
 
-from .utils import first
+from .utils import first, is_service_unsupported
 
 from .config import Config, DeviceConfig, DiscoveryConfig, ObjectConfig
+from .cov import COVManager
+from .health import HealthMonitor, is_device_failure
+from .influx import InfluxLPR
+from .telemetry import Telemetry
+from .wheel import TimingWheel
 
 
 ResponseProcessor = Callable[[IOCB], None]
+# (path, modification time, size) of watched files, None for a missing one
+FileStates = tuple[tuple[str, int, int] | None, ...]
+ReadChunk = list[tuple[ObjectIdentifier, tuple[str, ...]]]
+
+# Encoded size estimates in octets of the parts of a ReadPropertyMultipleACK
+_ACK_HEADER_SIZE = 5
+_RESULT_OBJECT_SIZE = 7
+_RESULT_PROPERTY_SIZE = 5
+_PRIMITIVE_VALUE_SIZE = 8
+_STRING_VALUE_SIZE = 64
+_ARRAY_VALUE_SIZE = 96
+# Largest gap between identifiers of devices located by one WhoIsRequest
+_LOCATE_MAX_GAP = 64
+# Nice read intervals in seconds, each divides all longer ones, longer
+# intervals are snapped to whole hours
+_NICE_INTERVALS = (1, 5, 10, 30, 60, 300, 600, 1800, 3600)
+# Stretched read intervals are shortened to this multiple of the duration
+# of the last read once reads complete in time
+_STRETCH_MARGIN = 1.5
+# Largest device instance number
+_MAX_DEVICE_INSTANCE = 4194303
 
 _logger = logging.getLogger(__name__)
 
 
-class _BaseRecurringTask(OneShotTask):
-    def __init__(self, interval: int | None, offset: float | None = None) \
-            -> None:
+class WhoIsService(Protocol):
+    """Protocol of applications sending WhoIsRequest"""
+
+    def who_is(self, low_limit: int | None = None,
+               high_limit: int | None = None,
+               address: Address | None = None) -> None:
+        """Sends WhoIsRequest to the address"""
+
+
+class _BaseRecurringTask:
+    def __init__(self, scheduler: TimingWheel, interval: float | None,
+                 offset: float | None = None) -> None:
+        self.scheduler = scheduler
         self.interval = interval
         self.offset = offset
         self.cancelled = False
-        super().__init__()
         _logger.debug("Init %r", self)
 
-    def install_task(self, when: float | None = None,
-                     delta: float | None = None) -> None:
+    def install_task(self) -> None:
+        """Schedules the first run of the task"""
         if self.cancelled:
             return
         offset = self.offset if self.offset is not None else 0
-        super().install_task(when=time() + offset)
+        self.scheduler.schedule(self, offset)
+
+    @property
+    def delay(self) -> float:
+        """Seconds between runs of the task with an interval"""
+        assert self.interval is not None
+        return self.interval
 
     def process_task(self) -> None:
         _logger.debug("Pocess task %r", self)
         if self.interval and not self.cancelled:
-            super().install_task(delta=self.interval)
+            self.scheduler.schedule(self, self.delay)
 
     def cancel_task(self) -> None:
         """Forbids the scheduling of the task"""
         _logger.debug("Canceled task %r", self)
         self.cancelled = True
+        self.scheduler.cancel(self)
 
 
 class _BaseIOTask(_BaseRecurringTask):
-    def __init__(self, io_controller: IOController, interval: int,
-                 offset: float | None = None,
-                 callback: ResponseProcessor | None = None) -> None:
+    """
+    Base class of tasks sending requests to a device periodically
+
+    A run due while requests of the previous run are outstanding is counted
+    as an overrun and postponed until they complete, overdue runs are
+    coalesced into one, so that requests of a slow device do not pile up.
+    With max_stretch above 1, every overrun doubles the delay between runs up
+    to max_stretch times the interval, once runs complete in time the delay
+    is shortened back towards the interval.
+    """
+
+    device: DeviceConfig
+
+    def __init__(self, scheduler: TimingWheel, io_controller: IOController,
+                 interval: float, offset: float | None = None,
+                 callback: ResponseProcessor | None = None,
+                 health: HealthMonitor | None = None,
+                 max_stretch: float = 1.0) -> None:
         if offset is None:
-            offset = randint(0, interval * 1000 - 1) / 1000.0
+            offset = scheduler.spread(interval)
         self.io_controller = io_controller
         self.callback = callback
-        super().__init__(interval, offset)
+        self.health = health
+        self.max_stretch = max_stretch
+        self.stretch = 1.0
+        self.outstanding = 0
+        self.overdue = False
+        self.started_at = 0.0
+        self.overruns = 0
+        super().__init__(scheduler, interval, offset)
+
+    @property
+    def delay(self) -> float:
+        return super().delay * self.stretch
+
+    @property
+    def telemetry_tags(self) -> tuple[tuple[str, str | int], ...]:
+        """Tags identifying the task in the self-telemetry"""
+        return (("deviceAddress", str(self.device.address)),
+                ("task", type(self).__name__))
 
     def _add_callback(self, iocb: IOCB) -> None:
         if self.callback is not None:
             iocb.add_callback(self.callback)
+        if self.health is not None:
+            iocb.add_callback(self._record_health)
+
+    def _record_health(self, iocb: IOCB) -> None:
+        assert self.health is not None
+        self.health.record(self.device.address, iocb.ioError)
+
+    def _record_overrun(self) -> None:
+        self.overruns += 1
+        if self.max_stretch > 1:
+            self.stretch = min(self.stretch * 2, self.max_stretch)
+        log = _logger.warning if self.overruns == 1 else _logger.debug
+        log("Requests of %r are still outstanding after %.1f s, postponing, "
+            "%d overruns", self, monotonic() - self.started_at, self.overruns)
+
+    def _complete(self, _: IOCB) -> None:
+        self.outstanding -= 1
+        if self.outstanding:
+            return
+        if self.overdue:
+            self.overdue = False
+            if not self.cancelled:
+                self._send_requests()
+            return
+        if self.stretch == 1 or not self.interval:
+            return
+        duration = monotonic() - self.started_at
+        self.stretch = max(1.0, min(self.stretch, duration / self.interval
+                                    * _STRETCH_MARGIN))
 
     def process_task(self) -> None:
+        if self.outstanding:
+            self._record_overrun()
+            self.overdue = True
+            super().process_task()
+            return
         super().process_task()
+        self._send_requests()
+
+    def _send_requests(self) -> None:
+        if self.health is not None \
+                and not self.health.is_available(self.device.address):
+            _logger.debug("Skipping %r of unavailable device", self)
+            return
+        self.started_at = monotonic()
         for request in self._build_requests():
             iocb = IOCB(request)
             self._add_callback(iocb)
-            deferred(self.io_controller.request_io, iocb, str(self))
+            iocb.add_callback(self._complete)
+            self.outstanding += 1
+            self.io_controller.request_io(iocb, str(self))
+
+    @property
+    def key(self) -> tuple[object, ...]:
+        """Key identifying the task among tasks of its device"""
+        return (type(self),)
+
+    @property
+    def settings(self) -> tuple[object, ...]:
+        """
+        Settings the requests of the task are built from, a task with
+        the same key and settings as a running one can be replaced by it
+        """
+        raise NotImplementedError()
 
     def _build_requests(self) -> Iterable[ConfirmedRequestSequence]:
         raise NotImplementedError()
 
 
+def _max_stretch(config: Config) -> float:
+    return max(1.0, config.max_read_interval_factor) \
+        if config.adaptive_read_interval else 1.0
+
+
+def snap_interval(interval: int) -> int:
+    """
+    Returns the longest nice read interval not longer than the interval, so
+    that objects with close intervals are read together
+    """
+    if interval >= _NICE_INTERVALS[-1]:
+        return interval - interval % _NICE_INTERVALS[-1]
+    snapped = interval
+    for nice in _NICE_INTERVALS:
+        if nice > interval:
+            break
+        snapped = nice
+    return snapped
+
+
+@lru_cache(maxsize=1024)
+def _estimate_property_size(object_type: str, prop: str) -> int:
+    """
+    Returns an estimate of the encoded size of the property in
+    a ReadPropertyMultipleACK
+    """
+    datatype = get_datatype(object_type, prop)
+    if datatype is None:
+        return _RESULT_PROPERTY_SIZE + _STRING_VALUE_SIZE
+    if issubclass(datatype, (Array, List)):
+        return _RESULT_PROPERTY_SIZE + _ARRAY_VALUE_SIZE
+    if issubclass(datatype, CharacterString):
+        return _RESULT_PROPERTY_SIZE + _STRING_VALUE_SIZE
+    return _RESULT_PROPERTY_SIZE + _PRIMITIVE_VALUE_SIZE
+
+
 class DeviceReadTask(_BaseIOTask):
-    """Class for reading a BACnet device using ReadPropertyMultipleRequest"""
+    """
+    Class for reading a BACnet device using ReadPropertyMultipleRequest
+
+    Objects of the device are split into several independent requests so that
+    the response to each of them fits into the APDU size and segments the
+    device and this application can handle. A device may have one task for
+    each read interval of its objects, every one reading only the objects
+    with its interval.
+    """
 
-    def __init__(self, io_controller: IOController, device: DeviceConfig,
-                 config: Config, callback: ResponseProcessor) -> None:
-        interval = first(device.read_interval, config.read_interval)
+    def __init__(self, scheduler: TimingWheel, io_controller: IOController,
+                 device: DeviceConfig, config: Config,
+                 callback: ResponseProcessor,
+                 health: HealthMonitor | None = None,
+                 objects: Sequence[ObjectConfig] | None = None,
+                 interval: int | None = None,
+                 offset: float | None = None) -> None:
+        interval = first(interval, device.read_interval, config.read_interval)
         assert interval is not None
         self.device = device
-        super().__init__(io_controller, interval, callback=callback)
+        self.chunks = self._split_objects(
+            device, objects if objects is not None else device.objects, config)
+        super().__init__(scheduler, io_controller, interval, offset,
+                         callback=callback, health=health,
+                         max_stretch=_max_stretch(config))
+
+    @staticmethod
+    def _response_size_limit(device: DeviceConfig, config: Config) -> int:
+        max_apdu = min(device.max_apdu_length_accepted
+                       or config.max_apdu_length_accepted,
+                       config.max_apdu_length_accepted)
+        if device.segmentation_supported in ("segmentedBoth",
+                                             "segmentedTransmit") \
+                and config.segmentation_supported in ("segmentedBoth",
+                                                      "segmentedReceive"):
+            return max_apdu * config.max_segments_per_request
+        return max_apdu
+
+    @classmethod
+    def _split_objects(cls, device: DeviceConfig,
+                       objects: Sequence[ObjectConfig], config: Config) \
+            -> list[ReadChunk]:
+        limit = cls._response_size_limit(device, config)
+        chunks: list[ReadChunk] = []
+        chunk: ReadChunk = []
+        size = _ACK_HEADER_SIZE
+        for obj in objects:
+            object_type = obj.object_identifier.value[0]
+            props: list[str] = []
+            size += _RESULT_OBJECT_SIZE
+            for prop in obj.properties:
+                prop_size = _estimate_property_size(object_type, str(prop))
+                if size + prop_size > limit and (chunk or props):
+                    if props:
+                        chunk.append((obj.object_identifier, tuple(props)))
+                    chunks.append(chunk)
+                    chunk, props = [], []
+                    size = _ACK_HEADER_SIZE + _RESULT_OBJECT_SIZE
+                props.append(prop)
+                size += prop_size
+            if props:
+                chunk.append((obj.object_identifier, tuple(props)))
+        if chunk:
+            chunks.append(chunk)
+        _logger.debug("Split objects of %r into %d requests of at most %d "
+                      "octets", device, len(chunks), limit)
+        return chunks
+
+    @property
+    def key(self) -> tuple[object, ...]:
+        return (type(self), self.interval)
+
+    @property
+    def telemetry_tags(self) -> tuple[tuple[str, str | int], ...]:
+        assert self.interval is not None
+        return (*super().telemetry_tags, ("readInterval", int(self.interval)))
+
+    @property
+    def settings(self) -> tuple[object, ...]:
+        return (self.interval, self.chunks)
 
     def _build_requests(self) -> Iterable[ReadPropertyMultipleRequest]:
-        yield ReadPropertyMultipleRequest(
-            destination=self.device.address,
-            listOfReadAccessSpecs=[
-                ReadAccessSpecification(
-                    objectIdentifier=object.object_identifier,
-                    listOfPropertyReferences=[
-                        PropertyReference(propertyIdentifier=prop)
-                        for prop in object.properties
-                    ],
-                ) for object in self.device.objects
-            ]
-        )
+        for chunk in self.chunks:
+            yield ReadPropertyMultipleRequest(
+                destination=self.device.address,
+                listOfReadAccessSpecs=[
+                    ReadAccessSpecification(
+                        objectIdentifier=object_identifier,
+                        listOfPropertyReferences=[
+                            PropertyReference(propertyIdentifier=prop)
+                            for prop in props
+                        ],
+                    ) for object_identifier, props in chunk
+                ]
+            )
 
     def __str__(self) -> str:
-        return f"<DeviceReadTask for {self.device}>"
+        return f"<DeviceReadTask for {self.device} every {self.interval} s>"
 
     def __repr__(self) -> str:
         return str(self)
@@ -113,15 +355,33 @@ class DeviceReadTask(_BaseIOTask):
 class ObjectReadTask(_BaseIOTask):
     """Class for reading an object with ReadPropertyRequest"""
 
-    def __init__(self, io_controller: IOController, obj: ObjectConfig,
-                 device: DeviceConfig, config: Config,
-                 callback: ResponseProcessor) -> None:
-        interval = first(obj.read_interval, device.read_interval,
+    def __init__(self, scheduler: TimingWheel, io_controller: IOController,
+                 obj: ObjectConfig, device: DeviceConfig, config: Config,
+                 callback: ResponseProcessor,
+                 health: HealthMonitor | None = None,
+                 interval: int | None = None) -> None:
+        interval = first(interval, obj.read_interval, device.read_interval,
                          config.read_interval)
         assert interval is not None
         self.object = obj
         self.device = device
-        super().__init__(io_controller, interval, callback=callback)
+        super().__init__(scheduler, io_controller, interval,
+                         callback=callback, health=health,
+                         max_stretch=_max_stretch(config))
+
+    @property
+    def key(self) -> tuple[object, ...]:
+        return (type(self), self.object.object_identifier.value)
+
+    @property
+    def telemetry_tags(self) -> tuple[tuple[str, str | int], ...]:
+        object_type, instance = self.object.object_identifier.value
+        return (*super().telemetry_tags, ("objectType", object_type),
+                ("objectInstanceNumber", instance))
+
+    @property
+    def settings(self) -> tuple[object, ...]:
+        return (self.interval, self.object)
 
     def _build_requests(self) -> Iterable[ConfirmedRequestSequence]:
         for prop in self.object.properties:
@@ -139,21 +399,61 @@ class ObjectReadTask(_BaseIOTask):
 
 
 class SubscribeCOVTask(_BaseIOTask):
-    """Class for periodic subscribing to Change of Value notifications"""
-
-    def __init__(self, io_controller: IOController,
-                 obj: ObjectConfig, device: DeviceConfig, config: Config) \
-            -> None:
+    """
+    Class for subscribing to Change of Value notifications of an object
+
+    The subscription is renewed after a fraction of its lifetime, so that it
+    does not expire before the renewal is processed by the device. Every
+    subscription is expected to be followed by a notification, a device
+    refusing the subscription or staying silent counts as a failure.
+    """
+
+    def __init__(self, scheduler: TimingWheel, io_controller: IOController,
+                 obj: ObjectConfig, device: DeviceConfig, config: Config,
+                 manager: COVManager,
+                 health: HealthMonitor | None = None) -> None:
         lifetime = first(obj.cov_lifetime, config.cov_lifetime)
         assert lifetime is not None
         self.object = obj
         self.device = device
         self.config = config
+        self.manager = manager
         self.lifetime = lifetime
         self.error_count = 0
-        super().__init__(io_controller, lifetime, 0)
+        self.requested_at = 0.0
+        self.notified_at = 0.0
+        self.watch = _NotificationWatch(self)
+        # vsechny objekty zarizeni se obnovuji ve stejnem ticku, pozadavky
+        # tak odchazi pohromade
+        super().__init__(scheduler, io_controller,
+                         max(1, lifetime * config.cov.renewal), 0,
+                         health=health)
+
+    @property
+    def key(self) -> tuple[object, ...]:
+        return (type(self), self.object.object_identifier.value)
+
+    @property
+    def settings(self) -> tuple[object, ...]:
+        return (self.lifetime, self.object)
+
+    @property
+    def telemetry_tags(self) -> tuple[tuple[str, str | int], ...]:
+        object_type, instance = self.object.object_identifier.value
+        return (*super().telemetry_tags, ("objectType", object_type),
+                ("objectInstanceNumber", instance))
+
+    def install_task(self) -> None:
+        self.manager.add(self)
+        super().install_task()
+
+    def cancel_task(self) -> None:
+        self.manager.remove(self)
+        self.scheduler.cancel(self.watch)
+        super().cancel_task()
 
     def _build_requests(self) -> Iterable[ConfirmedRequestSequence]:
+        self.requested_at = monotonic()
         yield SubscribeCOVRequest(
             destination=self.device.address,
             subscriberProcessIdentifier=getpid(),
@@ -162,19 +462,53 @@ class SubscribeCOVTask(_BaseIOTask):
             lifetime=self.lifetime
         )
 
-    def _process_subscribe_ack(self, iocb: IOCB, device: DeviceConfig,
-                               obj: ObjectConfig) -> None:
-        if iocb.ioError:
-            _logger.error("Failed to subscribe to %r@%r: %r", obj, device,
-                          iocb.ioError)
-            self.error_count += 1
-        else:
-            _logger.debug("Subsribed to %r@%r", obj, device)
-            self.error_count = 0
+    def _process_subscribe_ack(self, iocb: IOCB) -> None:
+        if self.cancelled:
+            return
+        if not iocb.ioError:
+            _logger.debug("Subsribed to %r@%r", self.object, self.device)
+            if self.health is not None:
+                self.health.record_success(self.device.address)
+            if self.notified_at < self.requested_at:
+                self.scheduler.schedule(self.watch,
+                                        self.config.cov.notification_timeout)
+            return
+        _logger.error("Failed to subscribe to %r@%r: %r", self.object,
+                      self.device, iocb.ioError)
+        if is_device_failure(iocb.ioError):
+            # zarizeni neodpovida, to resi health, ne fallback na cteni
+            if self.health is not None:
+                self.health.record_failure(self.device.address)
+            return
+        if is_service_unsupported(iocb.ioError):
+            self.manager.fall_back(self)
+            return
+        self._record_failure()
+
+    def _record_failure(self) -> None:
+        self.error_count += 1
+        if self.error_count >= self.config.cov.max_failures:
+            self.manager.fall_back(self)
+            return
+        self.scheduler.schedule(self, self.config.cov.notification_timeout)
+
+    def process_notification(self) -> None:
+        """Records a notification received for the subscription"""
+        self.notified_at = monotonic()
+        self.error_count = 0
+        self.scheduler.cancel(self.watch)
+
+    def process_notification_timeout(self) -> None:
+        """Records that no notification followed the subscription"""
+        if self.cancelled:
+            return
+        _logger.warning("No notification of %r@%r within %d s after "
+                        "subscribing", self.object, self.device,
+                        self.config.cov.notification_timeout)
+        self._record_failure()
 
     def _add_callback(self, iocb: IOCB) -> None:
-        iocb.add_callback(self._process_subscribe_ack, self.device,
-                          self.object)
+        iocb.add_callback(self._process_subscribe_ack)
 
     def __str__(self) -> str:
         return f"<SubscribeCOVTask for {self.object}@{self.device}>"
@@ -183,19 +517,204 @@ class SubscribeCOVTask(_BaseIOTask):
         return str(self)
 
 
+class _NotificationWatch:
+    """Class timing out a subscription not followed by a notification"""
+
+    __slots__ = ("task",)
+
+    def __init__(self, task: SubscribeCOVTask) -> None:
+        self.task = task
+
+    def process_task(self) -> None:
+        self.task.process_notification_timeout()
+
+
 class DiscoveryTask(_BaseRecurringTask):
-    """Class for discovering devices on the network using WhoIsRequest"""
+    """
+    Class for discovering devices on the network using WhoIsRequest
 
-    def __init__(self, who_is_service: WhoIsIAmServices,
+    With who_is_slice set, the instance range is split into slices of that
+    many instances sent who_is_slice_interval seconds apart, so that the
+    I-Am responses of a large site do not arrive all at once. The next round
+    starts discovery_interval seconds after the start of the previous one.
+    """
+
+    def __init__(self, scheduler: TimingWheel,
+                 who_is_service: WhoIsService,
                  config: DiscoveryConfig) -> None:
         self.who_is_service = who_is_service
         self.config = config
-        super().__init__(self.config.discovery_interval)
+        self.next_low: int | None = None
+        self.round_start = 0.0
+        super().__init__(scheduler, self.config.discovery_interval)
 
     def process_task(self) -> None:
+        if self.config.who_is_slice:
+            self._send_slice(self.config.who_is_slice)
+            return
         super().process_task()
         self.who_is_service.who_is(self.config.low_limit,
                                    self.config.high_limit, self.config.target)
         _logger.debug("Sending WhoIsRequest lo=%r hi=%r addr=%r",
                       self.config.low_limit, self.config.high_limit,
                       self.config.target)
+
+    def _send_slice(self, size: int) -> None:
+        _logger.debug("Pocess task %r", self)
+        high_limit = self.config.high_limit \
+            if self.config.high_limit is not None else _MAX_DEVICE_INSTANCE
+        low = self.next_low
+        if low is None:
+            low = self.config.low_limit or 0
+            self.round_start = monotonic()
+        high = min(low + size - 1, high_limit)
+        self.who_is_service.who_is(low, high, self.config.target)
+        _logger.debug("Sending WhoIsRequest lo=%r hi=%r addr=%r", low, high,
+                      self.config.target)
+        if self.cancelled:
+            return
+        if high < high_limit:
+            self.next_low = high + 1
+            self.scheduler.schedule(self, self.config.who_is_slice_interval)
+            return
+        self.next_low = None
+        if self.interval:
+            self.scheduler.schedule(self, max(
+                0.0, self.round_start + self.interval - monotonic()))
+
+    def __str__(self) -> str:
+        return "<DiscoveryTask>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class LocateTask(_BaseRecurringTask):
+    """
+    Class for locating devices known only by their identifier using
+    WhoIsRequest, until all of them answer
+    """
+
+    def __init__(self, scheduler: TimingWheel,
+                 who_is_service: WhoIsService,
+                 device_identifiers: Collection[int],
+                 config: DiscoveryConfig) -> None:
+        self.who_is_service = who_is_service
+        self.device_identifiers = device_identifiers
+        self.config = config
+        super().__init__(scheduler, self.config.discovery_interval)
+
+    def process_task(self) -> None:
+        identifiers = sorted(self.device_identifiers)
+        if not identifiers:
+            _logger.debug("All devices located, stopping %r", self)
+            self.cancel_task()
+            return
+        super().process_task()
+        # blizke identifikatory se hledaji jednim dotazem
+        low = high = identifiers[0]
+        for identifier in identifiers[1:]:
+            if identifier - high > _LOCATE_MAX_GAP:
+                self.who_is_service.who_is(low, high, self.config.target)
+                low = identifier
+            high = identifier
+        self.who_is_service.who_is(low, high, self.config.target)
+        _logger.debug("Locating %d devices", len(identifiers))
+
+    def __str__(self) -> str:
+        return "<LocateTask>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class TelemetryTask(_BaseRecurringTask):
+    """Class for periodic reporting of the collector's own measurements"""
+
+    def __init__(self, scheduler: TimingWheel, telemetry: Telemetry,
+                 interval: float) -> None:
+        self.telemetry = telemetry
+        super().__init__(scheduler, interval, interval)
+
+    def process_task(self) -> None:
+        super().process_task()
+        self.telemetry.report()
+
+    def __str__(self) -> str:
+        return "<TelemetryTask>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class FlushTask(_BaseRecurringTask):
+    """Class for periodic flushing of buffered measurements"""
+
+    def __init__(self, scheduler: TimingWheel, influx_lpr: InfluxLPR,
+                 interval: float) -> None:
+        self.influx_lpr = influx_lpr
+        super().__init__(scheduler, interval)
+
+    def process_task(self) -> None:
+        super().process_task()
+        self.influx_lpr.flush_if_due()
+
+    def __str__(self) -> str:
+        return "<FlushTask>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def _file_states(paths: Iterable[str]) -> FileStates:
+    states: list[tuple[str, int, int] | None] = []
+    for path in paths:
+        if os.path.isdir(path):
+            # adresar s konfiguraci se hlida vcetne pridanych souboru
+            states.extend(_file_states(
+                os.path.join(path, name) for name in sorted(os.listdir(path))))
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            states.append(None)
+            continue
+        states.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(states)
+
+
+class ConfigWatchTask(_BaseRecurringTask):
+    """
+    Class for reloading the config once its files change
+
+    Files are compared with their state at the last check, a change is
+    reported only when the files did not change for one more interval, so
+    that a file being written is not loaded half-written.
+    """
+
+    def __init__(self, scheduler: TimingWheel,
+                 paths: Callable[[], Iterable[str]],
+                 callback: Callable[[], None], interval: float) -> None:
+        self.paths = paths
+        self.callback = callback
+        self.states = _file_states(self.paths())
+        self.loaded_states = self.states
+        super().__init__(scheduler, interval, interval)
+
+    def process_task(self) -> None:
+        super().process_task()
+        states = _file_states(self.paths())
+        if states != self.states:
+            self.states = states
+            return
+        if states != self.loaded_states:
+            _logger.info("Config files changed, reloading")
+            self.callback()
+            # nactena konfigurace muze hlidat jine seznamy bodu
+            self.states = self.loaded_states = _file_states(self.paths())
+
+    def __str__(self) -> str:
+        return "<ConfigWatchTask>"
+
+    def __repr__(self) -> str:
+        return str(self)
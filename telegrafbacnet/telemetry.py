@@ -0,0 +1,144 @@
+from bisect import bisect_left
+import logging
+from typing import Any, Callable, Iterable
+
+from bacpypes.pdu import Address
+
+from .config import TelemetryConfig
+from .decode import decode_plan_cache_info
+from .health import is_device_failure
+from .influx import InfluxLPR
+
+
+_logger = logging.getLogger(__name__)
+
+_MEASUREMENT = "bacnet_internal"
+
+# (tags, overruns, seconds between runs) of a task with overruns
+TaskOverruns = tuple[tuple[tuple[str, str | int], ...], int, float]
+
+
+class LatencyHistogram:
+    """Class counting request round-trip latencies of a single device"""
+
+    __slots__ = ("buckets", "count", "total", "timeouts", "errors")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        # posledni bucket je +Inf
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.timeouts = 0
+        self.errors = 0
+
+
+class Telemetry:
+    """
+    Class collecting measurements of the collector itself
+
+    Counters are cumulative since the start, so that rates can be derived from
+    them regardless of the reporting interval, maxima are reset on every
+    report. All measurements are reported as bacnet_internal through the
+    regular output. Overruns are reported only for tasks that had any.
+    """
+
+    def __init__(self, config: TelemetryConfig, influx_lpr: InfluxLPR,
+                 gauges: Callable[[], dict[str, Any]],
+                 overruns: Callable[[], Iterable[TaskOverruns]]
+                 | None = None) -> None:
+        self.config = config
+        self.bounds = tuple(sorted(config.latency_buckets))
+        self.influx_lpr = influx_lpr
+        self.gauges = gauges
+        self.overruns = overruns
+        self.devices: dict[Address, LatencyHistogram] = {}
+        self.decode_count = 0
+        self.decode_elements = 0
+        self.decode_time = 0.0
+        self.decode_time_max = 0.0
+
+    def record_request(self, address: Address, latency: float,
+                       error: Any) -> None:
+        """Records the outcome and round-trip latency of a request"""
+        histogram = self.devices.get(address)
+        if histogram is None:
+            histogram = self.devices[address] = LatencyHistogram(self.bounds)
+        if error is not None:
+            if is_device_failure(error):
+                histogram.timeouts += 1
+                return
+            histogram.errors += 1
+        histogram.buckets[bisect_left(self.bounds, latency)] += 1
+        histogram.count += 1
+        histogram.total += latency
+
+    def remove_device(self, address: Address) -> None:
+        """Forgets the request measurements of the device at the address"""
+        self.devices.pop(address, None)
+
+    def record_decode(self, duration: float, elements: int) -> None:
+        """Records the time spent decoding a single APDU"""
+        self.decode_count += 1
+        self.decode_elements += elements
+        self.decode_time += duration
+        if duration > self.decode_time_max:
+            self.decode_time_max = duration
+
+    def report(self) -> None:
+        """Prints all collected measurements"""
+        print_ = self.influx_lpr.print
+        for address, histogram in self.devices.items():
+            tag = ("deviceAddress", str(address))
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),),
+                                    histogram.buckets):
+                cumulative += count
+                print_("requestLatencyBucket", cumulative, tag,
+                       ("le", "+Inf" if bound == float("inf") else bound),
+                       measurement=_MEASUREMENT)
+            print_("requestCount", histogram.count, tag,
+                   measurement=_MEASUREMENT)
+            print_("requestLatencySum", histogram.total, tag,
+                   measurement=_MEASUREMENT)
+            print_("requestTimeouts", histogram.timeouts, tag,
+                   measurement=_MEASUREMENT)
+            print_("requestErrors", histogram.errors, tag,
+                   measurement=_MEASUREMENT)
+        total_overruns = 0
+        if self.overruns is not None:
+            for tags, overruns, delay in self.overruns():
+                print_("pollOverruns", overruns, *tags,
+                       measurement=_MEASUREMENT)
+                print_("pollInterval", delay, *tags, measurement=_MEASUREMENT)
+                total_overruns += overruns
+        hits, misses, size = decode_plan_cache_info()
+        sink = self.influx_lpr.sink
+        values: dict[str, Any] = {
+            "decodeCount": self.decode_count,
+            "decodeElements": self.decode_elements,
+            "decodeTimeSum": self.decode_time,
+            "decodeTimeMax": self.decode_time_max,
+            "decodePlanHits": hits,
+            "decodePlanMisses": misses,
+            "decodePlanSize": size,
+            "flushCount": self.influx_lpr.flush_count,
+            "flushedLines": self.influx_lpr.flushed_lines,
+            "flushLinesMax": self.influx_lpr.take_max_flush_lines(),
+            "bufferedLines": len(self.influx_lpr.buffer),
+            "sinkBatches": sink.batches,
+            "sinkLines": sink.lines,
+            "sinkBytes": sink.bytes,
+            "sinkRetries": sink.retries,
+            "sinkDroppedLines": sink.dropped_lines,
+            "sinkQueuedLines": sink.queued_lines,
+            "sinkOverflowLines": sink.overflow_lines,
+            "sinkSpilledLines": sink.spilled_lines,
+            "sinkBlockTimeSum": sink.block_time,
+            "sinkWriteTimeSum": sink.write_time,
+            "pollOverruns": total_overruns,
+        }
+        values.update(self.gauges())
+        for key, value in values.items():
+            print_(key, value, measurement=_MEASUREMENT)
+        self.decode_time_max = 0.0
+        _logger.debug("Reported telemetry of %d devices", len(self.devices))
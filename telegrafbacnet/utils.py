@@ -1,4 +1,6 @@
-from typing import TypeVar
+from typing import Any, TypeVar
+
+from bacpypes.apdu import RejectPDU, RejectReason
 
 
 T = TypeVar('T')
@@ -10,3 +12,13 @@ def first(*args: T | None, default: T | None = None) -> T | None:
         return next(value for value in args if value is not None)
     except StopIteration:
         return default
+
+
+def is_service_unsupported(error: Any) -> bool:
+    """Returns whether the IOCB error means the service is not supported"""
+    if isinstance(error, RejectPDU):
+        return error.apduAbortRejectReason \
+            == RejectReason.enumerations["unrecognizedService"]
+    return getattr(error, "errorClass", None) == "services" \
+        and getattr(error, "errorCode", None) in ("serviceRequestDenied",
+                                                  "rejectedService")
@@ -0,0 +1,101 @@
+import logging
+from time import monotonic
+from typing import Protocol
+
+from bacpypes.task import RecurringTask
+
+
+_logger = logging.getLogger(__name__)
+
+# Fractional part of the golden ratio, consecutive multiples of it modulo one
+# are spread evenly over the unit interval
+_GOLDEN_RATIO_FRACTION = 0.6180339887498949
+
+
+class ScheduledTask(Protocol):
+    """Protocol of tasks scheduled by a TimingWheel"""
+
+    def process_task(self) -> None:
+        """Runs the task"""
+
+
+class TimingWheel(RecurringTask):
+    """
+    Hashed timing wheel driving all periodic tasks of the collector from
+    a single bacpypes task
+
+    Each slot of the wheel holds the tasks due when the wheel cursor reaches
+    it together with the number of remaining wheel rotations. Scheduling and
+    cancelling a task are O(1), every tick fires all tasks due in the slot as
+    a group.
+    """
+
+    def __init__(self, tick: float = 0.1, slots: int = 1024) -> None:
+        super().__init__(int(tick * 1000))
+        self.tick = tick
+        self.slots: list[dict[ScheduledTask, int]] = \
+            [{} for _ in range(slots)]
+        self.positions: dict[ScheduledTask, int] = {}
+        self.phases: dict[float, int] = {}
+        # tasks of the current slot not fired yet
+        self.firing: set[ScheduledTask] = set()
+        self.cursor = 0
+        self.ticks = 0
+        self.start: float | None = None
+
+    @property
+    def scheduled(self) -> int:
+        """Number of currently scheduled tasks"""
+        return len(self.positions)
+
+    def spread(self, interval: float) -> float:
+        """
+        Returns an offset for the next task with the interval, so that tasks
+        with the same interval are spread evenly across it
+        """
+        count = self.phases.get(interval, 0)
+        self.phases[interval] = count + 1
+        return (count * _GOLDEN_RATIO_FRACTION) % 1 * interval
+
+    def schedule(self, task: ScheduledTask, delay: float) -> None:
+        """Schedules the task to be run after delay seconds"""
+        self.cancel(task)
+        ticks = max(1, round(delay / self.tick))
+        slot = (self.cursor + ticks) % len(self.slots)
+        self.slots[slot][task] = (ticks - 1) // len(self.slots)
+        self.positions[task] = slot
+
+    def cancel(self, task: ScheduledTask) -> None:
+        """Removes the task from the wheel if it is scheduled"""
+        self.firing.discard(task)
+        slot = self.positions.pop(task, None)
+        if slot is not None:
+            del self.slots[slot][task]
+
+    def process_task(self) -> None:
+        now = monotonic()
+        if self.start is None:
+            self.start = now - self.tick
+        elapsed = int((now - self.start) / self.tick) - self.ticks
+        for _ in range(elapsed):
+            self.ticks += 1
+            self.cursor = (self.cursor + 1) % len(self.slots)
+            self._process_slot(self.slots[self.cursor])
+
+    def _process_slot(self, slot: dict[ScheduledTask, int]) -> None:
+        due: list[ScheduledTask] = []
+        for task, rounds in list(slot.items()):
+            if rounds:
+                slot[task] = rounds - 1
+            else:
+                due.append(task)
+                del slot[task]
+                del self.positions[task]
+        if due:
+            _logger.debug("Firing %d tasks", len(due))
+        # ulohy zrusene ci preplanovane drivejsi ulohou slotu se nespusti
+        self.firing.update(due)
+        for task in due:
+            if task in self.firing:
+                self.firing.discard(task)
+                task.process_task()
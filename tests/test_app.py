@@ -0,0 +1,111 @@
+import io
+import logging
+
+from bacpypes.apdu import AbortPDU, AbortReason, ReadAccessSpecification, \
+    ReadPropertyACK, ReadPropertyMultipleRequest
+from bacpypes.basetypes import PropertyReference
+from bacpypes.constructeddata import Any as AnyValue
+from bacpypes.iocb import IOCB
+from bacpypes.pdu import Address
+from bacpypes.primitivedata import ObjectIdentifier, Real
+import pytest
+
+from telegrafbacnet.app import TelegrafApplication
+from telegrafbacnet.config import Config, DeviceConfig, ObjectConfig
+from telegrafbacnet.tasks import DeviceReadTask
+
+
+@pytest.fixture
+def app():
+    config = Config()
+    config.address = Address("127.0.0.1:47990")
+    config.max_apdu_length_accepted = 50
+    config.segmentation_supported = "noSegmentation"
+    application = TelegrafApplication(config, stream=io.BytesIO())
+    yield application
+    application.close_socket()
+    application.close()
+
+
+def _large_request(destination: Address) -> ReadPropertyMultipleRequest:
+    return ReadPropertyMultipleRequest(
+        destination=destination,
+        listOfReadAccessSpecs=[ReadAccessSpecification(
+            objectIdentifier=ObjectIdentifier("analogValue", instance),
+            listOfPropertyReferences=[
+                PropertyReference(propertyIdentifier="presentValue"),
+            ],
+        ) for instance in range(20)],
+    )
+
+
+def test_synchronous_abort_releases_request(app):
+    destination = Address("127.0.0.1:47991")
+    iocb = IOCB(_large_request(destination))
+    # pozadavek se nevejde do jednoho segmentu, ClientSSM ho zrusi hned
+    app.request_scheduler.submit(iocb)
+    assert isinstance(iocb.ioError, AbortPDU)
+    assert iocb.ioError.apduAbortRejectReason \
+        == AbortReason.enumerations["segmentationNotSupported"]
+    assert not app.active_requests
+    assert app.request_scheduler.in_flight == 0
+    # uvolneny slot zarizeni pusti dalsi pozadavek
+    retry = IOCB(_large_request(destination))
+    app.request_scheduler.submit(retry)
+    assert isinstance(retry.ioError, AbortPDU)
+    assert app.request_scheduler.in_flight == 0
+
+
+def _object(instance: int, read_interval: int | None = None,
+            cov: bool = False) -> ObjectConfig:
+    obj = ObjectConfig()
+    obj.object_identifier = ObjectIdentifier("analogValue", instance)
+    obj.properties = ("presentValue",)
+    obj.read_interval = read_interval
+    obj.cov = cov
+    return obj
+
+
+@pytest.mark.parametrize("snap", [False, True])
+def test_read_groups_do_not_mix_intervals(app, snap):
+    app.config.snap_read_intervals = snap
+    device = DeviceConfig()
+    device.address = Address("127.0.0.1:47991")
+    device.device_identifier = 100
+    device.read_interval = 30
+    intervals = (5, 7, 9, 10, None, 3600, 3700)
+    device.objects = tuple(
+        _object(index * len(intervals) + position, interval)
+        for index in range(5)
+        for position, interval in enumerate(intervals)
+    ) + (_object(1000, 5, cov=True),)
+    app.register_devices(device)
+    expected = {obj.object_identifier.value:
+                app._read_interval(device, obj, set())
+                for obj in device.objects if not obj.cov}
+    read: dict[tuple[str, int], int] = {}
+    for task in app.device_tasks[device.address]:
+        if not isinstance(task, DeviceReadTask):
+            continue
+        assert len(task.chunks) > 1
+        for chunk in task.chunks:
+            for object_identifier, _ in chunk:
+                read[object_identifier.value] = task.interval
+    assert read == expected
+    groups = {5, 10, 30, 3600} if snap else {5, 7, 9, 10, 30, 3600, 3700}
+    assert set(expected.values()) == groups
+
+
+def test_unknown_datatype_warned_once(app, caplog):
+    source = Address("127.0.0.1:47991")
+    for _ in range(3):
+        ack = ReadPropertyACK(objectIdentifier=("analogValue", 1),
+                              propertyIdentifier=9999,
+                              propertyValue=AnyValue(Real(1.0)))
+        ack.pduSource = source
+        app._process_read_property_ack(ack)
+    warnings = [record for record in caplog.records
+                if record.levelno == logging.WARNING
+                and "unknown datatype" in record.getMessage()]
+    assert len(warnings) == 1
+    assert str(source) in warnings[0].getMessage()
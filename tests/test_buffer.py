@@ -0,0 +1,122 @@
+from queue import Empty
+
+import pytest
+
+from telegrafbacnet.buffer import LineBuffer, SpillFile
+from telegrafbacnet.config import OutputBufferConfig
+
+
+# Size of a spilled chunk of 8 bytes including its header
+CHUNK_SIZE = 16
+
+
+def _chunk(index: int) -> bytes:
+    return f"line{index:04d}".encode()
+
+
+def _buffer(policy: str, tmp_path, max_lines: int = 2,
+            max_spill_size: int = 1 << 20) -> LineBuffer:
+    config = OutputBufferConfig()
+    config.max_lines = max_lines
+    config.policy = policy
+    config.spill_dir = str(tmp_path)
+    config.segment_size = 2 * CHUNK_SIZE
+    config.max_spill_size = max_spill_size
+    return LineBuffer(config)
+
+
+def _drain(buffer: LineBuffer) -> list[bytes]:
+    chunks = []
+    while True:
+        try:
+            chunk = buffer.get(0)
+        except Empty:
+            return chunks
+        assert chunk is not None
+        chunks.append(chunk[0])
+
+
+def test_spill_file_keeps_order(tmp_path):
+    spill = SpillFile(str(tmp_path), 2 * CHUNK_SIZE, 1 << 20)
+    for index in range(7):
+        assert spill.append(_chunk(index), 1) == 0
+    assert spill.lines == 7
+    assert len(spill.segments) == 4
+    assert [spill.pop() for _ in range(7)] \
+        == [(_chunk(index), 1) for index in range(7)]
+    assert spill.pop() is None
+    assert spill.lines == 0
+    assert len(spill.segments) == 1
+    spill.close()
+
+
+def test_spill_file_drops_oldest_segment(tmp_path):
+    spill = SpillFile(str(tmp_path), 2 * CHUNK_SIZE, 4 * CHUNK_SIZE)
+    dropped = [spill.append(_chunk(index), 1) for index in range(6)]
+    assert dropped == [0, 0, 0, 0, 2, 0]
+    assert spill.size == 4 * CHUNK_SIZE
+    assert spill.lines == 4
+    assert [spill.pop() for _ in range(4)] \
+        == [(_chunk(index), 1) for index in range(2, 6)]
+    spill.close()
+
+
+def test_spill_file_reuses_last_segment(tmp_path):
+    spill = SpillFile(str(tmp_path), 2 * CHUNK_SIZE, 2 * CHUNK_SIZE)
+    for index in range(4):
+        spill.append(_chunk(index), 1)
+        assert spill.pop() == (_chunk(index), 1)
+    assert len(spill.segments) == 1
+    assert spill.size == 2 * CHUNK_SIZE
+    spill.close()
+
+
+def test_line_buffer_spills_in_order(tmp_path):
+    buffer = _buffer("spill", tmp_path)
+    for index in range(3):
+        buffer.put(_chunk(index), 1)
+    assert buffer.get(0) == (_chunk(0), 1)
+    # po preteceni jdou dalsi bloky na disk, i kdyz se pamet uvolnila
+    for index in range(3, 6):
+        buffer.put(_chunk(index), 1)
+    assert buffer.spilled_lines == 4
+    assert buffer.queued_lines == 5
+    assert _drain(buffer) == [_chunk(index) for index in range(1, 6)]
+    assert buffer.dropped_lines == 0
+    buffer.release()
+
+
+def test_line_buffer_drops_when_spill_is_full(tmp_path):
+    buffer = _buffer("spill", tmp_path, max_spill_size=4 * CHUNK_SIZE)
+    for index in range(8):
+        buffer.put(_chunk(index), 1)
+    assert buffer.spilled_lines == 6
+    assert buffer.dropped_lines == 2
+    assert _drain(buffer) \
+        == [_chunk(index) for index in (0, 1, 4, 5, 6, 7)]
+    buffer.release()
+
+
+def test_line_buffer_drops_oldest(tmp_path):
+    buffer = _buffer("drop_oldest", tmp_path)
+    for index in range(5):
+        buffer.put(_chunk(index), 1)
+    assert buffer.dropped_lines == 3
+    assert _drain(buffer) == [_chunk(3), _chunk(4)]
+
+
+def test_line_buffer_keeps_oversized_chunk(tmp_path):
+    buffer = _buffer("drop_oldest", tmp_path)
+    buffer.put(_chunk(0), 5)
+    assert buffer.dropped_lines == 0
+    assert buffer.get(0) == (_chunk(0), 5)
+
+
+def test_line_buffer_close(tmp_path):
+    buffer = _buffer("block", tmp_path)
+    with pytest.raises(Empty):
+        buffer.get(0)
+    buffer.put(_chunk(0), 1)
+    buffer.close()
+    assert buffer.get() == (_chunk(0), 1)
+    assert buffer.get() is None
@@ -0,0 +1,315 @@
+from typing import Any
+
+from bacpypes.apdu import AbortPDU, AbortReason, Error, ReadAccessResult, \
+    ReadAccessResultElement, ReadAccessResultElementChoice, ReadPropertyACK, \
+    ReadPropertyMultipleACK, ReadPropertyMultipleRequest, \
+    ReadPropertyRequest, RejectPDU, RejectReason
+from bacpypes.constructeddata import Any as AnyValue, ArrayOf
+from bacpypes.iocb import IOCB
+from bacpypes.pdu import Address
+from bacpypes.primitivedata import ObjectIdentifier, Unsigned
+import pytest
+
+from telegrafbacnet import discovery as discovery_module
+from telegrafbacnet.config import Config, DeviceConfig, DiscoveryConfig
+from telegrafbacnet.discovery import DiscoveryQueue, ObjectListReader
+
+
+ADDRESS = Address("192.168.0.10")
+DEVICE_ID = ObjectIdentifier("device", 100)
+
+
+class _Scheduler:
+    def __init__(self) -> None:
+        self.scheduled: dict[Any, float] = {}
+
+    def schedule(self, task: Any, delay: float) -> None:
+        self.scheduled[task] = delay
+
+    def cancel(self, task: Any) -> None:
+        self.scheduled.pop(task, None)
+
+
+class _Requester:
+    def __init__(self) -> None:
+        self.iocbs: list[IOCB] = []
+
+    def request_io(self, iocb: IOCB, source: str = "") -> None:
+        self.iocbs.append(iocb)
+
+    def take(self) -> list[IOCB]:
+        iocbs, self.iocbs = self.iocbs, []
+        return iocbs
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(discovery_module, "monotonic", lambda: now[0])
+    return now
+
+
+def _queue(max_interrogations: int, rate: float | None = None) \
+        -> tuple[DiscoveryQueue, _Scheduler, list[int]]:
+    config = DiscoveryConfig()
+    config.max_interrogations = max_interrogations
+    config.interrogation_rate = rate
+    config.interrogation_timeout = 120
+    scheduler = _Scheduler()
+    started: list[int] = []
+    queue = DiscoveryQueue(
+        scheduler, config,
+        lambda address, device_identifier, *_: started.append(
+            device_identifier),
+    )
+    return queue, scheduler, started
+
+
+def _submit(queue: DiscoveryQueue, device_identifier: int,
+            priority: int = 0) -> Address:
+    address = Address(f"192.168.1.{device_identifier}")
+    queue.submit(address, device_identifier, 1476, "noSegmentation",
+                 priority)
+    return address
+
+
+def test_queue_starts_higher_priority_first(clock):
+    queue, _, started = _queue(1)
+    first = _submit(queue, 1)
+    second = _submit(queue, 2)
+    third = _submit(queue, 3, priority=5)
+    fourth = _submit(queue, 4, priority=5)
+    assert started == [1]
+    for address in (first, third, fourth, second):
+        queue.done(address)
+    assert started == [1, 3, 4, 2]
+    assert not queue.active and not queue.queue
+
+
+def test_queue_skips_duplicates(clock):
+    queue, _, started = _queue(1)
+    _submit(queue, 1)
+    _submit(queue, 2)
+    _submit(queue, 1)
+    _submit(queue, 2)
+    assert started == [1]
+    assert queue.duplicates == 2
+    assert len(queue.queue) == 1
+
+
+def test_queue_rate_limit(clock):
+    queue, scheduler, started = _queue(10, rate=2)
+    for device_identifier in range(1, 7):
+        _submit(queue, device_identifier)
+    # jedna sekunda nevyuziteho limitu se dohani najednou
+    assert started == [1, 2, 3]
+    assert scheduler.scheduled[queue] == pytest.approx(0.5)
+    del scheduler.scheduled[queue]
+    clock[0] += 0.5
+    queue.process_task()
+    assert started == [1, 2, 3, 4]
+    clock[0] += 0.2
+    queue.process_task()
+    assert started == [1, 2, 3, 4]
+    clock[0] += 0.3
+    queue.process_task()
+    assert started == [1, 2, 3, 4, 5]
+    clock[0] += 10
+    queue.process_task()
+    assert started == [1, 2, 3, 4, 5, 6]
+
+
+def test_queue_timeout_frees_slot(clock):
+    queue, scheduler, started = _queue(1)
+    _submit(queue, 1)
+    _submit(queue, 2)
+    interrogation, = (task for task in scheduler.scheduled
+                      if task is not queue)
+    assert scheduler.scheduled[interrogation] == 120
+    del scheduler.scheduled[interrogation]
+    interrogation.process_task()
+    assert started == [1, 2]
+    assert list(queue.active) == [Address("192.168.1.2")]
+
+
+def _device(read_multiple: bool = True,
+            max_apdu_length_accepted: int = 100) -> DeviceConfig:
+    device = DeviceConfig()
+    device.address = ADDRESS
+    device.device_identifier = DEVICE_ID.value[1]
+    device.read_multiple = read_multiple
+    device.max_apdu_length_accepted = max_apdu_length_accepted
+    return device
+
+
+def _entry(index: int) -> ObjectIdentifier:
+    return ObjectIdentifier("analogValue", index)
+
+
+def _length_ack(length: int) -> ReadPropertyACK:
+    return ReadPropertyACK(objectIdentifier=DEVICE_ID,
+                           propertyIdentifier="objectList",
+                           propertyArrayIndex=0,
+                           propertyValue=AnyValue(Unsigned(length)))
+
+
+def _answer(iocb: IOCB) -> None:
+    request = iocb.args[0]
+    if isinstance(request, ReadPropertyRequest):
+        iocb.complete(ReadPropertyACK(
+            objectIdentifier=DEVICE_ID,
+            propertyIdentifier="objectList",
+            propertyArrayIndex=request.propertyArrayIndex,
+            propertyValue=AnyValue(_entry(request.propertyArrayIndex)),
+        ))
+        return
+    assert isinstance(request, ReadPropertyMultipleRequest)
+    spec, = request.listOfReadAccessSpecs
+    iocb.complete(ReadPropertyMultipleACK(listOfReadAccessResults=[
+        ReadAccessResult(objectIdentifier=DEVICE_ID, listOfResults=[
+            ReadAccessResultElement(
+                propertyIdentifier="objectList",
+                propertyArrayIndex=reference.propertyArrayIndex,
+                readResult=ReadAccessResultElementChoice(
+                    propertyValue=AnyValue(
+                        _entry(reference.propertyArrayIndex))),
+            ) for reference in spec.listOfPropertyReferences
+        ]),
+    ]))
+
+
+def _timeout(iocb: IOCB) -> None:
+    iocb.abort(AbortPDU(False, 0, AbortReason.enumerations["noResponse"]))
+
+
+class _Reader:
+    def __init__(self, device: DeviceConfig) -> None:
+        config = Config()
+        config.max_apdu_length_accepted = 1476
+        self.requester = _Requester()
+        self.objects: list[list[tuple[str, int]]] = []
+        self.failures = 0
+        self.reader = ObjectListReader(
+            self.requester, device, config,
+            lambda _, objects: self.objects.append(objects),
+            self._fail,
+        )
+
+    def _fail(self, _: DeviceConfig) -> None:
+        self.failures += 1
+
+
+def test_reader_reads_length_then_batches():
+    reader = _Reader(_device())
+    reader.reader.start()
+    length_iocb, = reader.requester.take()
+    request = length_iocb.args[0]
+    assert request.propertyIdentifier == "objectList"
+    assert request.propertyArrayIndex == 0
+    length_iocb.complete(_length_ack(20))
+    batches = reader.requester.take()
+    # (100 - 16) // 12 = 7 polozek na pozadavek
+    assert [len(iocb.args[0].listOfReadAccessSpecs[0]
+                .listOfPropertyReferences) for iocb in batches] == [7, 7, 6]
+    assert reader.reader.running
+    for iocb in reversed(batches):
+        _answer(iocb)
+    assert reader.objects == [[_entry(index).value
+                               for index in range(1, 21)]]
+    assert not reader.reader.running
+
+
+def test_reader_retries_only_missing_entries():
+    reader = _Reader(_device(read_multiple=False))
+    reader.reader.start()
+    reader.requester.take()[0].complete(_length_ack(4))
+    requests = reader.requester.take()
+    assert [iocb.args[0].propertyArrayIndex for iocb in requests] \
+        == [1, 2, 3, 4]
+    _answer(requests[0])
+    _timeout(requests[1])
+    _answer(requests[2])
+    _timeout(requests[3])
+    retries = reader.requester.take()
+    assert [iocb.args[0].propertyArrayIndex for iocb in retries] == [2, 4]
+    for iocb in retries:
+        _answer(iocb)
+    assert reader.objects == [[_entry(index).value for index in range(1, 5)]]
+    assert reader.failures == 0
+
+
+def test_reader_gives_up_after_attempts_and_resumes():
+    reader = _Reader(_device(read_multiple=False))
+    reader.reader.start()
+    reader.requester.take()[0].complete(_length_ack(2))
+    first, second = reader.requester.take()
+    _answer(first)
+    _timeout(second)
+    for _ in range(2):
+        retry, = reader.requester.take()
+        _timeout(retry)
+    assert reader.failures == 1
+    assert reader.requester.take() == []
+    # dalsi discovery pokracuje jen chybejici polozkou
+    reader.reader.start()
+    retry, = reader.requester.take()
+    assert retry.args[0].propertyArrayIndex == 2
+    _answer(retry)
+    assert reader.objects == [[_entry(1).value, _entry(2).value]]
+
+
+def test_reader_reports_failed_length_read():
+    reader = _Reader(_device())
+    reader.reader.start()
+    _timeout(reader.requester.take()[0])
+    assert reader.failures == 1
+    assert reader.objects == []
+    assert reader.requester.take() == []
+
+
+def test_reader_ignores_entries_with_invalid_index():
+    reader = _Reader(_device(read_multiple=False))
+    reader.reader.start()
+    reader.requester.take()[0].complete(_length_ack(1))
+    iocb, = reader.requester.take()
+    iocb.complete(ReadPropertyACK(
+        objectIdentifier=DEVICE_ID, propertyIdentifier="objectList",
+        propertyArrayIndex=5, propertyValue=AnyValue(_entry(5)),
+    ))
+    retry, = reader.requester.take()
+    assert retry.args[0].propertyArrayIndex == 1
+    _answer(retry)
+    assert reader.objects == [[_entry(1).value]]
+
+
+@pytest.mark.parametrize("error", [
+    Error(errorClass="property", errorCode="invalidArrayIndex"),
+    RejectPDU(0, RejectReason.enumerations["parameterOutOfRange"]),
+    AbortPDU(True, 0, AbortReason.enumerations["other"]),
+])
+def test_reader_falls_back_to_whole_list(error):
+    reader = _Reader(_device())
+    reader.reader.start()
+    reader.requester.take()[0].abort(error)
+    whole, = reader.requester.take()
+    request = whole.args[0]
+    assert isinstance(request, ReadPropertyRequest)
+    assert request.propertyIdentifier == "objectList"
+    assert request.propertyArrayIndex is None
+    entries = [_entry(index) for index in range(1, 4)]
+    whole.complete(ReadPropertyACK(
+        objectIdentifier=DEVICE_ID, propertyIdentifier="objectList",
+        propertyValue=AnyValue(ArrayOf(ObjectIdentifier)(entries)),
+    ))
+    assert reader.objects == [[entry.value for entry in entries]]
+    assert reader.failures == 0
+
+
+def test_reader_reports_failed_whole_list_read():
+    reader = _Reader(_device())
+    reader.reader.start()
+    reader.requester.take()[0].abort(
+        Error(errorClass="property", errorCode="invalidArrayIndex"))
+    _timeout(reader.requester.take()[0])
+    assert reader.failures == 1
+    assert reader.objects == []
@@ -0,0 +1,90 @@
+import pytest
+
+from telegrafbacnet import filter as filter_module
+from telegrafbacnet.config import ObjectConfig
+from telegrafbacnet.filter import OutputFilter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(filter_module, "monotonic", lambda: now[0])
+    return now
+
+
+def _reported(output_filter: OutputFilter, values: list[object]) \
+        -> list[object]:
+    return [value for value in values
+            if output_filter.should_report("presentValue", None, value)]
+
+
+def test_absolute_deadband(clock):
+    output_filter = OutputFilter(deadband=0.5)
+    assert _reported(output_filter, [20.0, 20.3, 20.5, 20.6, 20.2, 20.0]) \
+        == [20.0, 20.6, 20.0]
+
+
+def test_percent_deadband(clock):
+    output_filter = OutputFilter(deadband_percent=10)
+    assert _reported(output_filter, [100.0, 109.0, 111.0, 100.5, 99.0]) \
+        == [100.0, 111.0, 99.0]
+
+
+def test_percent_deadband_near_zero(clock):
+    output_filter = OutputFilter(deadband_percent=10)
+    # od nuly se hlasi kazda zmena, od male hodnoty jen vetsi nez 10 %
+    assert _reported(output_filter, [0.0, 0.0, 0.001, 0.00105, 0.0012,
+                                     -0.0012]) \
+        == [0.0, 0.001, 0.0012, -0.0012]
+
+
+def test_both_deadbands_report_when_either_is_exceeded(clock):
+    output_filter = OutputFilter(deadband=5, deadband_percent=1)
+    assert _reported(output_filter, [1000.0, 1004.0, 1011.0, 1012.0, 1.0,
+                                     1.005, 1.5]) \
+        == [1000.0, 1011.0, 1.0, 1.5]
+
+
+def test_report_on_change(clock):
+    output_filter = OutputFilter()
+    assert _reported(output_filter, [1, 1, 2, 2.0, 2.5, 2.5]) == [1, 2, 2.5]
+
+
+def test_heartbeat(clock):
+    output_filter = OutputFilter(deadband=1, heartbeat=60)
+    assert output_filter.should_report("presentValue", None, 20.0)
+    clock[0] = 59.9
+    assert not output_filter.should_report("presentValue", None, 20.0)
+    clock[0] = 60.0
+    assert output_filter.should_report("presentValue", None, 20.0)
+    clock[0] = 100.0
+    assert not output_filter.should_report("presentValue", None, 20.5)
+    clock[0] = 120.0
+    assert output_filter.should_report("presentValue", None, 20.5)
+
+
+def test_non_numeric_values_pass_through_deadband(clock):
+    output_filter = OutputFilter(deadband=10, deadband_percent=50)
+    assert _reported(output_filter, ["active", "active", "inactive",
+                                     [0, 1], [0, 1], [1, 1], True, True,
+                                     False]) \
+        == ["active", "inactive", [0, 1], [1, 1], True, False]
+
+
+def test_properties_and_indexes_are_filtered_separately(clock):
+    output_filter = OutputFilter(deadband=1)
+    assert output_filter.should_report("presentValue", None, 1.0)
+    assert output_filter.should_report("presentValue", 1, 1.0)
+    assert output_filter.should_report("relinquishDefault", None, 1.0)
+    assert not output_filter.should_report("presentValue", 1, 1.5)
+
+
+def test_from_config():
+    obj = ObjectConfig()
+    assert OutputFilter.from_config(obj) is None
+    obj.deadband_percent = 2.5
+    obj.heartbeat = 300
+    output_filter = OutputFilter.from_config(obj)
+    assert output_filter is not None
+    assert output_filter.has_settings_of(OutputFilter(None, 2.5, 300))
+    assert not output_filter.has_settings_of(OutputFilter(None, 2.5, 60))
@@ -0,0 +1,113 @@
+from bacpypes.apdu import AbortPDU, AbortReason, Error
+from bacpypes.pdu import Address
+import pytest
+
+from telegrafbacnet.config import HealthConfig
+from telegrafbacnet.health import DeviceHealth, DeviceState, HealthMonitor
+
+
+ADDRESS = Address("192.168.0.10")
+
+
+class _Scheduler:
+    def __init__(self) -> None:
+        self.scheduled: dict[DeviceHealth, float] = {}
+
+    def schedule(self, task: DeviceHealth, delay: float) -> None:
+        self.scheduled[task] = delay
+
+    def cancel(self, task: DeviceHealth) -> None:
+        self.scheduled.pop(task, None)
+
+
+class _Monitor:
+    def __init__(self, enabled: bool = True) -> None:
+        config = HealthConfig()
+        config.enabled = enabled
+        config.failure_threshold = 3
+        config.backoff = 10
+        config.max_backoff = 600
+        self.scheduler = _Scheduler()
+        self.probes: list[Address] = []
+        self.transitions: list[DeviceState] = []
+        self.monitor = HealthMonitor(
+            self.scheduler, config, self.probes.append,
+            lambda health: self.transitions.append(health.state),
+        )
+
+    def fail(self, times: int = 1) -> None:
+        for _ in range(times):
+            self.monitor.record(ADDRESS, RuntimeError("timeout"))
+
+    def fire(self) -> None:
+        health, = self.scheduler.scheduled
+        del self.scheduler.scheduled[health]
+        health.process_task()
+
+
+@pytest.fixture
+def monitor():
+    return _Monitor()
+
+
+def test_backoff_probe_and_recovery(monitor):
+    monitor.fail(2)
+    assert monitor.monitor.is_available(ADDRESS)
+    assert monitor.transitions == []
+    monitor.fail()
+    assert not monitor.monitor.is_available(ADDRESS)
+    assert monitor.transitions == [DeviceState.BACKOFF]
+    assert list(monitor.scheduler.scheduled.values()) == [10]
+    # selhani behem cekani se nepocitaji
+    monitor.fail(5)
+    assert monitor.monitor.devices[ADDRESS].failures == 3
+    monitor.fire()
+    assert monitor.transitions[-1] == DeviceState.PROBING
+    assert monitor.probes == [ADDRESS]
+    assert not monitor.monitor.is_available(ADDRESS)
+    monitor.monitor.record(ADDRESS, None)
+    assert monitor.transitions[-1] == DeviceState.HEALTHY
+    assert monitor.monitor.is_available(ADDRESS)
+    assert ADDRESS not in monitor.monitor.devices
+    assert not monitor.scheduler.scheduled
+
+
+def test_backoff_grows_exponentially_up_to_max(monitor):
+    monitor.fail(3)
+    backoffs = []
+    for _ in range(8):
+        backoffs.append(monitor.monitor.devices[ADDRESS].backoff)
+        monitor.fire()
+        monitor.fail()
+    assert backoffs == [10, 20, 40, 80, 160, 320, 600, 600]
+    assert monitor.transitions == [DeviceState.BACKOFF,
+                                   DeviceState.PROBING] * 8 \
+        + [DeviceState.BACKOFF]
+
+
+def test_success_resets_failures(monitor):
+    monitor.fail(2)
+    monitor.monitor.record(ADDRESS, None)
+    monitor.fail(2)
+    assert monitor.monitor.is_available(ADDRESS)
+    assert monitor.transitions == []
+
+
+def test_device_errors_are_not_failures(monitor):
+    error = Error(errorClass="property", errorCode="unknownProperty")
+    abort = AbortPDU(True, 1, AbortReason.enumerations["bufferOverflow"])
+    for response in (error, abort) * 3:
+        monitor.monitor.record(ADDRESS, response)
+    assert monitor.monitor.is_available(ADDRESS)
+    local_abort = AbortPDU(False, 1,
+                           AbortReason.enumerations["noResponse"])
+    for _ in range(3):
+        monitor.monitor.record(ADDRESS, local_abort)
+    assert not monitor.monitor.is_available(ADDRESS)
+
+
+def test_disabled():
+    monitor = _Monitor(enabled=False)
+    monitor.fail(10)
+    assert monitor.monitor.is_available(ADDRESS)
+    assert not monitor.scheduler.scheduled
@@ -0,0 +1,93 @@
+from bacpypes.pdu import Address
+import pytest
+from tomlconfig import ConfigError
+
+from telegrafbacnet.config import PointListConfig
+from telegrafbacnet.pointlist import read_point_lists
+
+
+def _config(tmp_path, content: str, format: str = "csv") -> PointListConfig:
+    path = tmp_path / f"points.{format}"
+    path.write_text(content, encoding="utf-8")
+    config = PointListConfig()
+    config.path = str(path)
+    config.format = format
+    return config
+
+
+def test_csv_groups_points_by_device(tmp_path):
+    config = _config(tmp_path, (
+        "address,device_identifier,object,properties,sensorType,interval\n"
+        "192.168.0.10,100,analogInput:1,,temperature,30\n"
+        "# komentar\n"
+        "192.168.0.10,,analogValue:2,presentValue statusFlags,,\n"
+        ",200,binaryInput:3\n"
+        "192.168.0.11,101,3:4,,,\n"
+    ))
+    located, unlocated = read_point_lists([config])
+    assert [device.address for device in located] \
+        == [Address("192.168.0.10"), Address("192.168.0.11")]
+    device = located[0]
+    assert device.device_identifier == 100
+    assert device.read_multiple
+    first, second = device.objects
+    assert first.object_identifier.value == ("analogInput", 1)
+    assert first.properties == ("presentValue",)
+    assert first.sensorType == "temperature"
+    assert first.read_interval == 30
+    assert second.object_identifier.value == ("analogValue", 2)
+    assert second.properties == ("presentValue", "statusFlags")
+    assert second.read_interval is None
+    assert located[1].objects[0].object_identifier.value \
+        == ("binaryInput", 4)
+    assert [device.device_identifier for device in unlocated] == [200]
+    assert unlocated[0].objects[0].object_identifier.value \
+        == ("binaryInput", 3)
+
+
+def test_csv_reports_invalid_rows(tmp_path):
+    config = _config(tmp_path, (
+        "address,object,properties\n"
+        "192.168.0.10,analogInput:1,presentValue\n"
+        "192.168.0.10,unknownType:1,\n"
+        "192.168.0.10,analogInput:x,\n"
+        "192.168.0.10,analogInput:2,noSuchProperty\n"
+    ))
+    with pytest.raises(ConfigError) as error:
+        read_point_lists([config])
+    message = str(error.value)
+    assert f"{config.path}:3: unknown object type 'unknownType'" in message
+    assert f"{config.path}:4: invalid object instance 'x'" in message
+    assert f"{config.path}:5: unknown property 'noSuchProperty'" in message
+
+
+def test_csv_requires_object_column(tmp_path):
+    config = _config(tmp_path, "address,properties\n")
+    with pytest.raises(ConfigError):
+        read_point_lists([config])
+
+
+def test_ede(tmp_path):
+    config = _config(tmp_path, (
+        "PROJECT_NAME;test\n"
+        "VERSION_OF_REFERENCEFILE;1\n"
+        "#keyname;device obj.-instance;object-name;object-type;"
+        "object-instance;description;present-value-default;min-present-value;"
+        "max-present-value;settable;supports COV\n"
+        "dev;300;Boiler room;8;300;;;;;;\n"
+        "ai1;300;Temperature;0;1;;;;;;Y\n"
+        "bo1;300;Pump;4;2;;;;;;\n"
+    ), "ede")
+    config.cov = True
+    config.read_interval = 60
+    located, unlocated = read_point_lists([config])
+    assert located == []
+    device, = unlocated
+    assert device.device_identifier == 300
+    assert device.device_name == "Boiler room"
+    analog, binary = device.objects
+    assert analog.object_identifier.value == ("analogInput", 1)
+    assert analog.cov
+    assert analog.read_interval == 60
+    assert binary.object_identifier.value == ("binaryOutput", 2)
+    assert not binary.cov
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from bacpypes.iocb import IOCB
+from bacpypes.pdu import Address
+
+from telegrafbacnet.scheduler import RequestScheduler
+
+
+def _iocb(address: str) -> IOCB:
+    return IOCB(SimpleNamespace(pduDestination=Address(address)))
+
+
+def _scheduler(max_device_requests: int,
+               max_network_requests: int | None = None) \
+        -> tuple[RequestScheduler, list[IOCB]]:
+    dispatched: list[IOCB] = []
+    return RequestScheduler(dispatched.append, max_device_requests,
+                            max_network_requests), dispatched
+
+
+def test_device_limit():
+    scheduler, dispatched = _scheduler(2)
+    requests = [_iocb("192.168.0.10") for _ in range(4)]
+    other = _iocb("192.168.0.11")
+    for iocb in (*requests, other):
+        scheduler.submit(iocb)
+    assert dispatched == [*requests[:2], other]
+    assert scheduler.in_flight == 3
+    assert scheduler.queue_depth == 2
+    requests[1].complete(None)
+    assert dispatched[-1] is requests[2]
+    requests[0].abort(RuntimeError())
+    assert dispatched[-1] is requests[3]
+    assert scheduler.queue_depth == 0
+    for iocb in (requests[2], requests[3], other):
+        iocb.complete(None)
+    assert scheduler.in_flight == 0
+    assert not scheduler.device_in_flight
+    assert not scheduler.device_queues
+
+
+def test_network_limit():
+    scheduler, dispatched = _scheduler(1, 2)
+    remote = [_iocb(f"2001:{station}") for station in range(1, 5)]
+    other_network = _iocb("2002:1")
+    local = _iocb("192.168.0.10")
+    for iocb in (*remote, other_network, local):
+        scheduler.submit(iocb)
+    assert dispatched == [*remote[:2], other_network, local]
+    assert scheduler.network_in_flight == {2001: 2, 2002: 1}
+    # cekajici zarizeni site se odbavuji v poradi, v jakem prisla
+    remote[0].complete(None)
+    assert dispatched[-1] is remote[2]
+    remote[2].complete(None)
+    assert dispatched[-1] is remote[3]
+    for iocb in (remote[1], remote[3], other_network, local):
+        iocb.complete(None)
+    assert scheduler.in_flight == 0
+    assert not scheduler.network_in_flight
+    assert not scheduler.network_waiting
+    assert not scheduler.waiting_devices
+
+
+def test_network_waiting_device_keeps_device_order():
+    scheduler, dispatched = _scheduler(2, 1)
+    first, second, third = (_iocb("2001:1") for _ in range(3))
+    blocking = _iocb("2001:2")
+    for iocb in (blocking, first, second, third):
+        scheduler.submit(iocb)
+    assert dispatched == [blocking]
+    blocking.complete(None)
+    assert dispatched == [blocking, first]
+    first.complete(None)
+    second.complete(None)
+    assert dispatched == [blocking, first, second, third]
+    assert scheduler.wait_average >= 0
@@ -0,0 +1,112 @@
+from collections import Counter
+
+from bacpypes.apdu import APDU, ReadAccessResult, ReadAccessResultElement, \
+    ReadAccessResultElementChoice, ReadPropertyMultipleACK
+from bacpypes.basetypes import EngineeringUnits, EventState, StatusFlags
+from bacpypes.constructeddata import Any
+from bacpypes.pdu import PDU
+from bacpypes.primitivedata import Boolean, CharacterString, \
+    ObjectIdentifier, Real
+import pytest
+
+from telegrafbacnet.config import Config, DeviceConfig, ObjectConfig
+from telegrafbacnet.tasks import DeviceReadTask, ReadChunk
+
+
+_VALUES = {
+    "presentValue": Real(-1234.5678),
+    "statusFlags": StatusFlags([1, 0, 1, 0]),
+    "units": EngineeringUnits("degreesCelsius"),
+    "objectName": CharacterString("Boiler room supply temperature 01"),
+    "outOfService": Boolean(False),
+    "eventState": EventState("normal"),
+}
+_SMALL_PROPERTIES = ("presentValue", "statusFlags")
+_ALL_PROPERTIES = tuple(_VALUES)
+_OBJECT_TYPES = ("analogInput", "analogValue", "binaryInput",
+                 "multiStateValue")
+
+
+def _objects(count: int, properties: tuple[str, ...]) -> list[ObjectConfig]:
+    objects = []
+    for index in range(count):
+        obj = ObjectConfig()
+        obj.object_identifier = ObjectIdentifier(
+            _OBJECT_TYPES[index % len(_OBJECT_TYPES)], index)
+        obj.properties = properties[:1 + index % len(properties)]
+        objects.append(obj)
+    return objects
+
+
+def _encoded_ack_size(chunk: ReadChunk) -> int:
+    ack = ReadPropertyMultipleACK(listOfReadAccessResults=[
+        ReadAccessResult(
+            objectIdentifier=object_identifier,
+            listOfResults=[ReadAccessResultElement(
+                propertyIdentifier=prop,
+                readResult=ReadAccessResultElementChoice(
+                    propertyValue=Any(_VALUES[prop])),
+            ) for prop in props],
+        ) for object_identifier, props in chunk
+    ])
+    ack.apduInvokeID = 0
+    apdu = APDU()
+    ack.encode(apdu)
+    pdu = PDU()
+    apdu.encode(pdu)
+    return len(pdu.pduData)
+
+
+@pytest.mark.parametrize("max_apdu, properties", [
+    (50, _SMALL_PROPERTIES),
+    (206, _ALL_PROPERTIES),
+    (480, _ALL_PROPERTIES),
+    (1476, _ALL_PROPERTIES),
+])
+def test_split_objects_fits_max_apdu(max_apdu, properties):
+    config = Config()
+    config.max_apdu_length_accepted = 1476
+    device = DeviceConfig()
+    device.max_apdu_length_accepted = max_apdu
+    device.segmentation_supported = "noSegmentation"
+    objects = _objects(200, properties)
+    chunks = DeviceReadTask._split_objects(device, objects, config)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk
+        assert _encoded_ack_size(chunk) <= max_apdu
+    read = Counter((object_identifier.value, prop)
+                   for chunk in chunks
+                   for object_identifier, props in chunk
+                   for prop in props)
+    expected = Counter((obj.object_identifier.value, prop)
+                       for obj in objects for prop in obj.properties)
+    assert read == expected
+
+
+def test_split_objects_keeps_object_order():
+    config = Config()
+    device = DeviceConfig()
+    device.max_apdu_length_accepted = 206
+    device.segmentation_supported = "noSegmentation"
+    objects = _objects(50, _ALL_PROPERTIES)
+    chunks = DeviceReadTask._split_objects(device, objects, config)
+    # objekt rozdeleny mezi dva pozadavky se v nich objevi po sobe
+    identifiers = [object_identifier.value for chunk in chunks
+                   for object_identifier, _ in chunk]
+    deduplicated = [value for index, value in enumerate(identifiers)
+                    if not index or identifiers[index - 1] != value]
+    assert deduplicated == [obj.object_identifier.value for obj in objects]
+
+
+def test_split_objects_uses_segments():
+    config = Config()
+    config.segmentation_supported = "segmentedBoth"
+    config.max_segments_per_request = 4
+    device = DeviceConfig()
+    device.max_apdu_length_accepted = 480
+    device.segmentation_supported = "segmentedBoth"
+    objects = _objects(200, _ALL_PROPERTIES)
+    chunks = DeviceReadTask._split_objects(device, objects, config)
+    assert all(_encoded_ack_size(chunk) <= 4 * 480 for chunk in chunks)
+    assert max(_encoded_ack_size(chunk) for chunk in chunks) > 480
@@ -0,0 +1,128 @@
+from typing import Callable
+
+import pytest
+
+from telegrafbacnet import wheel as wheel_module
+from telegrafbacnet.wheel import TimingWheel
+
+
+# Tick with an exact binary representation, so that the fake clock does not
+# accumulate rounding errors
+TICK = 0.125
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+
+class _Task:
+    def __init__(self, wheel: TimingWheel, fired: list[tuple[str, int]],
+                 name: str = "task") -> None:
+        self.wheel = wheel
+        self.fired = fired
+        self.name = name
+        self.interval: float | None = None
+        self.action: Callable[[], None] | None = None
+
+    def process_task(self) -> None:
+        self.fired.append((self.name, self.wheel.ticks))
+        if self.interval is not None:
+            self.wheel.schedule(self, self.interval)
+        if self.action is not None:
+            self.action()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(wheel_module, "monotonic", lambda: clock.now)
+    return clock
+
+
+def _advance(wheel: TimingWheel, clock: _Clock, ticks: int) -> None:
+    for _ in range(ticks):
+        clock.now += wheel.tick
+        wheel.process_task()
+
+
+@pytest.mark.parametrize("ticks", [1, 2, 1023, 1024, 1025, 2048, 2049, 5000])
+def test_delay_wraps_wheel(clock, ticks):
+    wheel = TimingWheel(TICK, 1024)
+    fired: list[tuple[str, int]] = []
+    wheel.schedule(_Task(wheel, fired), ticks * TICK)
+    _advance(wheel, clock, ticks - 1)
+    assert fired == []
+    _advance(wheel, clock, 1)
+    assert fired == [("task", ticks)]
+    assert wheel.scheduled == 0
+
+
+def test_catches_up_after_stall(clock):
+    wheel = TimingWheel(TICK, 8)
+    fired: list[tuple[str, int]] = []
+    for ticks in (3, 1, 10):
+        wheel.schedule(_Task(wheel, fired, str(ticks)), ticks * TICK)
+    wheel.process_task()
+    clock.now += 12 * TICK
+    wheel.process_task()
+    assert fired == [("1", 1), ("3", 3), ("10", 10)]
+
+
+def test_reschedule_during_tick(clock):
+    wheel = TimingWheel(TICK, 8)
+    fired: list[tuple[str, int]] = []
+    task = _Task(wheel, fired)
+    task.interval = 5 * TICK
+    wheel.schedule(task, task.interval)
+    _advance(wheel, clock, 21)
+    assert fired == [("task", ticks) for ticks in (5, 10, 15, 20)]
+    assert wheel.scheduled == 1
+
+
+def test_cancel_during_own_tick(clock):
+    wheel = TimingWheel(TICK, 8)
+    fired: list[tuple[str, int]] = []
+    task = _Task(wheel, fired)
+    task.interval = 2 * TICK
+    task.action = lambda: wheel.cancel(task)
+    wheel.schedule(task, task.interval)
+    _advance(wheel, clock, 10)
+    assert fired == [("task", 2)]
+    assert wheel.scheduled == 0
+
+
+def test_cancel_other_task_of_same_slot(clock):
+    wheel = TimingWheel(TICK, 8)
+    fired: list[tuple[str, int]] = []
+    first, second = _Task(wheel, fired, "first"), _Task(wheel, fired, "second")
+    first.action = lambda: wheel.cancel(second)
+    wheel.schedule(first, 3 * TICK)
+    wheel.schedule(second, 3 * TICK)
+    _advance(wheel, clock, 10)
+    assert fired == [("first", 3)]
+
+
+def test_reschedule_other_task_of_same_slot(clock):
+    wheel = TimingWheel(TICK, 8)
+    fired: list[tuple[str, int]] = []
+    first, second = _Task(wheel, fired, "first"), _Task(wheel, fired, "second")
+    first.action = lambda: wheel.schedule(second, 8 * TICK)
+    wheel.schedule(first, 3 * TICK)
+    wheel.schedule(second, 3 * TICK)
+    _advance(wheel, clock, 20)
+    assert fired == [("first", 3), ("second", 11)]
+
+
+def test_spread():
+    wheel = TimingWheel(TICK)
+    offsets = [wheel.spread(10) for _ in range(10)]
+    assert offsets[0] == 0
+    assert all(0 <= offset < 10 for offset in offsets)
+    assert len({round(offset, 6) for offset in offsets}) == 10
+    # po deseti ulohach neni zadna mezera delsi nez dvojnasobek prumeru
+    gaps = [b - a for a, b in zip(sorted(offsets), sorted(offsets)[1:])]
+    assert max(gaps) <= 2
+    assert wheel.spread(60) == 0
+    assert wheel.spread(10) == pytest.approx(
+        (10 * wheel_module._GOLDEN_RATIO_FRACTION) % 1 * 10)